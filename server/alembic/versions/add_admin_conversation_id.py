@@ -0,0 +1,32 @@
+"""Add conversation_id to admin_conversations
+
+Revision ID: add_admin_conversation_id_003
+Revises: add_document_registry_002
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_admin_conversation_id_003'
+down_revision = 'add_document_registry_002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Link each analytics row to its conversation so a chat turn can upsert it
+    op.add_column('admin_conversations', sa.Column('conversation_id', sa.String(), nullable=True))
+
+    # Unique index, used as the ON CONFLICT target
+    op.create_index(op.f('ix_admin_conversations_conversation_id'), 'admin_conversations', ['conversation_id'], unique=True)
+
+
+def downgrade():
+    # Drop index
+    op.drop_index(op.f('ix_admin_conversations_conversation_id'), table_name='admin_conversations')
+
+    # Drop conversation_id column
+    op.drop_column('admin_conversations', 'conversation_id')
@@ -0,0 +1,44 @@
+"""Add document_registry table
+
+Revision ID: add_document_registry_002
+Revises: add_machine_id_001
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_document_registry_002'
+down_revision = 'add_machine_id_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create registry of indexed PDFs (hash + indexing settings)
+    op.create_table(
+        'document_registry',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(), nullable=True),
+        sa.Column('file_sha256', sa.String(length=64), nullable=True),
+        sa.Column('chunker_config', sa.JSON(), nullable=True),
+        sa.Column('embedding_model', sa.String(), nullable=True),
+        sa.Column('chunk_count', sa.Integer(), nullable=True),
+        sa.Column('indexed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_document_registry_id'), 'document_registry', ['id'], unique=False)
+    op.create_index(op.f('ix_document_registry_filename'), 'document_registry', ['filename'], unique=True)
+    op.create_index(op.f('ix_document_registry_file_sha256'), 'document_registry', ['file_sha256'], unique=False)
+
+
+def downgrade():
+    # Drop indexes
+    op.drop_index(op.f('ix_document_registry_file_sha256'), table_name='document_registry')
+    op.drop_index(op.f('ix_document_registry_filename'), table_name='document_registry')
+    op.drop_index(op.f('ix_document_registry_id'), table_name='document_registry')
+
+    # Drop table
+    op.drop_table('document_registry')
@@ -1,2 +1,2 @@
-from .main import app
-from .api.routes import router 
+# The API is served from `app.main:app`. Importing the package stays
+# lightweight so converter workers and scripts do not load the whole API.
@@ -11,9 +11,12 @@ from fastapi import UploadFile
 from fastapi.responses import RedirectResponse
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 
 # Local imports
-from ..docs_process.process_pdf import process_pdf
+from ..docs_process.ingestion_worker import ingestion_worker
+from ..docs_process.uploads import stream_to_temp, publish_upload, discard_upload, find_duplicate
+from ..utils.config import MAX_UPLOAD_MB
 
 # Local imports
 import glob
@@ -100,15 +103,27 @@ async def upload_file(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="ไฟล์ที่อัปโหลดไม่ใช่ไฟล์ PDF")
 
     # Construct the file path for saving the uploaded PDF
-    file_path = os.path.join(UPLOAD_FOLDER, file.filename)
+    filename = os.path.basename(file.filename)
+    file_path = os.path.join(UPLOAD_FOLDER, filename)
+
+    # Stream the upload to disk (size-limited, hashed) and move it into place
+    upload = await stream_to_temp(file, UPLOAD_FOLDER, MAX_UPLOAD_MB * 1024 * 1024)
 
-    # Save the uploaded file to the local directory
-    with open(file_path, "wb") as f:
-        content = await file.read()  # Read the file content asynchronously
-        f.write(content)  # Write the content to the file
+    # ปฏิเสธไฟล์ที่มีเนื้อหาซ้ำกับไฟล์ที่ index แล้วหรือกำลัง index อยู่
+    duplicate = await run_in_threadpool(find_duplicate, upload["sha256"])
+    if duplicate:
+        discard_upload(upload["tmp_path"])
+        raise HTTPException(status_code=409, detail=f"ไฟล์ซ้ำ: เนื้อหาเหมือนกับ {duplicate}")
 
-    # Process the PDF after saving it
-    process_pdf(file_path)
+    await run_in_threadpool(publish_upload, upload["tmp_path"], file_path)
+
+    # Index the PDF in the background worker
+    ingestion_worker.submit(
+        file_path,
+        filename,
+        file_sha256=upload["sha256"],
+        source="api_upload",
+    )
 
     # Redirect to the main page after successful upload
     return RedirectResponse(url="/", status_code=303)
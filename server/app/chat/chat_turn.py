@@ -0,0 +1,265 @@
+"""
+Chat turn persistence
+
+A chat turn is written in two parts so the user only waits for the LLM:
+
+- ``start_turn`` / ``start_guest_turn`` save the question. They run while
+  the answer is generated and also fix the message ids (two sequence values
+  reserved up front for registered users, UUIDs for guests). Only reserving
+  the ids has to succeed: if saving the question fails, the outbox record,
+  which carries it, writes it later.
+- ``turn_record`` describes the rest (bot message, analytics row) as plain
+  JSON for the outbox, which writes it after the response was sent with
+  ``write_turn``: one transaction with a multi-row INSERT ... ON CONFLICT DO
+  NOTHING for the messages (the question is included again, in case saving
+  it failed), the guest conversation's ``updated_at`` and an
+  AdminConversation ``INSERT ... ON CONFLICT DO UPDATE`` on
+  ``conversation_id``. Replaying a record is therefore harmless.
+"""
+import uuid
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.database.models import AdminConversation, Conversation, GuestConversation, GuestMessage, Message
+
+logger = logging.getLogger(__name__)
+
+
+async def find_conversation(db: AsyncSession, conversation_id: int):
+    """(id, user_id) of a conversation, without loading its messages"""
+    result = await db.execute(
+        select(Conversation.id, Conversation.user_id).filter(Conversation.id == conversation_id)
+    )
+    return result.first()
+
+
+async def find_guest_conversation(db: AsyncSession, conversation_id: str):
+    """(id, machine_id) of a live guest conversation, without loading its messages"""
+    result = await db.execute(
+        select(GuestConversation.id, GuestConversation.machine_id).filter(
+            and_(
+                GuestConversation.id == conversation_id,
+                GuestConversation.is_deleted == False
+            )
+        )
+    )
+    return result.first()
+
+
+def analytics_upsert(
+    conversation_id: str,
+    user_id: Optional[int],
+    username: str,
+    question: str,
+    answer: str,
+    response_time_ms: Optional[int],
+    conversation_type: str,
+):
+    """AdminConversation row for the latest turn of a conversation"""
+    now = datetime.utcnow()
+    statement = insert(AdminConversation).values(
+        conversation_id=conversation_id,
+        user_id=user_id,
+        username=username,
+        question=question,
+        bot_response=answer,
+        response_time_ms=response_time_ms,
+        conversation_type=conversation_type,
+        created_at=now,
+        updated_at=now,
+    )
+    return statement.on_conflict_do_update(
+        index_elements=[AdminConversation.conversation_id],
+        set_={
+            "question": statement.excluded.question,
+            "bot_response": statement.excluded.bot_response,
+            "response_time_ms": statement.excluded.response_time_ms,
+            "updated_at": statement.excluded.updated_at,
+        },
+    )
+
+
+async def reserve_message_ids(db: AsyncSession) -> Dict[str, int]:
+    """Take the user and bot message ids of a turn from the messages sequence"""
+    try:
+        result = await db.execute(
+            select(func.nextval(func.pg_get_serial_sequence(Message.__tablename__, "id"))).select_from(
+                func.generate_series(1, 2)
+            )
+        )
+        user_message_id, bot_message_id = sorted(row[0] for row in result)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return {"user_message_id": user_message_id, "bot_message_id": bot_message_id}
+
+
+async def start_turn(
+    db: AsyncSession, conversation_id: int, question: str, asked_at: datetime
+) -> Dict[str, Any]:
+    """Reserve a registered user's message ids and save the question; returns the ids"""
+    ids = await reserve_message_ids(db)
+    try:
+        await db.execute(
+            insert(Message)
+            .values(
+                id=ids["user_message_id"],
+                conversation_id=conversation_id,
+                sender="user",
+                content=question,
+                created_at=asked_at,
+            )
+            .on_conflict_do_nothing(index_elements=[Message.id])
+        )
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.warning(f"Could not save question {ids['user_message_id']} now, leaving it to the outbox: {e}")
+    return ids
+
+
+async def start_guest_turn(
+    db: AsyncSession, conversation_id: str, question: str, message_id: str, asked_at: datetime
+) -> bool:
+    """Save a guest question and touch the conversation; False when it is gone or deleted"""
+    try:
+        touched = await db.execute(
+            update(GuestConversation)
+            .where(
+                and_(
+                    GuestConversation.id == conversation_id,
+                    GuestConversation.is_deleted == False
+                )
+            )
+            .values(updated_at=asked_at)
+            .returning(GuestConversation.id)
+        )
+        if touched.first() is None:
+            await db.rollback()
+            return False
+        db.add(
+            GuestMessage(
+                id=message_id,
+                conversation_id=conversation_id,
+                sender="user",
+                content=question,
+                timestamp=asked_at,
+            )
+        )
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return True
+
+
+def turn_record(
+    conversation_type: str,
+    conversation_id: Any,
+    user_message_id: Any,
+    bot_message_id: Any,
+    question: str,
+    answer: str,
+    response_time_ms: Optional[int],
+    asked_at: datetime,
+    answered_at: datetime,
+    user_id: Optional[int] = None,
+    username: Optional[str] = None,
+) -> Dict[str, Any]:
+    """JSON-serializable description of a turn for the outbox"""
+    return {
+        "type": conversation_type,
+        "conversation_id": conversation_id,
+        "user_id": user_id,
+        "username": username,
+        "question": {"id": user_message_id, "content": question, "at": asked_at.isoformat()},
+        "answer": {"id": bot_message_id, "content": answer, "at": answered_at.isoformat()},
+        "response_time_ms": response_time_ms,
+    }
+
+
+def write_turn(db: Session, record: Dict[str, Any]):
+    """Write the messages and analytics row of a turn record (idempotent)"""
+    question, answer = record["question"], record["answer"]
+    asked_at = datetime.fromisoformat(question["at"])
+    answered_at = datetime.fromisoformat(answer["at"])
+    try:
+        if record["type"] == "guest":
+            db.execute(
+                insert(GuestMessage)
+                .values(
+                    [
+                        {
+                            "id": question["id"],
+                            "conversation_id": record["conversation_id"],
+                            "sender": "user",
+                            "content": question["content"],
+                            "timestamp": asked_at,
+                            "response_time_ms": None,
+                        },
+                        {
+                            "id": answer["id"],
+                            "conversation_id": record["conversation_id"],
+                            "sender": "bot",
+                            "content": answer["content"],
+                            "timestamp": answered_at,
+                            "response_time_ms": record["response_time_ms"],
+                        },
+                    ]
+                )
+                .on_conflict_do_nothing(index_elements=[GuestMessage.id])
+            )
+            db.execute(
+                update(GuestConversation)
+                .where(GuestConversation.id == record["conversation_id"])
+                .values(updated_at=answered_at)
+            )
+        else:
+            db.execute(
+                insert(Message)
+                .values(
+                    [
+                        {
+                            "id": question["id"],
+                            "conversation_id": record["conversation_id"],
+                            "sender": "user",
+                            "content": question["content"],
+                            "created_at": asked_at,
+                            "response_time_ms": None,
+                        },
+                        {
+                            "id": answer["id"],
+                            "conversation_id": record["conversation_id"],
+                            "sender": "bot",
+                            "content": answer["content"],
+                            "created_at": answered_at,
+                            "response_time_ms": record["response_time_ms"],
+                        },
+                    ]
+                )
+                .on_conflict_do_nothing(index_elements=[Message.id])
+            )
+
+        db.execute(
+            analytics_upsert(
+                str(record["conversation_id"]),
+                record["user_id"],
+                record["username"],
+                question["content"],
+                answer["content"],
+                record["response_time_ms"],
+                record["type"],
+            )
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
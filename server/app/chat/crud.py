@@ -1,44 +1,72 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from app.database import models
 from . import schemas
 
-def create_conversation(db: Session, user_id: int, title: str):
+async def create_conversation(db: AsyncSession, user_id: int, title: str):
     db_conversation = models.Conversation(user_id=user_id, title=title)
     db.add(db_conversation)
-    db.commit()
-    db.refresh(db_conversation)
+    await db.commit()
+    await db.refresh(db_conversation, ["created_at", "messages"])
     return db_conversation
 
-def get_conversations_by_user(db: Session, user_id: int):
-    return db.query(models.Conversation).filter(models.Conversation.user_id == user_id).all()
+async def get_conversations_by_user(db: AsyncSession, user_id: int):
+    result = await db.execute(
+        select(models.Conversation)
+        .filter(models.Conversation.user_id == user_id)
+        .options(selectinload(models.Conversation.messages))
+    )
+    return result.scalars().all()
 
-def get_conversation(db: Session, conversation_id: int):
-    return db.query(models.Conversation).filter(models.Conversation.id == conversation_id).first()
+async def get_conversation(db: AsyncSession, conversation_id: int):
+    result = await db.execute(
+        select(models.Conversation)
+        .filter(models.Conversation.id == conversation_id)
+        .options(selectinload(models.Conversation.messages))
+    )
+    return result.scalars().first()
 
-def get_messages_by_conversation(db: Session, conversation_id: int):
-    return db.query(models.Message).filter(models.Message.conversation_id == conversation_id).all()
+async def get_messages_by_conversation(db: AsyncSession, conversation_id: int):
+    result = await db.execute(
+        select(models.Message).filter(models.Message.conversation_id == conversation_id)
+    )
+    return result.scalars().all()
 
-def get_message(db: Session, message_id: int):
-    return db.query(models.Message).filter(models.Message.id == message_id).first()
+async def get_message(db: AsyncSession, message_id: int):
+    result = await db.execute(
+        select(models.Message)
+        .filter(models.Message.id == message_id)
+        .options(selectinload(models.Message.conversation))
+    )
+    return result.scalars().first()
 
-def update_conversation_title(db: Session, conversation_id: int, title: str):
-    db_conversation = get_conversation(db, conversation_id)
+async def update_conversation_title(db: AsyncSession, conversation_id: int, title: str):
+    db_conversation = await get_conversation(db, conversation_id)
     if db_conversation:
         db_conversation.title = title
-        db.commit()
-        db.refresh(db_conversation)
+        await db.commit()
     return db_conversation
 
-def create_message(db: Session, message: schemas.MessageCreate, conversation_id: int):
+async def create_message(db: AsyncSession, message: schemas.MessageCreate, conversation_id: int):
     db_message = models.Message(**message.dict(), conversation_id=conversation_id)
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
+    await db.commit()
+    await db.refresh(db_message)
     return db_message
 
-def delete_conversation(db: Session, conversation_id: int):
-    db_conversation = get_conversation(db, conversation_id)
+async def delete_conversation(db: AsyncSession, conversation_id: int):
+    # Load messages and their feedbacks so the delete cascade needs no lazy loads
+    result = await db.execute(
+        select(models.Conversation)
+        .filter(models.Conversation.id == conversation_id)
+        .options(
+            selectinload(models.Conversation.messages).selectinload(models.Message.feedbacks)
+        )
+        .execution_options(populate_existing=True)
+    )
+    db_conversation = result.scalars().first()
     if db_conversation:
-        db.delete(db_conversation)
-        db.commit()
-    return db_conversation 
\ No newline at end of file
+        await db.delete(db_conversation)
+        await db.commit()
+    return db_conversation
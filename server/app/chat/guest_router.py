@@ -1,17 +1,20 @@
 from fastapi import APIRouter, HTTPException, Depends, Header, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 from datetime import datetime
 from uuid import uuid4
+import asyncio
 import logging
+import time
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
-from app.utils.database import get_db
+from app.utils.database import get_async_db
 from app.rag_system.rag_system import chatbot as rag_chatbot
 from . import schemas
-from . import guest_crud
-from app.database.models import AdminConversation
+from . import guest_crud, chat_turn
+from .outbox import chat_outbox
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -30,66 +33,12 @@ def generate_machine_id() -> str:
     return str(uuid4())
 
 
-async def sync_guest_to_admin_conversation(
-    conversation_id: str,
-    question: str,
-    bot_response: str,
-    machine_id: str,
-    response_time_ms: int,
-    db: Session,
-):
-    """
-    Auto-sync guest conversation data to AdminConversation table
-    """
-    try:
-        # ตรวจสอบว่ามีข้อมูลใน AdminConversation หรือไม่
-        existing = (
-            db.query(AdminConversation)
-            .filter(AdminConversation.conversation_id == conversation_id)
-            .first()
-        )
-
-        if not existing:
-            # สร้างใหม่
-            admin_conv = AdminConversation(
-                conversation_id=conversation_id,
-                user_id=None,
-                username=f"guest_{machine_id}",
-                question=question,
-                bot_response=bot_response,
-                satisfaction_rating=None,
-                response_time_ms=response_time_ms,
-                conversation_type="guest",
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow(),
-            )
-            db.add(admin_conv)
-            db.commit()
-            print(
-                f"New guest conversation synced to AdminConversation: {conversation_id}"
-            )
-        else:
-            # อัปเดตข้อมูลที่มีอยู่
-            existing.question = question
-            existing.bot_response = bot_response
-            existing.response_time_ms = response_time_ms
-            existing.updated_at = datetime.utcnow()
-            db.commit()
-            print(
-                f"Existing guest conversation updated in AdminConversation: {conversation_id}"
-            )
-
-    except Exception as e:
-        print(f"Error syncing guest to AdminConversation: {str(e)}")
-        # ไม่ต้อง raise error เพื่อไม่ให้กระทบการทำงานหลัก
-
-
 @router.post("/message")
 @limiter.limit("20/minute")
 async def send_guest_message(
     request: Request,
     message: schemas.GuestMessageCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     x_machine_id: Optional[str] = Header(None),
 ):
     """Send a message and get bot response for guest users (logs to PostgreSQL)"""
@@ -98,7 +47,7 @@ async def send_guest_message(
         machine_id = x_machine_id or message.machine_id or generate_machine_id()
 
         # Get bot response using RAG system
-        bot_response = rag_chatbot(message.content)
+        bot_response = await run_in_threadpool(rag_chatbot, message.content)
 
         # Convert document references to schema format
         source_documents = []
@@ -132,7 +81,7 @@ async def send_guest_message(
 async def create_guest_conversation(
     request: Request,
     conversation: schemas.GuestConversationCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     x_machine_id: Optional[str] = Header(None),
 ):
     """Create a new guest conversation with machine identifier"""
@@ -144,7 +93,7 @@ async def create_guest_conversation(
         # Use provided machine_id or generate new one
         machine_id = x_machine_id or conversation.machine_id or generate_machine_id()
 
-        db_conversation = guest_crud.create_guest_conversation(
+        db_conversation = await guest_crud.create_guest_conversation(
             db, title=conversation.title, machine_id=machine_id
         )
 
@@ -180,19 +129,19 @@ def conversation_to_response(conv):
 
 @router.get("/conversations", response_model=List[schemas.GuestConversationResponse])
 async def get_guest_conversations(
-    db: Session = Depends(get_db), x_machine_id: Optional[str] = Header(None)
+    db: AsyncSession = Depends(get_async_db), x_machine_id: Optional[str] = Header(None)
 ):
     try:
         logger.info(f"Fetching guest conversations for machine_id: {x_machine_id}")
 
-        conversations = guest_crud.get_guest_conversations(db, machine_id=x_machine_id)
+        conversations = await guest_crud.get_guest_conversations(db, machine_id=x_machine_id)
 
         logger.info(f"Found {len(conversations)} conversations")
 
         # Load messages for each conversation to ensure they're available
         for conv in conversations:
             if not hasattr(conv, "messages") or conv.messages is None:
-                conv.messages = guest_crud.get_guest_messages(db, conv.id)
+                conv.messages = await guest_crud.get_guest_messages(db, conv.id)
 
         result = [conversation_to_response(conv) for conv in conversations]
         logger.info(f"Successfully processed {len(result)} conversations")
@@ -210,11 +159,11 @@ async def get_guest_conversations(
 )
 async def get_guest_conversation(
     conversation_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     x_machine_id: Optional[str] = Header(None),
 ):
     try:
-        conversation = guest_crud.get_guest_conversation(db, conversation_id)
+        conversation = await guest_crud.get_guest_conversation(db, conversation_id)
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
         if x_machine_id and conversation.machine_id != x_machine_id:
@@ -224,7 +173,7 @@ async def get_guest_conversation(
 
         # Load messages if not already loaded
         if not hasattr(conversation, "messages") or conversation.messages is None:
-            conversation.messages = guest_crud.get_guest_messages(db, conversation_id)
+            conversation.messages = await guest_crud.get_guest_messages(db, conversation_id)
 
         return conversation_to_response(conversation)
     except HTTPException:
@@ -241,12 +190,12 @@ async def add_message_to_guest_conversation(
     request: Request,
     conversation_id: str,
     message: schemas.GuestMessageCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     x_machine_id: Optional[str] = Header(None),
 ):
     """Add a message to a guest conversation and get bot response (logs to PostgreSQL)"""
-    # Check if conversation exists
-    conversation = guest_crud.get_guest_conversation(db, conversation_id)
+    # Check if conversation exists (without loading its messages)
+    conversation = await chat_turn.find_guest_conversation(db, conversation_id)
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
@@ -257,11 +206,32 @@ async def add_message_to_guest_conversation(
         )
 
     try:
-        # Log user message to database
-        guest_crud.add_guest_message(db, conversation_id, "user", message.content)
+        # บันทึกคำถามไปพร้อมกับการค้นหาและสร้างคำตอบ
+        asked_at = datetime.utcnow()
+        user_message_id = str(uuid4())
+        saving = asyncio.create_task(
+            chat_turn.start_guest_turn(
+                db, conversation_id, message.content, user_message_id, asked_at
+            )
+        )
 
         # Get bot response
-        bot_response = rag_chatbot(message.content)
+        started = time.perf_counter()
+        try:
+            bot_response = await run_in_threadpool(rag_chatbot, message.content)
+        except Exception:
+            await asyncio.gather(saving, return_exceptions=True)
+            raise
+        response_time_ms = int((time.perf_counter() - started) * 1000)
+
+        try:
+            if not await saving:
+                raise HTTPException(status_code=404, detail="Conversation not found")
+        except HTTPException:
+            raise
+        except Exception as e:
+            # The outbox record below also carries the question
+            logger.warning(f"Could not save guest question now, leaving it to the outbox: {e}")
 
         # Convert document references to schema format
         source_documents = []
@@ -277,28 +247,27 @@ async def add_message_to_guest_conversation(
                     )
                 )
 
-        # Log bot response to database
-        guest_crud.add_guest_message(
-            db, conversation_id, "bot", bot_response["message"]
-        )
-
-        # คำนวณเวลาตอบสนอง (ประมาณการ)
-        response_time_ms = 1000  # Default 1 second
-
-        # Auto-sync ไปยัง AdminConversation
-        await sync_guest_to_admin_conversation(
-            conversation_id=conversation_id,
+        # คำตอบและข้อมูลสถิติ (AdminConversation) บันทึกผ่าน outbox หลังส่งคำตอบแล้ว
+        record = chat_turn.turn_record(
+            "guest",
+            conversation_id,
+            user_message_id,
+            str(uuid4()),
             question=message.content,
-            bot_response=bot_response["message"],
-            machine_id=conversation.machine_id,
+            answer=bot_response["message"],
             response_time_ms=response_time_ms,
-            db=db,
+            asked_at=asked_at,
+            answered_at=datetime.utcnow(),
+            username=f"guest_{conversation.machine_id}",
         )
+        await run_in_threadpool(chat_outbox.submit, record)
 
         return {
             "message": bot_response["message"],
             "source_documents": source_documents,
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error processing message: {str(e)}"
@@ -308,11 +277,11 @@ async def add_message_to_guest_conversation(
 @router.delete("/conversations/{conversation_id}")
 async def delete_guest_conversation(
     conversation_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     x_machine_id: Optional[str] = Header(None),
 ):
     """Soft delete a guest conversation"""
-    conversation = guest_crud.get_guest_conversation(db, conversation_id)
+    conversation = await guest_crud.get_guest_conversation(db, conversation_id)
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
@@ -323,7 +292,7 @@ async def delete_guest_conversation(
         )
 
     try:
-        success = guest_crud.delete_guest_conversation(db, conversation_id)
+        success = await guest_crud.delete_guest_conversation(db, conversation_id)
         if success:
             return {"message": "Conversation deleted successfully"}
         else:
@@ -336,11 +305,11 @@ async def delete_guest_conversation(
 
 @router.get("/stats")
 async def get_guest_stats(
-    db: Session = Depends(get_db), x_machine_id: Optional[str] = Header(None)
+    db: AsyncSession = Depends(get_async_db), x_machine_id: Optional[str] = Header(None)
 ):
     """Get statistics for guest conversations of a specific machine"""
     try:
-        stats = guest_crud.get_guest_conversation_stats(db, machine_id=x_machine_id)
+        stats = await guest_crud.get_guest_conversation_stats(db, machine_id=x_machine_id)
         return schemas.GuestStatsResponse(**stats)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching stats: {str(e)}")
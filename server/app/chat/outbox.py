@@ -0,0 +1,267 @@
+"""
+Chat turn outbox
+
+The bot message and analytics row of a chat turn are written after the
+response is sent. ``submit()`` first appends the turn to a spool file (one
+JSON line, flushed and fsynced) and then queues it for a daemon thread that
+writes it with ``chat_turn.write_turn`` and retries with exponential backoff
+while the database is unavailable.
+
+Each process spools to its own ``outbox-<pid>.jsonl`` in CHAT_OUTBOX_PATH and
+holds an exclusive lock on it. On start, spool files that no running process
+holds (left by a crash or restart) are replayed. Writes are idempotent
+(message ids are fixed before the turn is queued), so a turn replayed after
+it was already written does no harm.
+
+While the database is unreachable (connection errors) a turn is retried
+indefinitely, with the delay capped at MAX_RETRY_SECONDS. Turns the database
+rejects (IntegrityError/DataError, e.g. the conversation was deleted) are
+moved to ``failed.jsonl`` at once, and other errors after
+CHAT_OUTBOX_MAX_ATTEMPTS, so they do not block the queue. Admins can list
+them with ``failed_records`` and queue them again with ``replay_failed``.
+"""
+import os
+import json
+import uuid
+import fcntl
+import queue
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.exc import DataError, DBAPIError, IntegrityError, InterfaceError, OperationalError
+
+from app.chat import chat_turn
+from app.utils.config import CHAT_OUTBOX_PATH, CHAT_OUTBOX_MAX_ATTEMPTS, CHAT_OUTBOX_RETRY_SECONDS
+from app.utils.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_SECONDS = 60
+
+# The database refused the turn; retrying cannot help
+PERMANENT_ERRORS = (IntegrityError, DataError)
+
+
+def is_connection_error(error: Exception) -> bool:
+    """True when the database could not be reached (retried without limit)"""
+    if isinstance(error, (OperationalError, InterfaceError, ConnectionError, TimeoutError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+class ChatOutbox:
+    """Durable queue of chat turn writes processed in a daemon thread"""
+
+    def __init__(
+        self,
+        path: str = CHAT_OUTBOX_PATH,
+        max_attempts: int = CHAT_OUTBOX_MAX_ATTEMPTS,
+        retry_seconds: float = CHAT_OUTBOX_RETRY_SECONDS,
+    ):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._spool = None
+        self._pending = 0
+        self._stopping = threading.Event()
+        self._stats = {"written": 0, "retries": 0, "failed": 0, "replayed": 0}
+
+    def _spool_path(self) -> str:
+        return os.path.join(self.path, f"outbox-{os.getpid()}.jsonl")
+
+    def _failed_path(self) -> str:
+        return os.path.join(self.path, "failed.jsonl")
+
+    def _open_spool(self):
+        if self._spool is not None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        path = self._spool_path()
+        while True:
+            spool = open(path, "a+", encoding="utf-8")
+            # Another process may be claiming the file as abandoned; wait for it
+            fcntl.flock(spool, fcntl.LOCK_EX)
+            # ...and if it removed the file meanwhile, start a new one
+            try:
+                current = os.fstat(spool.fileno())
+                if current.st_nlink > 0 and os.stat(path).st_ino == current.st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            spool.close()
+        self._spool = spool
+
+    def _append(self, handle, record: Dict[str, Any]):
+        handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+        handle.flush()
+        os.fsync(handle.fileno())
+
+    def start(self):
+        """Replay abandoned spool files and start the worker thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._open_spool()
+            self._stopping.clear()
+            for record in self._claim_abandoned():
+                self._append(self._spool, record)
+                self._pending += 1
+                self._queue.put(record)
+            self._thread = threading.Thread(target=self._run, name="chat-outbox", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Write what is queued (up to ``timeout``); the rest stays in the spool"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._stopping.set()
+            self._thread.join(1.0)
+
+    def submit(self, record: Dict[str, Any]) -> str:
+        """Spool a turn and queue it for writing; returns its outbox id"""
+        record = {"outbox_id": str(uuid.uuid4()), **record}
+        self.start()
+        with self._lock:
+            self._append(self._spool, record)
+            self._pending += 1
+        self._queue.put(record)
+        return record["outbox_id"]
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"pending": self._pending, **self._stats}
+
+    def failed_records(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Turns moved to failed.jsonl, oldest first"""
+        if not os.path.exists(self._failed_path()):
+            return []
+        with open(self._failed_path(), "r", encoding="utf-8") as handle:
+            return self._read_pending(handle)[:limit]
+
+    def replay_failed(self) -> int:
+        """Queue the turns in failed.jsonl again (e.g. after fixing the cause); returns how many"""
+        self.start()
+        path = self._failed_path()
+        claimed = f"{path}.{os.getpid()}"
+        with self._lock:
+            try:
+                # Other processes keep appending to a fresh failed.jsonl
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                return 0
+            with open(claimed, "r", encoding="utf-8") as handle:
+                records = self._read_pending(handle)
+            for record in records:
+                record.pop("error", None)
+                self._append(self._spool, record)
+                self._pending += 1
+            os.remove(claimed)
+            self._stats["replayed"] += len(records)
+        for record in records:
+            self._queue.put(record)
+        logger.info(f"Replaying {len(records)} failed chat turns")
+        return len(records)
+
+    def _claim_abandoned(self) -> List[Dict[str, Any]]:
+        """Records of spool files no process holds; the files are removed"""
+        records: List[Dict[str, Any]] = []
+        own = self._spool_path()
+        for name in sorted(os.listdir(self.path)):
+            path = os.path.join(self.path, name)
+            if not (name.startswith("outbox-") and name.endswith(".jsonl")) or path == own:
+                continue
+            with open(path, "r", encoding="utf-8") as handle:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue  # spool of a live process
+                records.extend(self._read_pending(handle))
+                os.remove(path)
+        # Our own file may hold records of an earlier process with the same pid
+        self._spool.seek(0)
+        records.extend(self._read_pending(self._spool))
+        self._spool.truncate(0)
+        if records:
+            self._stats["replayed"] += len(records)
+            logger.info(f"Replaying {len(records)} chat turns from the outbox spool")
+        return records
+
+    def _read_pending(self, handle) -> List[Dict[str, Any]]:
+        records, done = [], set()
+        for line in handle:
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                logger.warning("Skipping a truncated outbox line")
+                continue
+            if "done" in item:
+                done.add(item["done"])
+            else:
+                records.append(item)
+        return [record for record in records if record["outbox_id"] not in done]
+
+    def _finish(self, record: Dict[str, Any], error: Optional[Exception] = None):
+        failed = error is not None
+        with self._lock:
+            if failed:
+                with open(self._failed_path(), "a", encoding="utf-8") as handle:
+                    self._append(handle, {**record, "error": str(error)})
+                self._stats["failed"] += 1
+            else:
+                self._stats["written"] += 1
+            self._pending -= 1
+            if self._pending == 0:
+                self._spool.truncate(0)
+            else:
+                self._append(self._spool, {"done": record["outbox_id"]})
+
+    def _write(self, record: Dict[str, Any]):
+        db = SessionLocal()
+        try:
+            chat_turn.write_turn(db, record)
+        finally:
+            db.close()
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    self._write(record)
+                    self._finish(record)
+                    break
+                except PERMANENT_ERRORS as e:
+                    logger.error(f"Database rejected chat turn {record['outbox_id']}: {e}")
+                    self._finish(record, error=e)
+                    break
+                except Exception as e:
+                    if attempt >= self.max_attempts and not is_connection_error(e):
+                        logger.error(
+                            f"Giving up on chat turn {record['outbox_id']} after {attempt} attempts: {e}"
+                        )
+                        self._finish(record, error=e)
+                        break
+                    delay = min(self.retry_seconds * 2 ** min(attempt - 1, 16), MAX_RETRY_SECONDS)
+                    logger.warning(
+                        f"Could not write chat turn {record['outbox_id']} (attempt {attempt}), "
+                        f"retrying in {delay:.1f}s: {e}"
+                    )
+                    with self._lock:
+                        self._stats["retries"] += 1
+                    if self._stopping.wait(delay):
+                        return  # shutting down, the record stays in the spool
+
+
+chat_outbox = ChatOutbox()
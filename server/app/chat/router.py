@@ -6,16 +6,20 @@ from fastapi import (
     WebSocketDisconnect,
     Request,
 )
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from typing import List
-from datetime import datetime
+from datetime import datetime, timezone
+import asyncio
+import time
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
 from app.database import models
-from app.utils.database import get_db
+from app.utils.database import get_async_db
 from app.login_system.auth import get_current_user
-from . import schemas, crud
+from . import schemas, crud, chat_turn
+from .outbox import chat_outbox
 from .websocket_manager import ConnectionManager
 from .chatbot import get_chatbot_response
 from app.rag_system.rag_system import chatbot as rag_chatbot
@@ -31,28 +35,28 @@ limiter = Limiter(key_func=get_remote_address)
 @router.post("/conversations/", response_model=schemas.Conversation)
 async def create_conversation_for_user(
     conversation: schemas.ConversationCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    return crud.create_conversation(
+    return await crud.create_conversation(
         db=db, user_id=int(current_user.id), title=conversation.title
     )
 
 
 @router.get("/conversations/", response_model=List[schemas.Conversation])
 async def read_conversations_for_user(
-    db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user)
 ):
-    return crud.get_conversations_by_user(db=db, user_id=current_user.id)
+    return await crud.get_conversations_by_user(db=db, user_id=current_user.id)
 
 
 @router.get("/conversations/{conversation_id}", response_model=schemas.Conversation)
 async def read_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    db_conversation = crud.get_conversation(db=db, conversation_id=conversation_id)
+    db_conversation = await crud.get_conversation(db=db, conversation_id=conversation_id)
     if db_conversation is None or db_conversation.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return db_conversation
@@ -62,13 +66,13 @@ async def read_conversation(
 async def update_conversation_title(
     conversation_id: int,
     conversation_update: schemas.ConversationUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    db_conversation = crud.get_conversation(db=db, conversation_id=conversation_id)
+    db_conversation = await crud.get_conversation(db=db, conversation_id=conversation_id)
     if db_conversation is None or db_conversation.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    return crud.update_conversation_title(
+    return await crud.update_conversation_title(
         db=db, conversation_id=conversation_id, title=conversation_update.title
     )
 
@@ -78,13 +82,13 @@ async def update_conversation_title(
 )
 async def read_messages_for_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    db_conversation = crud.get_conversation(db=db, conversation_id=conversation_id)
+    db_conversation = await crud.get_conversation(db=db, conversation_id=conversation_id)
     if db_conversation is None or db_conversation.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    return crud.get_messages_by_conversation(db=db, conversation_id=conversation_id)
+    return await crud.get_messages_by_conversation(db=db, conversation_id=conversation_id)
 
 
 @router.post(
@@ -95,19 +99,35 @@ async def create_message_for_conversation(
     request: Request,
     conversation_id: int,
     message: schemas.MessageCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    db_conversation = crud.get_conversation(db=db, conversation_id=conversation_id)
+    db_conversation = await chat_turn.find_conversation(db, conversation_id)
     if db_conversation is None or db_conversation.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
     try:
-        # Create user message
-        crud.create_message(db=db, message=message, conversation_id=conversation_id)
+        # Reserve the message ids and save the question while the answer is generated
+        asked_at = datetime.now(timezone.utc)
+        saving = asyncio.create_task(
+            chat_turn.start_turn(db, conversation_id, message.content, asked_at)
+        )
 
-        # Generate bot response with document references
-        bot_response = rag_chatbot(message.content)
+        # Generate bot response with document references (blocking, off the event loop)
+        started = time.perf_counter()
+        try:
+            bot_response = await run_in_threadpool(rag_chatbot, message.content)
+        except Exception:
+            await asyncio.gather(saving, return_exceptions=True)
+            raise
+        response_time_ms = int((time.perf_counter() - started) * 1000)
+
+        try:
+            ids = await saving
+        except Exception:
+            # Not even the ids could be reserved (e.g. a pool timeout); try once
+            # more instead of dropping the answer
+            ids = await chat_turn.start_turn(db, conversation_id, message.content, asked_at)
 
         # Convert document references to schema format
         source_documents = []
@@ -123,16 +143,29 @@ async def create_message_for_conversation(
                     )
                 )
 
-        bot_message = schemas.MessageCreate(
-            sender="bot", content=bot_response["message"]
-        )
-        created_message = crud.create_message(
-            db=db, message=bot_message, conversation_id=conversation_id
+        # Bot message and analytics row are written by the outbox after the
+        # response is sent (spooled to disk first, retried until stored)
+        record = chat_turn.turn_record(
+            "regular",
+            conversation_id,
+            ids["user_message_id"],
+            ids["bot_message_id"],
+            question=message.content,
+            answer=bot_response["message"],
+            response_time_ms=response_time_ms,
+            asked_at=asked_at,
+            answered_at=datetime.now(timezone.utc),
+            user_id=current_user.id,
+            username=current_user.username,
         )
+        await run_in_threadpool(chat_outbox.submit, record)
 
-        # Add source documents to the response
-        created_message.source_documents = source_documents
-        return created_message
+        return schemas.Message(
+            id=ids["bot_message_id"],
+            content=bot_response["message"],
+            sender="bot",
+            source_documents=source_documents,
+        )
 
     except Exception as e:
         raise HTTPException(
@@ -143,10 +176,10 @@ async def create_message_for_conversation(
 @router.delete("/conversations/{conversation_id}", response_model=schemas.Conversation)
 async def delete_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    db_conversation = crud.get_conversation(db=db, conversation_id=conversation_id)
+    db_conversation = await crud.get_conversation(db=db, conversation_id=conversation_id)
     if db_conversation is None or db_conversation.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    return crud.delete_conversation(db=db, conversation_id=conversation_id)
+    return await crud.delete_conversation(db=db, conversation_id=conversation_id)
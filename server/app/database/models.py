@@ -7,6 +7,7 @@ from sqlalchemy import (
     DateTime,
     Text,
     Float,
+    JSON,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -117,6 +118,8 @@ class AdminConversation(Base):
     __tablename__ = "admin_conversations"
 
     id = Column(Integer, primary_key=True, index=True)
+    # Source conversation (guest UUID or registered id as string), one row each
+    conversation_id = Column(String, unique=True, index=True, nullable=True)
     user_id = Column(
         Integer, ForeignKey("users.id"), nullable=True
     )  # Can be null for guest users
@@ -132,3 +135,16 @@ class AdminConversation(Base):
     )
 
     user = relationship("User", foreign_keys=[user_id])
+
+
+# Registry of indexed PDFs, used to skip re-embedding unchanged files
+class DocumentRegistry(Base):
+    __tablename__ = "document_registry"
+
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String, unique=True, index=True)
+    file_sha256 = Column(String(64), index=True)  # Hex digest of the PDF bytes
+    chunker_config = Column(JSON)  # Splitter name, chunk_size, chunk_overlap
+    embedding_model = Column(String)
+    chunk_count = Column(Integer, default=0)
+    indexed_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,62 @@
+"""
+Page-aware markdown chunking
+
+Splits converted pages into chunks that never cross a page boundary and tags
+each chunk with its page number and the heading path it belongs to.
+"""
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from langchain.text_splitter import MarkdownTextSplitter
+from langchain_core.documents import Document
+
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.*\S)\s*$")
+
+
+def _iter_sections(
+    markdown: str, heading_stack: List[Tuple[int, str]]
+) -> Iterator[Tuple[List[str], str]]:
+    """Yield (heading path, text) sections of a page.
+
+    ``heading_stack`` is updated in place so headings carry over to the
+    following pages.
+    """
+    lines: List[str] = []
+    path = [title for _, title in heading_stack]
+
+    for line in markdown.splitlines():
+        match = HEADING_RE.match(line)
+        if match:
+            if "".join(lines).strip():
+                yield path, "\n".join(lines)
+            level = len(match.group(1))
+            while heading_stack and heading_stack[-1][0] >= level:
+                heading_stack.pop()
+            heading_stack.append((level, match.group(2)))
+            path = [title for _, title in heading_stack]
+            lines = [line]
+        else:
+            lines.append(line)
+
+    if "".join(lines).strip():
+        yield path, "\n".join(lines)
+
+
+def iter_page_chunks(
+    pages: Iterable[Dict[str, Any]], chunk_size: int, chunk_overlap: int
+) -> Iterator[Document]:
+    """Chunk pages one at a time, adding ``page``, ``headings`` and ``section`` metadata"""
+    splitter = MarkdownTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    heading_stack: List[Tuple[int, str]] = []
+
+    for page in pages:
+        for headings, text in _iter_sections(page["markdown"], heading_stack):
+            for chunk_text in splitter.split_text(text):
+                yield Document(
+                    page_content=chunk_text,
+                    metadata={
+                        "page": page["page_no"],
+                        "headings": headings,
+                        "section": " > ".join(headings),
+                    },
+                )
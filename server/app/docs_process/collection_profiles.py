@@ -0,0 +1,145 @@
+"""
+Qdrant collection profiles
+
+A profile bundles the HNSW graph settings, the search-time ``hnsw_ef``,
+optional int8 scalar or binary quantization (with rescoring against the
+original vectors) and whether the original vectors live on disk. Profiles are
+applied when a collection is created and on every search; the active one is
+chosen with COLLECTION_PROFILE.
+
+With quantization and on-disk originals only the compact quantized vectors
+and the HNSW graph stay in RAM, which matters on a memory-bound Qdrant node.
+"""
+import logging
+from typing import Any, Dict, Optional
+
+from qdrant_client.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Distance,
+    HnswConfigDiff,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
+)
+
+from app.utils.config import COLLECTION_PROFILE
+
+logger = logging.getLogger(__name__)
+
+PROFILES: Dict[str, Dict[str, Any]] = {
+    # Qdrant defaults: float32 vectors in RAM
+    "default": {
+        "m": 16,
+        "ef_construct": 100,
+        "hnsw_ef": None,
+        "quantization": None,
+        "on_disk": False,
+    },
+    # Best recall, most memory
+    "high_recall": {
+        "m": 32,
+        "ef_construct": 256,
+        "hnsw_ef": 256,
+        "quantization": None,
+        "on_disk": False,
+    },
+    # int8 vectors in RAM (4x smaller), originals on disk for rescoring
+    "balanced": {
+        "m": 16,
+        "ef_construct": 128,
+        "hnsw_ef": 128,
+        "quantization": "scalar",
+        "oversampling": 2.0,
+        "on_disk": True,
+    },
+    # 1-bit vectors in RAM (32x smaller), needs large embeddings and oversampling
+    "memory_saver": {
+        "m": 16,
+        "ef_construct": 100,
+        "hnsw_ef": 128,
+        "quantization": "binary",
+        "oversampling": 3.0,
+        "on_disk": True,
+    },
+}
+
+
+def get_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """Profile settings by name (defaults to COLLECTION_PROFILE)"""
+    name = name or COLLECTION_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown collection profile '{name}', choose from {', '.join(PROFILES)}")
+    return PROFILES[name]
+
+
+def build_quantization_config(profile: Dict[str, Any]):
+    if profile["quantization"] == "scalar":
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if profile["quantization"] == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def build_collection_config(
+    vector_size: int, profile_name: Optional[str] = None, distance: Distance = Distance.COSINE
+) -> Dict[str, Any]:
+    """Keyword arguments for ``client.create_collection`` for a profile"""
+    profile = get_profile(profile_name)
+    return {
+        "vectors_config": VectorParams(
+            size=vector_size, distance=distance, on_disk=profile["on_disk"]
+        ),
+        "hnsw_config": HnswConfigDiff(m=profile["m"], ef_construct=profile["ef_construct"]),
+        "quantization_config": build_quantization_config(profile),
+    }
+
+
+def build_search_params(profile_name: Optional[str] = None) -> Optional[SearchParams]:
+    """Search-time parameters for a profile (None means server defaults)"""
+    profile = get_profile(profile_name)
+    quantization = None
+    if profile["quantization"]:
+        quantization = QuantizationSearchParams(
+            rescore=True, oversampling=profile.get("oversampling")
+        )
+    if profile["hnsw_ef"] is None and quantization is None:
+        return None
+    return SearchParams(hnsw_ef=profile["hnsw_ef"], quantization=quantization)
+
+
+def create_collection(
+    client,
+    collection_name: str,
+    vector_size: int,
+    profile_name: Optional[str] = None,
+    distance: Distance = Distance.COSINE,
+):
+    """Create a collection with the profile's HNSW, quantization and storage settings"""
+    client.create_collection(
+        collection_name=collection_name,
+        **build_collection_config(vector_size, profile_name, distance),
+    )
+    logger.info(
+        f"Created collection {collection_name} ({vector_size} dimensions, "
+        f"profile {profile_name or COLLECTION_PROFILE})"
+    )
+
+
+def estimate_memory_bytes(points: int, vector_size: int, profile_name: Optional[str] = None) -> Dict[str, int]:
+    """Rough RAM and disk footprint of the vectors (HNSW graph excluded)"""
+    profile = get_profile(profile_name)
+    original = points * vector_size * 4
+    quantized = {
+        "scalar": points * vector_size,
+        "binary": points * vector_size // 8,
+    }.get(profile["quantization"], 0)
+    return {
+        "ram_bytes": quantized + (0 if profile["on_disk"] else original),
+        "disk_bytes": original if profile["on_disk"] else 0,
+    }
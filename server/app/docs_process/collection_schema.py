@@ -0,0 +1,126 @@
+"""
+Qdrant collection schema helpers
+
+Payload indexes for the fields used by per-file admin operations, filter
+based deletes and paginated scrolling, so those operations stay fast and
+complete no matter how many chunks a file has.
+"""
+import logging
+from typing import Any, Iterator, List, Optional, Union
+
+from qdrant_client.models import (
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    MatchValue,
+    PayloadSchemaType,
+    TextIndexParams,
+    TextIndexType,
+    TokenizerType,
+)
+
+logger = logging.getLogger(__name__)
+
+# Payload fields filtered on by ingestion, dedup, the PDF admin endpoints and
+# scoped retrieval (search_filters)
+PAYLOAD_INDEXES = {
+    "metadata.filename": PayloadSchemaType.KEYWORD,
+    "metadata.category": PayloadSchemaType.KEYWORD,
+    # Thai has no spaces between words, so sections need a segmenting tokenizer
+    "metadata.section": TextIndexParams(
+        type=TextIndexType.TEXT, tokenizer=TokenizerType.MULTILINGUAL, lowercase=True
+    ),
+    "metadata.indexed_at": PayloadSchemaType.DATETIME,
+    "metadata.source": PayloadSchemaType.KEYWORD,
+    "metadata.simhash_bands": PayloadSchemaType.KEYWORD,
+    "metadata.sources[].filename": PayloadSchemaType.KEYWORD,
+}
+
+SCROLL_PAGE_SIZE = 256
+UPSERT_BATCH_SIZE = 256
+
+# Collections whose indexes were already checked by this process
+_ensured = set()
+
+
+def ensure_payload_indexes(client, collection_name: str) -> List[str]:
+    """Create missing payload indexes; returns the fields that were added"""
+    if collection_name in _ensured:
+        return []
+
+    existing = client.get_collection(collection_name).payload_schema or {}
+    created = []
+    for field_name, schema in PAYLOAD_INDEXES.items():
+        if field_name in existing:
+            continue
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=schema,
+            wait=True,
+        )
+        created.append(field_name)
+
+    if created:
+        logger.info(f"Created payload indexes on {collection_name}: {', '.join(created)}")
+    _ensured.add(collection_name)
+    return created
+
+
+def file_filter(filename: str) -> Filter:
+    """Filter matching all points of a file"""
+    return Filter(
+        must=[FieldCondition(key="metadata.filename", match=MatchValue(value=filename))]
+    )
+
+
+def iter_points(
+    client,
+    collection_name: str,
+    scroll_filter: Optional[Filter] = None,
+    with_payload: Union[bool, List[str]] = False,
+    page_size: int = SCROLL_PAGE_SIZE,
+) -> Iterator[Any]:
+    """Scroll through all matching points page by page"""
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            scroll_filter=scroll_filter,
+            limit=page_size,
+            offset=offset,
+            with_payload=with_payload,
+            with_vectors=False,
+        )
+        yield from points
+        if offset is None:
+            break
+
+
+def count_points(client, collection_name: str, scroll_filter: Optional[Filter] = None) -> int:
+    return client.count(
+        collection_name=collection_name, count_filter=scroll_filter, exact=True
+    ).count
+
+
+def delete_by_filter(client, collection_name: str, points_filter: Filter) -> int:
+    """Delete every point matching the filter server-side; returns the deleted count"""
+    count = count_points(client, collection_name, points_filter)
+    if count:
+        client.delete(
+            collection_name=collection_name,
+            points_selector=FilterSelector(filter=points_filter),
+            wait=True,
+        )
+    return count
+
+
+def upsert_points(client, collection_name: str, points: List[Any], batch_size: int = UPSERT_BATCH_SIZE) -> int:
+    """Upsert points in a few large requests instead of one per point"""
+    for i in range(0, len(points), batch_size):
+        client.upsert(
+            collection_name=collection_name,
+            points=points[i : i + batch_size],
+            wait=True,
+        )
+    return len(points)
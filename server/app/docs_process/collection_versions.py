@@ -0,0 +1,334 @@
+"""
+Blue/green collection versions
+
+``COLLECTION_NAME`` is a Qdrant alias pointing at a versioned collection
+(``{COLLECTION_NAME}__{timestamp}``). A full re-index builds a new version in
+the background, validates it with probe queries and then switches the alias in
+a single atomic call, so queries never see a partially filled collection.
+Older versions are kept for rollback until they are garbage-collected.
+
+A plain collection still using the ``COLLECTION_NAME`` (before the first
+rebuild) is first copied into a version of its own, so it can be rolled back
+to like any other version.
+"""
+import os
+import time
+import random
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.docs_process.collection_profiles import create_collection
+from app.docs_process.collection_schema import SCROLL_PAGE_SIZE, ensure_payload_indexes
+from app.utils.config import (
+    COLLECTION_NAME,
+    REINDEX_KEEP_COLLECTIONS,
+    REINDEX_PROBE_COUNT,
+)
+
+logger = logging.getLogger(__name__)
+
+VERSION_SEPARATOR = "__"
+
+# Share of probe chunks that must find themselves in the top results
+MIN_PROBE_HIT_RATE = 0.8
+PROBE_TOP_K = 10
+
+
+def get_client():
+    """Shared, pooled Qdrant client"""
+    from app.utils.clients import get_qdrant_client
+
+    return get_qdrant_client()
+
+
+def get_alias_target(client, alias: str = COLLECTION_NAME) -> Optional[str]:
+    """Collection the alias points to, or None if the alias does not exist"""
+    for item in client.get_aliases().aliases:
+        if item.alias_name == alias:
+            return item.collection_name
+    return None
+
+
+def resolve_collection(client, name: str = COLLECTION_NAME) -> Optional[str]:
+    """Real collection behind a name (alias or plain collection), None if missing"""
+    target = get_alias_target(client, name)
+    if target:
+        return target
+    return name if client.collection_exists(name) else None
+
+
+def list_versions(client, alias: str = COLLECTION_NAME) -> List[str]:
+    """Versioned collections for the alias, newest first"""
+    prefix = f"{alias}{VERSION_SEPARATOR}"
+    names = [
+        c.name
+        for c in client.get_collections().collections
+        if c.name.startswith(prefix) and c.name[len(prefix):].isdigit()
+    ]
+    return sorted(names, reverse=True)
+
+
+def _new_version_name(client, alias: str) -> str:
+    while True:
+        name = f"{alias}{VERSION_SEPARATOR}{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+        if not client.collection_exists(name):
+            return name
+        time.sleep(1)
+
+
+def copy_collection(client, source: str, target: str, batch_size: int = SCROLL_PAGE_SIZE) -> int:
+    """Copy all points (vectors and payloads) into an existing collection"""
+    from qdrant_client.models import PointStruct
+
+    copied = 0
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=source,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        if points:
+            client.upsert(
+                collection_name=target,
+                points=[
+                    PointStruct(id=point.id, vector=point.vector, payload=point.payload)
+                    for point in points
+                ],
+                wait=True,
+            )
+            copied += len(points)
+        if offset is None:
+            return copied
+
+
+def migrate_legacy_collection(client, alias: str = COLLECTION_NAME) -> Optional[str]:
+    """Turn a plain collection named like the alias into a version behind the alias.
+
+    The points are copied into a new version first; the plain collection is
+    only dropped once the copy is complete (an alias cannot share its name
+    with a collection) and the alias is created right after. Returns the
+    version name, or None when there is nothing to migrate.
+    """
+    from qdrant_client.models import CreateAlias, CreateAliasOperation
+
+    from app.docs_process.embeddings import get_collection_vector_size
+
+    if get_alias_target(client, alias) or not client.collection_exists(alias):
+        return None
+
+    name = _new_version_name(client, alias)
+    create_collection(client, name, get_collection_vector_size(client, alias))
+    ensure_payload_indexes(client, name)
+    try:
+        copied = copy_collection(client, alias, name)
+        expected = client.count(collection_name=alias, exact=True).count
+        if copied != expected:
+            raise ValueError(f"Copied {copied} of {expected} points from {alias}")
+    except Exception:
+        client.delete_collection(name)
+        raise
+
+    client.delete_collection(alias)
+    try:
+        client.update_collection_aliases(
+            change_aliases_operations=[
+                CreateAliasOperation(create_alias=CreateAlias(collection_name=name, alias_name=alias))
+            ]
+        )
+    except Exception:
+        logger.error(f"Could not create alias {alias}; the legacy points are kept in {name}")
+        raise
+    logger.info(f"Migrated legacy collection {alias} ({copied} points) to version {name}")
+    return name
+
+
+def create_version(client, vector_size: int, alias: str = COLLECTION_NAME) -> str:
+    """Create an empty versioned collection (active profile) for a rebuild"""
+    # A legacy collection becomes the version before this one
+    migrate_legacy_collection(client, alias)
+    name = _new_version_name(client, alias)
+    create_collection(client, name, vector_size)
+    ensure_payload_indexes(client, name)
+    return name
+
+
+def _probe_text(text: str) -> str:
+    """First half of a chunk, so a probe is a query and not the indexed text itself"""
+    return text[: max(len(text) // 2, 1)]
+
+
+def validate_version(client, name: str, embeddings, expected_points: int):
+    """Check point count and run retrieval probe queries.
+
+    Each probe embeds the first half of a stored chunk and must find that
+    chunk in the top results. ``embeddings`` should bypass the embedding
+    store, otherwise the probes only read back the vectors that were stored.
+    Raises ValueError when the collection is empty, incomplete or the probes
+    do not find their chunks.
+    """
+    points = client.count(collection_name=name, exact=True).count
+    if points == 0 or points != expected_points:
+        raise ValueError(f"{name} has {points} points, expected {expected_points}")
+
+    sample, _ = client.scroll(
+        collection_name=name,
+        limit=max(REINDEX_PROBE_COUNT * 10, 50),
+        with_payload=["page_content"],
+        with_vectors=False,
+    )
+    probes = random.sample(sample, min(REINDEX_PROBE_COUNT, len(sample)))
+    if not probes:
+        raise ValueError(f"{name} returned no points to probe")
+
+    hits = 0
+    for probe in probes:
+        vector = embeddings.embed_query(_probe_text(probe.payload["page_content"]))
+        result = client.query_points(
+            collection_name=name, query=vector, limit=PROBE_TOP_K, with_payload=False
+        )
+        if any(point.id == probe.id for point in result.points):
+            hits += 1
+
+    hit_rate = hits / len(probes)
+    logger.info(f"Probe queries on {name}: {hits}/{len(probes)} found their chunk")
+    if hit_rate < MIN_PROBE_HIT_RATE:
+        raise ValueError(f"Probe queries failed on {name}: hit rate {hit_rate:.0%}")
+
+
+def switch_alias(client, target: str, alias: str = COLLECTION_NAME) -> Optional[str]:
+    """Point the alias at ``target`` atomically; returns the previous target.
+
+    A plain collection still using the alias name (before the first rebuild)
+    is migrated to a version first, see ``migrate_legacy_collection``.
+    """
+    from qdrant_client.models import (
+        CreateAlias,
+        CreateAliasOperation,
+        DeleteAlias,
+        DeleteAliasOperation,
+    )
+
+    previous = get_alias_target(client, alias) or migrate_legacy_collection(client, alias)
+    operations = []
+    if previous:
+        operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias)))
+    operations.append(
+        CreateAliasOperation(create_alias=CreateAlias(collection_name=target, alias_name=alias))
+    )
+
+    client.update_collection_aliases(change_aliases_operations=operations)
+    logger.info(f"Alias {alias} now points to {target} (was {previous})")
+    return previous
+
+
+def rollback(client, alias: str = COLLECTION_NAME) -> str:
+    """Point the alias back at the newest version older than the current one"""
+    current = get_alias_target(client, alias)
+    older = [name for name in list_versions(client, alias) if current is None or name < current]
+    if not older:
+        raise ValueError("No older collection version to roll back to")
+    switch_alias(client, older[0], alias)
+    return older[0]
+
+
+def garbage_collect(
+    client, keep: int = REINDEX_KEEP_COLLECTIONS, alias: str = COLLECTION_NAME
+) -> List[str]:
+    """Delete old versions, keeping the live one plus ``keep`` previous ones"""
+    current = get_alias_target(client, alias)
+    candidates = [name for name in list_versions(client, alias) if name != current]
+    deleted = []
+    for name in candidates[keep:]:
+        client.delete_collection(name)
+        deleted.append(name)
+    if deleted:
+        logger.info(f"Deleted old collections: {', '.join(deleted)}")
+    return deleted
+
+
+def rebuild_collection(
+    pdf_dir: str,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+    source: str = "rebuild",
+) -> Dict[str, Any]:
+    """Re-index every PDF in ``pdf_dir`` into a new version and swap it in.
+
+    The live collection keeps serving queries until validation passed. The
+    document registry is only updated after the swap.
+    """
+    from app.docs_process import registry
+    from app.docs_process.embeddings import (
+        get_embedding_dimensions,
+        get_embedding_signature,
+        get_embeddings,
+    )
+    from app.docs_process.index_status import index_status
+    from app.docs_process.local_index import local_index
+    from app.docs_process.ingestion import get_chunker_config, index_pdf, resolve_chunking
+    from app.utils.database import SessionLocal
+
+    # Resolved once so every file of the new version uses the same settings
+    chunk_size, chunk_overlap = resolve_chunking(chunk_size, chunk_overlap)
+
+    client = get_client()
+    # Probes must not be served from the embedding store
+    embeddings = get_embeddings(cached=False)
+    vector_size = get_embedding_dimensions() or len(embeddings.embed_query("dimension probe"))
+    target = create_version(client, vector_size)
+
+    files = sorted(f for f in os.listdir(pdf_dir) if f.lower().endswith(".pdf"))
+    results = {}
+    try:
+        for filename in files:
+            results[filename] = index_pdf(
+                os.path.join(pdf_dir, filename),
+                filename,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                source=source,
+                force=True,
+                collection_name=target,
+                record=False,
+            )
+
+        expected = sum(result["chunk_count"] for result in results.values())
+        validate_version(client, target, embeddings, expected)
+    except Exception:
+        # Drop the half-filled version; the live collection is untouched
+        client.delete_collection(target)
+        raise
+    previous = switch_alias(client, target)
+
+    chunker_config = get_chunker_config(chunk_size, chunk_overlap)
+    db = SessionLocal()
+    try:
+        for filename, result in results.items():
+            registry.record_indexed(
+                db,
+                filename=filename,
+                file_sha256=result["file_sha256"],
+                chunker_config=chunker_config,
+                embedding_model=get_embedding_signature(),
+                chunk_count=result["chunk_count"],
+                indexed_at=result["indexed_at"],
+            )
+        for filename in set(registry.get_entries_by_filename(db)) - set(results):
+            registry.remove_entry(db, filename)
+    finally:
+        db.close()
+    index_status.invalidate()
+    local_index.invalidate()
+
+    deleted = garbage_collect(client)
+    return {
+        "collection": target,
+        "previous_collection": previous,
+        "files": len(files),
+        "points": expected,
+        "deleted_collections": deleted,
+    }
@@ -0,0 +1,145 @@
+"""
+On-disk cache of Docling conversions
+
+Entries hold the per-page markdown (one JSON line per page, gzip) and are keyed
+by the PDF hash and converter options, so changing chunking parameters never
+requires reconverting a PDF. Pages can be written and read one at a time, so
+page-streaming ingestion never holds a whole document. The cache is bounded by
+total size; the least recently used entries are evicted first.
+"""
+import os
+import gzip
+import json
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from app.utils.config import CONVERSION_CACHE_PATH, CONVERSION_CACHE_MAX_MB
+
+logger = logging.getLogger(__name__)
+
+ENTRY_SUFFIX = ".jsonl.gz"
+# Whole-document JSON entries written by earlier versions, dropped on eviction
+LEGACY_SUFFIX = ".json.gz"
+
+
+def make_cache_key(file_sha256: str, options: Dict[str, Any]) -> str:
+    """Combine the file hash and converter options into a cache key"""
+    fingerprint = json.dumps(options, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(f"{file_sha256}\x00{fingerprint}".encode("utf-8")).hexdigest()
+
+
+class ConversionCache:
+    """Size-bounded LRU cache of conversion results stored as gzip JSON"""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}{ENTRY_SUFFIX}")
+
+    def iter_pages(self, key: str) -> Optional[Iterator[Dict[str, Any]]]:
+        """Iterator over the cached pages (page_no + markdown), None if not cached"""
+        entry_path = self._entry_path(key)
+        if not os.path.exists(entry_path):
+            return None
+        # Touch the entry so eviction treats it as recently used
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return self._read_pages(entry_path)
+
+    def _read_pages(self, entry_path: str) -> Iterator[Dict[str, Any]]:
+        try:
+            with gzip.open(entry_path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Dropping unreadable conversion cache entry {entry_path}: {e}")
+            self._remove(entry_path)
+            raise
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached conversion (markdown, pages, page_count) or None"""
+        pages = self.iter_pages(key)
+        if pages is None:
+            return None
+        try:
+            pages = list(pages)
+        except (OSError, ValueError):
+            return None
+        return {
+            "markdown": "\n\n".join(page["markdown"] for page in pages),
+            "pages": pages,
+            "page_count": len(pages),
+        }
+
+    @contextmanager
+    def writer(self, key: str) -> Iterator[Callable[[Dict[str, Any]], None]]:
+        """Write an entry page by page; it only becomes visible when the block succeeds"""
+        entry_path = self._entry_path(key)
+        tmp_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        f = gzip.open(tmp_path, "wt", encoding="utf-8")
+
+        def write(page: Dict[str, Any]):
+            f.write(json.dumps(page, ensure_ascii=False) + "\n")
+
+        try:
+            yield write
+            f.close()
+            os.replace(tmp_path, entry_path)
+        except BaseException:
+            f.close()
+            self._remove(tmp_path)
+            raise
+        self.evict()
+
+    def put(self, key: str, data: Dict[str, Any]):
+        """Store a conversion and evict old entries if the cache is too large"""
+        with self.writer(key) as write:
+            for page in data["pages"]:
+                write(page)
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes"""
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.path):
+                entry_path = os.path.join(self.path, name)
+                if name.endswith(LEGACY_SUFFIX):
+                    self._remove(entry_path)
+                    continue
+                if not name.endswith(ENTRY_SUFFIX):
+                    continue
+                try:
+                    stat = os.stat(entry_path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry_path))
+                total += stat.st_size
+
+            entries.sort()
+            while total > self.max_bytes and entries:
+                _, size, entry_path = entries.pop(0)
+                self._remove(entry_path)
+                total -= size
+                logger.info(f"Evicted conversion cache entry {os.path.basename(entry_path)}")
+
+    @staticmethod
+    def _remove(entry_path: str):
+        try:
+            os.remove(entry_path)
+        except FileNotFoundError:
+            pass
+
+
+conversion_cache = ConversionCache(
+    CONVERSION_CACHE_PATH, CONVERSION_CACHE_MAX_MB * 1024 * 1024
+)
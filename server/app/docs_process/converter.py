@@ -0,0 +1,218 @@
+"""
+PDF to markdown conversion with Docling
+
+All ingestion paths convert PDFs through ``convert_pdf`` so results can be
+served from the on-disk conversion cache instead of re-running Docling.
+
+``iter_pdf_pages`` converts a window of pages at a time and yields pages as
+soon as they are ready, so memory stays bounded for very large manuals.
+
+Before converting, the PDF is profiled: pages with an extractable text layer
+use a light pipeline without OCR and table-structure models, and only scanned
+pages (plus short text runs between them) go through the full pipeline.
+"""
+import time
+import logging
+from importlib import metadata
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.docs_process.conversion_cache import conversion_cache, make_cache_key
+from app.docs_process.converter_pool import converter_pool
+from app.docs_process.pdf_profile import (
+    PIPELINE_FULL,
+    PIPELINE_TEXT,
+    count_pages,
+    plan_conversion,
+    profile_pdf,
+    split_runs,
+)
+from app.docs_process.registry import compute_file_sha256
+from app.utils.config import CONVERTER_FAST_PATH, PAGE_STREAM_WINDOW
+
+logger = logging.getLogger(__name__)
+
+# Converters built in this process, keyed by pipeline name
+_converters: Dict[str, Any] = {}
+
+
+def get_converter_options() -> Dict[str, Any]:
+    """Options that change the conversion output (part of the cache key)"""
+    try:
+        docling_version = metadata.version("docling")
+    except metadata.PackageNotFoundError:
+        docling_version = "unknown"
+    return {
+        "converter": "docling",
+        "docling_version": docling_version,
+        "export": "markdown",
+        "fast_path": CONVERTER_FAST_PATH,
+    }
+
+
+def build_converter(pipeline: str):
+    """Build a DocumentConverter for the given pipeline"""
+    # Import here to keep Docling out of module import time
+    from docling.datamodel.base_models import InputFormat
+    from docling.datamodel.pipeline_options import PdfPipelineOptions
+    from docling.document_converter import DocumentConverter, PdfFormatOption
+
+    if pipeline == PIPELINE_TEXT:
+        pipeline_options = PdfPipelineOptions(do_ocr=False, do_table_structure=False)
+    else:
+        pipeline_options = PdfPipelineOptions()
+
+    return DocumentConverter(
+        format_options={InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)}
+    )
+
+
+def get_converter(pipeline: str):
+    """Get (and cache) the converter for a pipeline in this process"""
+    if pipeline not in _converters:
+        _converters[pipeline] = build_converter(pipeline)
+    return _converters[pipeline]
+
+
+def export_document(document) -> Dict[str, Any]:
+    """Export a Docling document and each of its pages as markdown"""
+    pages = [
+        {"page_no": page_no, "markdown": document.export_to_markdown(page_no=page_no)}
+        for page_no in sorted(document.pages)
+    ]
+    return {
+        "markdown": document.export_to_markdown(),
+        "pages": pages,
+        "page_count": len(pages),
+    }
+
+
+def convert_with(
+    converter, file_path: str, page_range: Optional[Tuple[int, int]] = None
+) -> Dict[str, Any]:
+    """Convert a whole file or an inclusive page range with a converter"""
+    if page_range:
+        result = converter.convert(file_path, page_range=page_range)
+    else:
+        result = converter.convert(file_path)
+    return export_document(result.document)
+
+
+def _convert_run(
+    file_path: str, pipeline: str, page_range: Optional[Tuple[int, int]]
+) -> Dict[str, Any]:
+    if converter_pool.enabled:
+        return converter_pool.convert(file_path, pipeline, page_range)
+    return convert_with(get_converter(pipeline), file_path, page_range)
+
+
+def run_conversion(file_path: str) -> Dict[str, Any]:
+    """Profile the PDF, then run Docling with the cheapest pipeline per page run"""
+    if not CONVERTER_FAST_PATH:
+        return _convert_run(file_path, PIPELINE_FULL, None)
+
+    profile = profile_pdf(file_path)
+    runs = plan_conversion(profile)
+    logger.info(
+        f"Page pipelines for {file_path}: "
+        + ", ".join(f"p{page['page_no']}={page['pipeline']}" for page in profile)
+    )
+
+    # Whole document on one pipeline: convert it in one call
+    if len(runs) <= 1:
+        pipeline = runs[0][0] if runs else PIPELINE_FULL
+        started = time.perf_counter()
+        converted = _convert_run(file_path, pipeline, None)
+        logger.info(
+            f"Pages 1-{len(profile)} via {pipeline} pipeline "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+        return converted
+
+    # Mixed document: convert each run separately and stitch the pages
+    pages: List[Dict[str, Any]] = []
+    for pipeline, start, end in runs:
+        started = time.perf_counter()
+        converted = _convert_run(file_path, pipeline, (start, end))
+        pages.extend(converted["pages"])
+        logger.info(
+            f"Pages {start}-{end} via {pipeline} pipeline "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+    pages.sort(key=lambda page: page["page_no"])
+    return {
+        "markdown": "\n\n".join(page["markdown"] for page in pages),
+        "pages": pages,
+        "page_count": len(pages),
+    }
+
+
+def convert_pdf(
+    file_path: str, file_sha256: Optional[str] = None, use_cache: bool = True
+) -> Dict[str, Any]:
+    """Convert a PDF to markdown, using the conversion cache when possible.
+
+    Returns a dict with ``markdown``, ``pages`` (page_no + markdown) and
+    ``page_count``.
+    """
+    file_sha256 = file_sha256 or compute_file_sha256(file_path)
+    cache_key = make_cache_key(file_sha256, get_converter_options())
+
+    if use_cache:
+        cached = conversion_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Conversion cache hit for {file_path}")
+            return cached
+
+    started = time.perf_counter()
+    converted = run_conversion(file_path)
+    logger.info(
+        f"Converted {file_path} ({converted['page_count']} pages) "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+    if use_cache:
+        conversion_cache.put(cache_key, converted)
+    return converted
+
+
+def iter_pdf_pages(
+    file_path: str, file_sha256: Optional[str] = None, window: int = PAGE_STREAM_WINDOW
+) -> Iterator[Dict[str, Any]]:
+    """Yield converted pages (page_no + markdown) window by window.
+
+    Cached conversions are replayed from the cache page by page; otherwise
+    Docling only ever holds ``window`` pages and every page is streamed into
+    the cache as it is produced (the entry is kept once the last page was
+    written).
+    """
+    file_sha256 = file_sha256 or compute_file_sha256(file_path)
+    cache_key = make_cache_key(file_sha256, get_converter_options())
+
+    cached = conversion_cache.iter_pages(cache_key)
+    if cached is not None:
+        logger.info(f"Conversion cache hit for {file_path}")
+        yield from cached
+        return
+
+    if CONVERTER_FAST_PATH:
+        profile = profile_pdf(file_path)
+        runs = plan_conversion(profile)
+        logger.info(
+            f"Page pipelines for {file_path}: "
+            + ", ".join(f"p{page['page_no']}={page['pipeline']}" for page in profile)
+        )
+    else:
+        runs = [(PIPELINE_FULL, 1, count_pages(file_path))]
+
+    with conversion_cache.writer(cache_key) as write:
+        for pipeline, start, end in split_runs(runs, max(window, 1)):
+            started = time.perf_counter()
+            converted = _convert_run(file_path, pipeline, (start, end))
+            logger.info(
+                f"Pages {start}-{end} via {pipeline} pipeline "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+            for page in converted["pages"]:
+                write(page)
+                yield page
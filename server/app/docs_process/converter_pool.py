@@ -0,0 +1,111 @@
+"""
+Pool of long-lived Docling worker processes
+
+Each worker builds its ``DocumentConverter`` instances once (loading the layout
+and OCR models) and then serves many files. Workers are recycled after a
+configurable number of conversions to cap memory growth, and the API process
+never imports Docling itself.
+"""
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Any, Dict, Optional, Tuple
+
+from app.utils.config import CONVERTER_POOL_SIZE, CONVERTER_MAX_TASKS_PER_WORKER
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker():
+    """Build the converters once per worker process"""
+    from app.docs_process.converter import get_converter
+    from app.docs_process.pdf_profile import PIPELINE_FULL, PIPELINE_TEXT
+
+    for pipeline in (PIPELINE_TEXT, PIPELINE_FULL):
+        get_converter(pipeline)
+    logging.getLogger(__name__).info("Docling converters loaded in worker process")
+
+
+def _convert_in_worker(
+    file_path: str, pipeline: str, page_range: Optional[Tuple[int, int]]
+) -> Dict[str, Any]:
+    """Convert a file (or page range) with the worker's warm converter"""
+    from app.docs_process.converter import convert_with, get_converter
+
+    return convert_with(get_converter(pipeline), file_path, page_range)
+
+
+class ConverterPool:
+    """Lazily started process pool that runs Docling conversions"""
+
+    def __init__(self, size: int, max_tasks_per_worker: int):
+        self.size = size
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # "spawn" keeps workers free of the parent's memory and threads;
+                # max_tasks_per_child recycles a worker after N conversions.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.size,
+                    mp_context=get_context("spawn"),
+                    initializer=_init_worker,
+                    max_tasks_per_child=self.max_tasks_per_worker or None,
+                )
+                logger.info(
+                    f"Started converter pool: {self.size} workers, "
+                    f"recycled every {self.max_tasks_per_worker} files"
+                )
+            return self._executor
+
+    def _reset(self, executor: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def convert(
+        self,
+        file_path: str,
+        pipeline: str = "full",
+        page_range: Optional[Tuple[int, int]] = None,
+    ) -> Dict[str, Any]:
+        """Convert a PDF in a worker process (blocks until the result is ready)"""
+        executor = self._get_executor()
+        try:
+            return executor.submit(_convert_in_worker, file_path, pipeline, page_range).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a huge scan): restart the pool once
+            logger.warning(f"Converter pool broke while converting {file_path}, restarting")
+            self._reset(executor)
+            return (
+                self._get_executor()
+                .submit(_convert_in_worker, file_path, pipeline, page_range)
+                .result()
+            )
+
+    def resize(self, size: int):
+        """Change the number of workers (running workers are stopped first)"""
+        if size != self.size:
+            self.shutdown()
+            self.size = size
+
+    def shutdown(self):
+        """Stop all worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+            logger.info("Converter pool stopped")
+
+
+converter_pool = ConverterPool(CONVERTER_POOL_SIZE, CONVERTER_MAX_TASKS_PER_WORKER)
@@ -0,0 +1,314 @@
+"""
+Near-duplicate chunk detection
+
+Each chunk gets a 64-bit SimHash over character 4-grams (Thai text has no
+word spaces). The hash is split into ``DEDUP_MAX_DISTANCE + 1`` bands, so two
+chunks within the allowed Hamming distance always share at least one band;
+band keys are stored in the point payload and used to find candidates in
+Qdrant without a vector search.
+
+Chunks whose numbers differ (amounts, rates, dates, section numbers) are
+never duplicates, however close their hashes: two rate tables that differ
+only in baht amounts are a few bits apart. The digit sequences are compared
+through a short digest stored next to the SimHash; stored points without one
+are not matched.
+
+A duplicate is not embedded again. Instead its file, page and the rest of its
+owner metadata (section, category, ...) are appended to the ``sources`` list
+of the point that already holds the text. When the owning file is deleted the
+point is handed to the next source together with that source's metadata.
+"""
+import re
+import uuid
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from qdrant_client.models import FieldCondition, Filter, MatchAny, MatchValue, PointIdsList
+
+from app.docs_process.collection_schema import delete_by_filter, file_filter, iter_points
+from app.docs_process.collection_versions import resolve_collection
+from app.docs_process.search_filters import categorize_filename
+from app.utils.config import COLLECTION_NAME, DEDUP_MAX_DISTANCE
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 4
+DELETE_BATCH_SIZE = 256
+HASH_BITS = 64
+WHITESPACE_RE = re.compile(r"\s+")
+# Unicode digits, so Thai numerals count as well
+DIGITS_RE = re.compile(r"\d+")
+
+# Metadata that belongs to the file a point was found in
+OWNER_FIELDS = ("filename", "page", "section", "headings", "category", "indexed_at", "source")
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of the text's character shingles"""
+    text = WHITESPACE_RE.sub(" ", text).strip().lower()
+    if len(text) <= SHINGLE_SIZE:
+        shingles = [text]
+    else:
+        shingles = [text[i : i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)]
+
+    hashes = np.array(
+        [
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+            for s in shingles
+        ],
+        dtype=">u8",
+    )
+    # One row of 64 bits per shingle; each bit votes +1 / -1
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1)
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)
+    return int.from_bytes(np.packbits(votes > 0).tobytes(), "big")
+
+
+def number_digest(text: str) -> str:
+    """Digest of the digit sequences in the text, in order"""
+    numbers = ",".join(DIGITS_RE.findall(text))
+    return hashlib.blake2b(numbers.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def band_keys(fingerprint: int, max_distance: int = DEDUP_MAX_DISTANCE) -> List[str]:
+    """Split a fingerprint into max_distance + 1 bands (pigeonhole principle)"""
+    bands = max_distance + 1
+    width = HASH_BITS // bands
+    keys = []
+    for i in range(bands):
+        start = i * width
+        end = HASH_BITS if i == bands - 1 else start + width
+        value = (fingerprint >> (HASH_BITS - end)) & ((1 << (end - start)) - 1)
+        keys.append(f"{i}:{value:x}")
+    return keys
+
+
+def make_source(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: metadata.get(field) for field in OWNER_FIELDS if field in metadata}
+
+
+def add_source(metadata: Dict[str, Any], source: Dict[str, Any]) -> bool:
+    """Add a source to a point's metadata, replacing an older entry for the same
+    file and page; returns False if nothing changed"""
+    sources = metadata.setdefault("sources", [make_source(metadata)])
+    key = (source.get("filename"), source.get("page"))
+    for i, existing in enumerate(sources):
+        if (existing.get("filename"), existing.get("page")) == key:
+            if existing == source:
+                return False
+            sources[i] = source
+            return True
+    sources.append(source)
+    return True
+
+
+def hand_over(metadata: Dict[str, Any], source: Dict[str, Any]):
+    """Make ``source`` the owner of a shared point's metadata"""
+    for field in OWNER_FIELDS:
+        if field in source:
+            metadata[field] = source[field]
+        elif field != "category":
+            # Sources stored before owner metadata was kept: drop the old owner's values
+            metadata.pop(field, None)
+    if "category" not in source:
+        metadata["category"] = categorize_filename(source.get("filename") or "")
+
+
+class ChunkDeduplicator:
+    """Collapses near-duplicate chunks within one ingestion run and against Qdrant"""
+
+    def __init__(
+        self,
+        client=None,
+        collection_name: str = COLLECTION_NAME,
+        max_distance: int = DEDUP_MAX_DISTANCE,
+        exclude_filename: Optional[str] = None,
+    ):
+        if client is None:
+            from app.utils.clients import get_qdrant_client
+
+            client = get_qdrant_client()
+        self.client = client
+        self.collection_name = collection_name
+        self.max_distance = max_distance
+        # Stored points of this file are being replaced, so they are no candidates
+        self.exclude_filename = exclude_filename
+        self.duplicate_count = 0
+        # band key -> [(fingerprint, number digest, point id)]
+        self._bands: Dict[str, List[Tuple[int, Optional[str], str]]] = {}
+        # point id -> metadata of points seen in this run
+        self._points: Dict[str, Dict[str, Any]] = {}
+        # points whose sources changed after they were stored
+        self._dirty: Dict[str, Dict[str, Any]] = {}
+        self._stored = set()
+
+    def _index(self, point_id: str, fingerprint: int, metadata: Dict[str, Any]):
+        self._points[point_id] = metadata
+        numbers = metadata.get("number_digest")
+        for key in band_keys(fingerprint, self.max_distance):
+            self._bands.setdefault(key, []).append((fingerprint, numbers, point_id))
+
+    def _find(self, fingerprint: int, numbers: str) -> Optional[str]:
+        for key in band_keys(fingerprint, self.max_distance):
+            for other, other_numbers, point_id in self._bands.get(key, []):
+                if other_numbers == numbers and hamming(fingerprint, other) <= self.max_distance:
+                    return point_id
+        return None
+
+    def _load_candidates(self, keys: List[str]):
+        """Pull stored points sharing any band key into the in-memory index"""
+        collection_name = resolve_collection(self.client, self.collection_name)
+        if collection_name is None:
+            return
+        bands_filter = Filter(
+            must=[FieldCondition(key="metadata.simhash_bands", match=MatchAny(any=keys))]
+        )
+        for point in iter_points(
+            self.client, collection_name, bands_filter, with_payload=["metadata"]
+        ):
+            point_id = str(point.id)
+            metadata = (point.payload or {}).get("metadata") or {}
+            if point_id in self._points or not metadata.get("simhash"):
+                continue
+            if self.exclude_filename and metadata.get("filename") == self.exclude_filename:
+                continue
+            self._stored.add(point_id)
+            self._index(point_id, int(metadata["simhash"], 16), metadata)
+
+    def filter(self, chunks: List[Document]) -> List[Tuple[str, Document]]:
+        """Return (point id, chunk) pairs that still need embedding.
+
+        Chunks must already carry their final metadata (filename, page...).
+        Duplicates are folded into the ``sources`` of the matching point.
+        """
+        fingerprints = [simhash(chunk.page_content) for chunk in chunks]
+        keys = sorted({key for fp in fingerprints for key in band_keys(fp, self.max_distance)})
+        if keys:
+            self._load_candidates(keys)
+
+        unique = []
+        for chunk, fingerprint in zip(chunks, fingerprints):
+            numbers = number_digest(chunk.page_content)
+            match = self._find(fingerprint, numbers)
+            if match is not None:
+                self.duplicate_count += 1
+                metadata = self._points[match]
+                if add_source(metadata, make_source(chunk.metadata)) and match in self._stored:
+                    self._dirty[match] = metadata
+                continue
+
+            point_id = str(uuid.uuid4())
+            chunk.metadata["simhash"] = f"{fingerprint:016x}"
+            chunk.metadata["simhash_bands"] = band_keys(fingerprint, self.max_distance)
+            chunk.metadata["number_digest"] = numbers
+            chunk.metadata["sources"] = [make_source(chunk.metadata)]
+            self._index(point_id, fingerprint, chunk.metadata)
+            unique.append((point_id, chunk))
+        return unique
+
+    def mark_stored(self, point_ids: List[str]):
+        self._stored.update(point_ids)
+
+    def flush_sources(self):
+        """Write updated ``sources`` lists of already stored points to Qdrant"""
+        for point_id, metadata in self._dirty.items():
+            self.client.set_payload(
+                collection_name=self.collection_name,
+                payload={"metadata": metadata},
+                points=[point_id],
+            )
+        if self._dirty:
+            logger.info(f"Added duplicate sources to {len(self._dirty)} existing points")
+        self._dirty = {}
+
+
+def release_file(client, collection_name: str, filename: str) -> Dict[str, int]:
+    """Drop a file from the ``sources`` of shared points before it is deleted.
+
+    Points owned by the file but still used by other files are handed over to
+    the next source. Points used only by this file are left for the caller's
+    delete by ``metadata.filename``.
+    """
+    sources_filter = Filter(
+        must=[FieldCondition(key="metadata.sources[].filename", match=MatchValue(value=filename))]
+    )
+
+    updated = 0
+    for point in iter_points(client, collection_name, sources_filter, with_payload=["metadata"]):
+        metadata = (point.payload or {}).get("metadata") or {}
+        sources = [s for s in metadata.get("sources", []) if s.get("filename") != filename]
+        if not sources:
+            continue
+        metadata["sources"] = sources
+        if metadata.get("filename") == filename:
+            hand_over(metadata, sources[0])
+        client.set_payload(
+            collection_name=collection_name, payload={"metadata": metadata}, points=[point.id]
+        )
+        updated += 1
+
+    return {"updated": updated}
+
+
+def remove_file(
+    client,
+    collection_name: str,
+    filename: str,
+    keep_indexed_at: Optional[str] = None,
+    only_indexed_at: Optional[str] = None,
+) -> Dict[str, int]:
+    """Remove a file's vectors: shared points are handed over, its own points deleted.
+
+    With ``keep_indexed_at`` the entries of that indexing run stay (drop the
+    previous run after a re-index); with ``only_indexed_at`` only that run is
+    removed (clean up a failed re-index).
+    """
+    if keep_indexed_at is None and only_indexed_at is None:
+        released = release_file(client, collection_name, filename)
+        deleted = delete_by_filter(client, collection_name, file_filter(filename))
+        return {"updated": released["updated"], "deleted": deleted}
+
+    def is_removed(entry: Dict[str, Any]) -> bool:
+        if only_indexed_at is not None:
+            return entry.get("indexed_at") == only_indexed_at
+        return entry.get("indexed_at") != keep_indexed_at
+
+    file_points = Filter(
+        should=[
+            FieldCondition(key="metadata.filename", match=MatchValue(value=filename)),
+            FieldCondition(key="metadata.sources[].filename", match=MatchValue(value=filename)),
+        ]
+    )
+
+    updated, to_delete = 0, []
+    for point in iter_points(client, collection_name, file_points, with_payload=["metadata"]):
+        metadata = (point.payload or {}).get("metadata") or {}
+        old_sources = metadata.get("sources", [])
+        sources = [s for s in old_sources if s.get("filename") != filename or not is_removed(s)]
+        if metadata.get("filename") == filename and is_removed(metadata):
+            if not sources:
+                to_delete.append(point.id)
+                continue
+            hand_over(metadata, sources[0])
+        elif len(sources) == len(old_sources):
+            continue
+        metadata["sources"] = sources
+        client.set_payload(
+            collection_name=collection_name, payload={"metadata": metadata}, points=[point.id]
+        )
+        updated += 1
+
+    for i in range(0, len(to_delete), DELETE_BATCH_SIZE):
+        client.delete(
+            collection_name=collection_name,
+            points_selector=PointIdsList(points=to_delete[i : i + DELETE_BATCH_SIZE]),
+            wait=True,
+        )
+    return {"updated": updated, "deleted": len(to_delete)}
@@ -0,0 +1,247 @@
+"""
+Batched embedding service
+
+Embeds many texts with as few requests as possible: inputs are packed into
+batches bounded by a token budget and an input count, batches run
+concurrently up to a limit, and transient provider errors are retried with
+exponential backoff.
+
+Providers:
+- ``openai``: the OpenAI embeddings API (EMBEDDINGS_MODEL / EMBEDDINGS_DIMENSIONS)
+- ``local``: deterministic hashed character n-grams, for tests and offline
+  use (similar texts get similar vectors, no network needed)
+
+Its only caller is router_vector, which app.main does not mount (the router
+imports models that do not exist), so ingestion and retrieval do not use it.
+"""
+import abc
+import asyncio
+import hashlib
+import logging
+import random
+from typing import List, Optional
+
+import numpy as np
+
+from app.docs_process.embeddings import count_tokens, get_embedding_dimensions
+from app.utils.clients import get_async_openai_client, run_sync
+from app.utils.config import (
+    EMBEDDINGS_MODEL,
+    EMBEDDINGS_DIMENSIONS,
+    EMBEDDING_PROVIDER,
+    EMBED_MAX_BATCH_TOKENS,
+    EMBED_MAX_BATCH_SIZE,
+    EMBED_CONCURRENCY,
+    EMBED_MAX_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+# Backoff between retries: base * 2^attempt seconds (plus jitter), capped
+RETRY_BASE_SECONDS = 0.5
+RETRY_MAX_SECONDS = 30.0
+
+
+class EmbeddingProvider(abc.ABC):
+    """Interface for embedding backends"""
+
+    name = "base"
+    dimensions: int
+
+    @abc.abstractmethod
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch of texts, in order"""
+
+    def count_tokens(self, text: str) -> int:
+        return count_tokens(text)
+
+    def is_retryable(self, error: Exception) -> bool:
+        return False
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """OpenAI embeddings API"""
+
+    name = "openai"
+
+    def __init__(
+        self,
+        model: str = EMBEDDINGS_MODEL,
+        dimensions: Optional[int] = EMBEDDINGS_DIMENSIONS,
+    ):
+        import openai
+
+        self.model = model
+        self.requested_dimensions = dimensions
+        self.dimensions = dimensions or get_embedding_dimensions()
+        self._retryable = (
+            openai.RateLimitError,
+            openai.APIConnectionError,
+            openai.APITimeoutError,
+            openai.InternalServerError,
+        )
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        options = {"dimensions": self.requested_dimensions} if self.requested_dimensions else {}
+        # Shared pooled client; retries are handled by EmbeddingService
+        client = get_async_openai_client().with_options(max_retries=0)
+        response = await client.embeddings.create(model=self.model, input=texts, **options)
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+    def count_tokens(self, text: str) -> int:
+        return count_tokens(text, self.model)
+
+    def is_retryable(self, error: Exception) -> bool:
+        return isinstance(error, self._retryable)
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """Deterministic hashing embeddings (character 3-grams with signed buckets)"""
+
+    name = "local"
+    ngram = 3
+
+    def __init__(self, dimensions: Optional[int] = None):
+        self.dimensions = dimensions or get_embedding_dimensions() or 1536
+
+    def embed_one(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        text = " ".join(text.lower().split())
+        grams = [text[i : i + self.ngram] for i in range(max(len(text) - self.ngram + 1, 1))]
+        for gram in grams:
+            digest = hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "big") % self.dimensions
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            vector[0] = 1.0
+            norm = 1.0
+        return (vector / norm).tolist()
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_one(text) for text in texts]
+
+    def count_tokens(self, text: str) -> int:
+        # Rough estimate, good enough for batching
+        return len(text) // 2 + 1
+
+
+class EmbeddingService:
+    """Token-aware batching, bounded concurrency and retries around a provider"""
+
+    def __init__(
+        self,
+        provider: EmbeddingProvider,
+        max_batch_tokens: int = EMBED_MAX_BATCH_TOKENS,
+        max_batch_size: int = EMBED_MAX_BATCH_SIZE,
+        max_concurrency: int = EMBED_CONCURRENCY,
+        max_retries: int = EMBED_MAX_RETRIES,
+    ):
+        self.provider = provider
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_retries = max_retries
+
+    @property
+    def dimensions(self) -> int:
+        return self.provider.dimensions
+
+    def make_batches(self, texts: List[str]) -> List[List[int]]:
+        """Group text indexes into batches within the token and size limits"""
+        batches: List[List[int]] = []
+        current: List[int] = []
+        tokens = 0
+        for i, text in enumerate(texts):
+            text_tokens = self.provider.count_tokens(text)
+            if current and (
+                tokens + text_tokens > self.max_batch_tokens
+                or len(current) >= self.max_batch_size
+            ):
+                batches.append(current)
+                current, tokens = [], 0
+            current.append(i)
+            tokens += text_tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                return await self.provider.embed_batch(texts)
+            except Exception as e:
+                if attempt >= self.max_retries or not self.provider.is_retryable(e):
+                    raise
+                delay = min(RETRY_BASE_SECONDS * 2 ** attempt, RETRY_MAX_SECONDS)
+                delay += random.uniform(0, delay / 2)
+                attempt += 1
+                logger.warning(
+                    f"Embedding batch of {len(texts)} failed ({e}), "
+                    f"retry {attempt}/{self.max_retries} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+    async def embed(self, texts: List[str], skip_failures: bool = False) -> List[List[float]]:
+        """Embed texts in order, using as few provider requests as the limits allow.
+
+        With ``skip_failures`` a batch that still fails after its retries is
+        embedded one text at a time, and texts that fail on their own get
+        ``None`` instead of failing the whole call.
+        """
+        if not texts:
+            return []
+
+        batches = self.make_batches(texts)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+
+        async def run(batch: List[int]):
+            async with semaphore:
+                try:
+                    result = await self._embed_with_retry([texts[i] for i in batch])
+                except Exception as e:
+                    if not skip_failures:
+                        raise
+                    logger.warning(f"Embedding batch of {len(batch)} failed ({e}), embedding one by one")
+                    result = [await self._embed_one_or_none(texts[i]) for i in batch]
+            for i, vector in zip(batch, result):
+                vectors[i] = vector
+
+        await asyncio.gather(*(run(batch) for batch in batches))
+        logger.info(
+            f"Embedded {len(texts)} texts in {len(batches)} requests via {self.provider.name}"
+        )
+        return vectors
+
+    async def _embed_one_or_none(self, text: str) -> Optional[List[float]]:
+        try:
+            return (await self._embed_with_retry([text]))[0]
+        except Exception as e:
+            logger.error(f"Could not embed text ({len(text)} chars): {e}")
+            return None
+
+    async def embed_query(self, text: str) -> List[float]:
+        return (await self.embed([text]))[0]
+
+    def embed_sync(self, texts: List[str]) -> List[List[float]]:
+        """Blocking variant for scripts and worker threads (runs on the shared client loop)"""
+        return run_sync(self.embed(texts))
+
+
+_service: Optional[EmbeddingService] = None
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Shared service for the configured provider (EMBEDDING_PROVIDER)"""
+    global _service
+    if _service is None:
+        if EMBEDDING_PROVIDER == "local":
+            provider = LocalEmbeddingProvider()
+        elif EMBEDDING_PROVIDER == "openai":
+            provider = OpenAIEmbeddingProvider()
+        else:
+            raise ValueError(f"Unknown EMBEDDING_PROVIDER '{EMBEDDING_PROVIDER}'")
+        _service = EmbeddingService(provider)
+    return _service
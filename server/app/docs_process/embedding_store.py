@@ -0,0 +1,225 @@
+"""
+Content-addressed chunk embedding store
+
+Embeddings are keyed by sha256(model + dimensions + chunk text) and stored in a
+compact binary layout per (model, dimensions) pair:
+
+    vectors.f32  - row-major float32 matrix, one row per chunk (memory-mapped)
+    keys.bin     - 32-byte SHA-256 digests, row i belongs to vector i
+
+Both files are append-only, so a re-index run only pays for chunk texts that
+were never embedded before.
+"""
+import os
+import re
+import json
+import fcntl
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.docs_process.embeddings import count_tokens
+from app.utils.config import EMBEDDING_STORE_PATH
+
+logger = logging.getLogger(__name__)
+
+KEY_SIZE = 32  # bytes per SHA-256 digest
+
+
+def make_key(text: str, model: str, dimensions: Optional[int]) -> bytes:
+    """Build the content address of a chunk for a given model and size"""
+    digest = hashlib.sha256()
+    digest.update(f"{model}\x00{dimensions or 'native'}\x00".encode("utf-8"))
+    digest.update(text.encode("utf-8"))
+    return digest.digest()
+
+
+class EmbeddingStore:
+    """Append-only float32 matrix plus hash index for one embedding model"""
+
+    def __init__(self, root: str, model: str, dimensions: Optional[int] = None):
+        self.model = model
+        self.dimensions = dimensions
+        safe_model = re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+        self.path = os.path.join(root, f"{safe_model}-{dimensions or 'native'}")
+        os.makedirs(self.path, exist_ok=True)
+
+        self._vectors_path = os.path.join(self.path, "vectors.f32")
+        self._keys_path = os.path.join(self.path, "keys.bin")
+        self._meta_path = os.path.join(self.path, "meta.json")
+        self._lock_path = os.path.join(self.path, ".lock")
+
+        self._lock = threading.Lock()
+        self._index: Dict[bytes, int] = {}
+        self._matrix: Optional[np.memmap] = None
+        self._dim: Optional[int] = None
+
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                self._dim = json.load(f)["dim"]
+        with self._file_lock():
+            self._refresh()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @contextmanager
+    def _file_lock(self):
+        """Cross-process lock so parallel indexers append safely"""
+        with open(self._lock_path, "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Load rows appended since the last refresh (also by other processes)"""
+        if self._dim is None or not os.path.exists(self._keys_path):
+            return
+
+        row_bytes = self._dim * 4
+        key_rows = os.path.getsize(self._keys_path) // KEY_SIZE
+        vector_rows = os.path.getsize(self._vectors_path) // row_bytes
+        rows = min(key_rows, vector_rows)
+
+        # Drop a partially written tail left behind by a crash
+        if key_rows != rows:
+            os.truncate(self._keys_path, rows * KEY_SIZE)
+        if os.path.getsize(self._vectors_path) != rows * row_bytes:
+            os.truncate(self._vectors_path, rows * row_bytes)
+
+        known = len(self._index)
+        if rows > known:
+            with open(self._keys_path, "rb") as f:
+                f.seek(known * KEY_SIZE)
+                data = f.read((rows - known) * KEY_SIZE)
+            for i in range(rows - known):
+                self._index.setdefault(data[i * KEY_SIZE:(i + 1) * KEY_SIZE], known + i)
+
+        self._matrix = (
+            np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self._dim))
+            if rows
+            else None
+        )
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Look up embeddings for texts, returning None for misses"""
+        with self._lock:
+            results: List[Optional[np.ndarray]] = []
+            for text in texts:
+                row = self._index.get(make_key(text, self.model, self.dimensions))
+                results.append(
+                    None if row is None or self._matrix is None else self._matrix[row]
+                )
+            return results
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        """Append new embeddings to the store"""
+        if not texts:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+
+        with self._lock, self._file_lock():
+            if self._dim is None:
+                self._dim = int(matrix.shape[1])
+                with open(self._meta_path, "w", encoding="utf-8") as f:
+                    json.dump(
+                        {"model": self.model, "dimensions": self.dimensions, "dim": self._dim},
+                        f,
+                    )
+            elif matrix.shape[1] != self._dim:
+                raise ValueError(
+                    f"Embedding size {matrix.shape[1]} does not match store size {self._dim}"
+                )
+
+            self._refresh()
+
+            new_keys = []
+            new_rows = []
+            seen = set()
+            for text, row in zip(texts, matrix):
+                key = make_key(text, self.model, self.dimensions)
+                if key in self._index or key in seen:
+                    continue
+                seen.add(key)
+                new_keys.append(key)
+                new_rows.append(row)
+
+            if not new_keys:
+                return
+
+            # Vectors first, then keys: a crash in between leaves only an
+            # unreferenced vector tail, which _refresh() truncates.
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.stack(new_rows).astype(np.float32).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self._keys_path, "ab") as f:
+                f.write(b"".join(new_keys))
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._refresh()
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain embeddings wrapper that only sends store misses to the model.
+
+    ``embedded_count`` and ``embedded_token_count`` tally the texts that were
+    actually sent to the model.
+    """
+
+    def __init__(self, embeddings: Embeddings, store: EmbeddingStore):
+        self.embeddings = embeddings
+        self.store = store
+        self.embedded_count = 0
+        self.embedded_token_count = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached = self.store.get_many(texts)
+
+        # Embed each missing text once, even if it repeats within the batch
+        missing = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+        fresh: Dict[str, List[float]] = {}
+        if missing:
+            vectors = self.embeddings.embed_documents(missing)
+            self.store.put_many(missing, vectors)
+            fresh = dict(zip(missing, vectors))
+            self.embedded_count += len(missing)
+            self.embedded_token_count += sum(count_tokens(text) for text in missing)
+
+        hits = sum(1 for vector in cached if vector is not None)
+        logger.info(f"Embedding store: {hits} hits, {len(texts) - hits} misses")
+        return [
+            fresh[text] if vector is None else vector.tolist()
+            for text, vector in zip(texts, cached)
+        ]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+
+_stores: Dict[tuple, EmbeddingStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_embedding_store(model: str, dimensions: Optional[int] = None) -> EmbeddingStore:
+    """Get the shared store for a model/dimensions pair"""
+    with _stores_lock:
+        key = (model, dimensions)
+        if key not in _stores:
+            _stores[key] = EmbeddingStore(EMBEDDING_STORE_PATH, model, dimensions)
+        return _stores[key]
+
+
+def with_embedding_store(embeddings: Embeddings) -> CachedEmbeddings:
+    """Wrap OpenAIEmbeddings (or any Embeddings) with the persistent store"""
+    model = getattr(embeddings, "model", type(embeddings).__name__)
+    dimensions = getattr(embeddings, "dimensions", None)
+    return CachedEmbeddings(embeddings, get_embedding_store(model, dimensions))
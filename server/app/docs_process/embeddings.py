@@ -0,0 +1,85 @@
+"""
+Embedding model settings
+
+One place that decides the embedding model and vector dimensions used by
+ingestion, collection creation and query embedding. ``text-embedding-3``
+models can return shortened vectors (EMBEDDINGS_DIMENSIONS); the collection
+size is checked against the setting so the two cannot drift apart silently.
+"""
+import logging
+from functools import lru_cache
+from typing import Optional
+
+from app.utils.config import EMBEDDINGS_MODEL, EMBEDDINGS_DIMENSIONS
+
+logger = logging.getLogger(__name__)
+
+# Native output size of the OpenAI embedding models
+MODEL_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+
+def get_embedding_dimensions() -> Optional[int]:
+    """Vector size produced by the configured model (None if unknown)"""
+    return EMBEDDINGS_DIMENSIONS or MODEL_DIMENSIONS.get(EMBEDDINGS_MODEL)
+
+
+def get_embedding_signature() -> str:
+    """Model name plus reduced dimensions, recorded in the document registry"""
+    if EMBEDDINGS_DIMENSIONS:
+        return f"{EMBEDDINGS_MODEL}@{EMBEDDINGS_DIMENSIONS}"
+    return EMBEDDINGS_MODEL
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = EMBEDDINGS_MODEL) -> int:
+    """Count the embedding tokens of a text"""
+    return len(_get_encoding(model).encode(text, disallowed_special=()))
+
+
+def get_embeddings(cached: bool = True):
+    """Shared OpenAIEmbeddings for the configured model and dimensions.
+
+    With ``cached`` document embeddings go through the persistent embedding
+    store.
+    """
+    from app.utils.clients import get_embeddings_client
+
+    embeddings = get_embeddings_client()
+    if cached:
+        from app.docs_process.embedding_store import with_embedding_store
+
+        return with_embedding_store(embeddings)
+    return embeddings
+
+
+def get_collection_vector_size(client, collection_name: str) -> Optional[int]:
+    vectors = client.get_collection(collection_name).config.params.vectors
+    if isinstance(vectors, dict):
+        # Named vectors: LangChain uses the unnamed ("") vector
+        vectors = vectors.get("") or next(iter(vectors.values()), None)
+    return vectors.size if vectors is not None else None
+
+
+def check_collection_dimensions(client, collection_name: str):
+    """Raise ValueError when the collection's vector size differs from the setting"""
+    expected = get_embedding_dimensions()
+    actual = get_collection_vector_size(client, collection_name)
+    if expected and actual and expected != actual:
+        raise ValueError(
+            f"Collection {collection_name} stores {actual}-dimension vectors but "
+            f"{get_embedding_signature()} produces {expected}. Rebuild the index "
+            f"(POST /api/pdfs/rebuild/) after changing EMBEDDINGS_MODEL or EMBEDDINGS_DIMENSIONS."
+        )
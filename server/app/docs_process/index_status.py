@@ -0,0 +1,140 @@
+"""
+Cached index status for the PDF admin pages
+
+Per-file status comes from the document registry in one query and the file
+listing is rebuilt when the PDF directory or the registry changed (or the TTL
+expired), so listing PDFs costs no Qdrant calls and no per-file queries. ``scan_collection``
+computes the same numbers from Qdrant itself in one paginated pass, for
+checking the registry against the vectors that are actually stored.
+
+The cache is invalidated in-process on index and delete; the TTL covers
+writes from other processes such as the bulk indexing CLI, and files
+overwritten in place (which leave the directory mtime unchanged).
+"""
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.docs_process import registry
+from app.utils.config import INDEX_STATUS_TTL_SECONDS
+from app.utils.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class IndexStatusService:
+    """Caches registry status, the PDF listing and the last Qdrant scan"""
+
+    def __init__(self, ttl: float = INDEX_STATUS_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._status: Optional[Dict[str, Dict[str, Any]]] = None
+        self._status_loaded_at = 0.0
+        # pdf_dir -> ((dir mtime, generation), loaded at, file infos)
+        self._listings: Dict[str, Tuple[Tuple[float, int], float, List[Dict[str, Any]]]] = {}
+        self._scan: Optional[Dict[str, Dict[str, Any]]] = None
+        self._scan_loaded_at = 0.0
+
+    def invalidate(self):
+        """Drop cached status after a file was indexed or deleted"""
+        with self._lock:
+            self._generation += 1
+            self._status = None
+            self._scan = None
+
+    def get_status(self) -> Dict[str, Dict[str, Any]]:
+        """Index status per filename from the registry (one query, cached)"""
+        with self._lock:
+            if self._status is not None and time.monotonic() - self._status_loaded_at < self.ttl:
+                return self._status
+
+        db = SessionLocal()
+        try:
+            status = {
+                filename: {
+                    "indexed_at": entry.indexed_at.isoformat() if entry.indexed_at else None,
+                    "chunk_count": entry.chunk_count,
+                    "file_sha256": entry.file_sha256,
+                }
+                for filename, entry in registry.get_entries_by_filename(db).items()
+            }
+        finally:
+            db.close()
+
+        with self._lock:
+            if status != self._status:
+                self._generation += 1
+            self._status = status
+            self._status_loaded_at = time.monotonic()
+        return status
+
+    def list_files(self, pdf_dir: str) -> List[Dict[str, Any]]:
+        """PDF files with size, dates and index status, newest first"""
+        status = self.get_status()
+        dir_mtime = os.stat(pdf_dir).st_mtime
+        with self._lock:
+            key = (dir_mtime, self._generation)
+            cached = self._listings.get(pdf_dir)
+            if cached and cached[0] == key and time.monotonic() - cached[1] < self.ttl:
+                return cached[2]
+
+        files = []
+        with os.scandir(pdf_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".pdf") or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                file_status = status.get(entry.name)
+                files.append({
+                    "filename": entry.name,
+                    "size_bytes": stat.st_size,
+                    "size_mb": round(stat.st_size / (1024 * 1024), 2),
+                    "created_at": datetime.fromtimestamp(stat.st_ctime).isoformat(),
+                    "modified_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                    "is_indexed": file_status is not None,
+                    "indexed_at": file_status["indexed_at"] if file_status else None,
+                    "chunk_count": file_status["chunk_count"] if file_status else 0,
+                    "file_sha256": file_status["file_sha256"] if file_status else None,
+                })
+
+        files.sort(key=lambda x: x["modified_at"], reverse=True)
+        with self._lock:
+            self._listings[pdf_dir] = (key, time.monotonic(), files)
+        return files
+
+    def scan_collection(self) -> Dict[str, Dict[str, Any]]:
+        """Chunk count and latest indexed_at per file, from one pass over Qdrant"""
+        with self._lock:
+            if self._scan is not None and time.monotonic() - self._scan_loaded_at < self.ttl:
+                return self._scan
+
+        from app.docs_process.collection_schema import iter_points
+        from app.docs_process.collection_versions import get_client, resolve_collection
+
+        client = get_client()
+        collection_name = resolve_collection(client)
+        scan: Dict[str, Dict[str, Any]] = {}
+        if collection_name:
+            for point in iter_points(client, collection_name, with_payload=["metadata"]):
+                metadata = (point.payload or {}).get("metadata") or {}
+                # Deduplicated points count for every file they were found in
+                filenames = {s.get("filename") for s in metadata.get("sources", [])}
+                filenames.add(metadata.get("filename"))
+                for filename in filenames - {None}:
+                    item = scan.setdefault(filename, {"chunk_count": 0, "indexed_at": None})
+                    item["chunk_count"] += 1
+                    indexed_at = metadata.get("indexed_at")
+                    if indexed_at and (item["indexed_at"] is None or indexed_at > item["indexed_at"]):
+                        item["indexed_at"] = indexed_at
+
+        with self._lock:
+            self._scan = scan
+            self._scan_loaded_at = time.monotonic()
+        return scan
+
+
+index_status = IndexStatusService()
@@ -0,0 +1,328 @@
+"""
+PDF ingestion pipeline
+
+Converts a PDF to markdown with Docling (through the conversion cache), splits
+it into chunks and stores the embeddings in Qdrant. Every run is recorded in
+the document registry so files whose bytes and settings did not change are
+skipped.
+
+In page-streaming mode (the default) pages are converted, chunked and embedded
+a window at a time, so memory stays bounded and every chunk carries its page
+number and heading path.
+
+Near-duplicate chunks (repeated headers, overlap) are collapsed into one point
+that lists every source file and page, see ``dedup``.
+
+``index_pdf`` and ``plan_pdf`` report page, chunk and token counts so callers
+such as the bulk indexing CLI can print throughput and cost estimates.
+"""
+import os
+import uuid
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from app.docs_process import registry
+from app.docs_process.chunking import iter_page_chunks
+from app.docs_process.collection_profiles import create_collection
+from app.docs_process.collection_schema import ensure_payload_indexes
+from app.docs_process.collection_versions import get_client, resolve_collection
+from app.docs_process.converter import convert_pdf, iter_pdf_pages
+from app.docs_process.dedup import ChunkDeduplicator, remove_file
+from app.docs_process.embeddings import (
+    check_collection_dimensions,
+    get_embedding_dimensions,
+    count_tokens,
+    get_embedding_signature,
+    get_embeddings,
+)
+from app.docs_process.index_status import index_status
+from app.docs_process.local_index import local_index
+from app.docs_process.search_filters import categorize_filename
+from app.utils.database import SessionLocal
+from app.utils.runtime_settings import get_runtime_settings
+from app.utils.config import (
+    COLLECTION_NAME,
+    INGEST_PAGE_STREAMING,
+    EMBED_BATCH_SIZE,
+    DEDUP_ENABLED,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_chunking(
+    chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None
+) -> Tuple[int, int]:
+    """Chunk size and overlap, defaulting to the runtime ingestion settings"""
+    settings = get_runtime_settings().ingestion
+    return (
+        settings.chunk_size if chunk_size is None else chunk_size,
+        settings.chunk_overlap if chunk_overlap is None else chunk_overlap,
+    )
+
+
+def get_chunker_config(chunk_size: int, chunk_overlap: int) -> Dict[str, Any]:
+    """Chunker settings for the active ingestion mode (recorded in the registry)"""
+    splitter = "markdown_pages" if INGEST_PAGE_STREAMING else "markdown"
+    return registry.build_chunker_config(chunk_size, chunk_overlap, splitter=splitter)
+
+
+def iter_chunks(
+    file_path: str,
+    file_sha256: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    stats: Dict[str, int],
+) -> Iterator:
+    """Convert and chunk a PDF, tallying pages, chunks and tokens into ``stats``"""
+    stats.update(page_count=0, chunk_count=0, token_count=0)
+
+    if INGEST_PAGE_STREAMING:
+        # Convert, chunk and embed page window by page window
+        def counted_pages():
+            for page in iter_pdf_pages(file_path, file_sha256):
+                stats["page_count"] += 1
+                yield page
+
+        chunks = iter_page_chunks(counted_pages(), chunk_size, chunk_overlap)
+    else:
+        from langchain.text_splitter import MarkdownTextSplitter
+
+        # Convert PDF to markdown (served from the conversion cache when possible)
+        converted = convert_pdf(file_path, file_sha256)
+        stats["page_count"] = converted["page_count"]
+        logger.info(f"Converted {file_path} to markdown")
+
+        # Split the text into chunks
+        text_splitter = MarkdownTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        )
+        chunks = text_splitter.create_documents([converted["markdown"]])
+
+    for chunk in chunks:
+        stats["chunk_count"] += 1
+        stats["token_count"] += count_tokens(chunk.page_content)
+        yield chunk
+
+
+def store_chunks(
+    chunks: Iterable,
+    embeddings,
+    metadata: Dict[str, Any],
+    stats: Optional[Dict[str, int]] = None,
+    collection_name: str = COLLECTION_NAME,
+) -> int:
+    """Embed and upsert chunks in batches as they arrive; returns the stored point count.
+
+    With DEDUP_ENABLED, near-duplicates are not embedded; their source is added
+    to the existing point instead (counted in ``stats["duplicate_count"]``).
+    """
+    from langchain_qdrant import QdrantVectorStore
+
+    # Write to the collection behind the alias (the alias itself cannot be created)
+    client = get_client()
+    collection_name = resolve_collection(client, collection_name) or collection_name
+
+    deduplicator = (
+        ChunkDeduplicator(
+            client=client, collection_name=collection_name, exclude_filename=metadata.get("filename")
+        )
+        if DEDUP_ENABLED
+        else None
+    )
+    vector_store = None
+    batch = []
+    count = 0
+
+    def flush(batch):
+        nonlocal vector_store
+        if deduplicator:
+            pairs = deduplicator.filter(batch)
+        else:
+            pairs = [(str(uuid.uuid4()), chunk) for chunk in batch]
+        if not pairs:
+            return 0
+
+        ids = [point_id for point_id, _ in pairs]
+        documents = [chunk for _, chunk in pairs]
+        if vector_store is None:
+            # First batch creates the collection (with the active profile) if needed
+            if not client.collection_exists(collection_name):
+                vector_size = get_embedding_dimensions() or len(
+                    embeddings.embed_query(documents[0].page_content)
+                )
+                create_collection(client, collection_name, vector_size)
+            else:
+                check_collection_dimensions(client, collection_name)
+            ensure_payload_indexes(client, collection_name)
+            vector_store = QdrantVectorStore(
+                client=client, collection_name=collection_name, embedding=embeddings
+            )
+        vector_store.add_documents(documents, ids=ids)
+        if deduplicator:
+            deduplicator.mark_stored(ids)
+        return len(ids)
+
+    for chunk in chunks:
+        chunk.metadata.update(metadata)
+        batch.append(chunk)
+        if len(batch) >= EMBED_BATCH_SIZE:
+            count += flush(batch)
+            batch = []
+
+    if batch:
+        count += flush(batch)
+
+    if deduplicator:
+        deduplicator.flush_sources()
+        if stats is not None:
+            stats["duplicate_count"] = deduplicator.duplicate_count
+        logger.info(f"Collapsed {deduplicator.duplicate_count} near-duplicate chunks")
+    return count
+
+
+def index_pdf(
+    file_path: str,
+    filename: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+    source: str = "pdf_upload",
+    force: bool = False,
+    collection_name: str = COLLECTION_NAME,
+    record: bool = True,
+) -> Dict[str, Any]:
+    """Index a PDF file into Qdrant unless the registry says it is up to date.
+
+    The file's previous vectors are removed once the new ones are stored, so a
+    re-index replaces them without a gap and a failed run leaves them in place.
+
+    Returns a dict with ``status`` ("indexed" or "skipped"), ``chunk_count``
+    (stored points), ``file_sha256``, and for indexed files ``page_count``,
+    ``token_count``, ``duplicate_count``, ``embedded_count``,
+    ``embedded_token_count`` (texts and tokens sent to the embedding API) and
+    ``indexed_at``. With ``record=False`` the registry is left alone (used when
+    building a new collection version).
+    """
+    filename = filename or os.path.basename(file_path)
+    chunk_size, chunk_overlap = resolve_chunking(chunk_size, chunk_overlap)
+    chunker_config = get_chunker_config(chunk_size, chunk_overlap)
+    file_sha256 = registry.compute_file_sha256(file_path)
+
+    db = SessionLocal()
+    try:
+        entry = registry.get_entry(db, filename)
+        if not force and registry.is_up_to_date(
+            entry, file_sha256, chunker_config, get_embedding_signature()
+        ):
+            logger.info(f"Skipping {filename}: unchanged since {entry.indexed_at}")
+            return {
+                "status": "skipped",
+                "chunk_count": entry.chunk_count,
+                "file_sha256": file_sha256,
+            }
+
+        # Only chunk texts missing from the embedding store reach the API
+        embeddings = get_embeddings()
+
+        indexed_at = datetime.now()
+        metadata = {
+            "filename": filename,
+            "indexed_at": indexed_at.isoformat(),
+            "source": source,
+            "category": categorize_filename(filename),
+        }
+
+        client = get_client()
+        stats: Dict[str, int] = {}
+        chunks = iter_chunks(file_path, file_sha256, chunk_size, chunk_overlap, stats)
+
+        # Store in Qdrant
+        try:
+            chunk_count = store_chunks(chunks, embeddings, metadata, stats, collection_name)
+            # Embedding store hits and collapsed duplicates never reach the API
+            stats["embedded_count"] = embeddings.embedded_count
+            stats["embedded_token_count"] = embeddings.embedded_token_count
+        except Exception:
+            # Drop the points of this run; the previous vectors are still in place
+            try:
+                target = resolve_collection(client, collection_name)
+                if target is not None:
+                    removed = remove_file(
+                        client, target, filename, only_indexed_at=metadata["indexed_at"]
+                    )
+                    logger.info(f"Removed {removed['deleted']} partial vectors of {filename}")
+            except Exception as e:
+                logger.error(f"Could not remove partial vectors of {filename}: {e}")
+            raise
+
+        # Replace the file's previous vectors (changed bytes or settings, force)
+        target = resolve_collection(client, collection_name) or collection_name
+        removed = remove_file(client, target, filename, keep_indexed_at=metadata["indexed_at"])
+        if removed["deleted"] or removed["updated"]:
+            logger.info(
+                f"Removed {removed['deleted']} old vectors of {filename} "
+                f"({removed['updated']} shared ones updated)"
+            )
+
+        if record:
+            registry.record_indexed(
+                db,
+                filename=filename,
+                file_sha256=file_sha256,
+                chunker_config=chunker_config,
+                embedding_model=get_embedding_signature(),
+                chunk_count=chunk_count,
+                indexed_at=indexed_at,
+            )
+            index_status.invalidate()
+            local_index.invalidate()
+
+        logger.info(f"Successfully indexed {filename} with {chunk_count} chunks")
+        return {
+            "status": "indexed",
+            **stats,
+            "chunk_count": chunk_count,
+            "file_sha256": file_sha256,
+            "indexed_at": indexed_at,
+        }
+    finally:
+        db.close()
+
+
+def plan_pdf(
+    file_path: str, chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None
+) -> Dict[str, int]:
+    """Convert and chunk a PDF without embedding it (dry run).
+
+    Returns ``page_count``, ``chunk_count`` and ``token_count``. The conversion
+    is cached, so a following real run does not convert again.
+    """
+    chunk_size, chunk_overlap = resolve_chunking(chunk_size, chunk_overlap)
+    file_sha256 = registry.compute_file_sha256(file_path)
+    stats: Dict[str, int] = {}
+    for _ in iter_chunks(file_path, file_sha256, chunk_size, chunk_overlap, stats):
+        pass
+    return stats
+
+
+def needs_indexing(
+    file_path: str,
+    filename: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+) -> bool:
+    """Check the registry to see whether a file must be (re-)indexed"""
+    filename = filename or os.path.basename(file_path)
+    chunk_size, chunk_overlap = resolve_chunking(chunk_size, chunk_overlap)
+    chunker_config = get_chunker_config(chunk_size, chunk_overlap)
+    file_sha256 = registry.compute_file_sha256(file_path)
+
+    db = SessionLocal()
+    try:
+        entry = registry.get_entry(db, filename)
+        return not registry.is_up_to_date(
+            entry, file_sha256, chunker_config, get_embedding_signature()
+        )
+    finally:
+        db.close()
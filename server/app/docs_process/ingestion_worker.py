@@ -0,0 +1,172 @@
+"""
+Background ingestion worker
+
+Indexing jobs are queued here instead of running inside request handlers. A
+single daemon thread works through the queue; Docling itself runs in the
+converter pool processes.
+"""
+import queue
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from app.docs_process.ingestion import index_pdf
+
+logger = logging.getLogger(__name__)
+
+# Keep the status of this many finished jobs for the admin page
+MAX_FINISHED_JOBS = 200
+
+
+class IngestionWorker:
+    """Queue of indexing jobs processed one at a time in a daemon thread"""
+
+    def __init__(self):
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        # The running job stays visible after a re-queue replaces it in _jobs
+        self._running: Optional[Dict[str, Any]] = None
+
+    def start(self):
+        """Start the worker thread (idempotent)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="ingestion-worker", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Ask the worker to stop after the current job"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def submit(
+        self, file_path: str, filename: str, file_sha256: Optional[str] = None, **kwargs
+    ) -> Dict[str, Any]:
+        """Queue a file for indexing (kwargs go to index_pdf); returns the job status.
+
+        A file that is already queued keeps its place (``force`` is merged in);
+        a file that is being indexed is queued again to run after that job.
+        """
+        return self._submit(
+            filename, index_pdf, (file_path, filename), kwargs,
+            file_path=file_path, file_sha256=file_sha256,
+        )
+
+    def submit_task(self, name: str, func: Callable[..., Any], **kwargs) -> Dict[str, Any]:
+        """Queue any long-running task (e.g. a full rebuild) under a job name"""
+        return self._submit(name, func, (), kwargs)
+
+    def _public(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in job.items() if key not in ("func", "args")}
+
+    def _submit(
+        self,
+        name: str,
+        func: Callable[..., Any],
+        args: tuple,
+        kwargs: Dict[str, Any],
+        file_path: Optional[str] = None,
+        file_sha256: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        with self._lock:
+            job = self._jobs.get(name)
+            if job and job["status"] == "queued":
+                # Merge into the queued job; a force request wins
+                force = job["options"].get("force", False) or kwargs.get("force", False)
+                job["options"] = {**job["options"], **kwargs}
+                if force:
+                    job["options"]["force"] = True
+                job["file_sha256"] = file_sha256 or job["file_sha256"]
+                return self._public(job)
+            if job and job["status"] == "running" and file_path is None:
+                return self._public(job)
+            if job and job["status"] == "running":
+                # The running job may have read the old file or vectors: run again after it
+                logger.info(f"{name} is being indexed, queueing it again")
+
+            job = {
+                "filename": name,
+                "file_path": file_path,
+                "file_sha256": file_sha256,
+                "func": func,
+                "args": args,
+                "options": kwargs,
+                "status": "queued",
+                "queued_at": datetime.utcnow().isoformat(),
+                "finished_at": None,
+                "result": None,
+                "error": None,
+            }
+            self._jobs[name] = job
+            self._prune()
+
+        self.start()
+        self._queue.put(job)
+        logger.info(f"Queued {name} for indexing")
+        return self._public(job)
+
+    def get_job(self, filename: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(filename)
+            return self._public(job) if job else None
+
+    def _all_jobs(self) -> List[Dict[str, Any]]:
+        jobs = list(self._jobs.values())
+        if self._running is not None and not any(job is self._running for job in jobs):
+            jobs.insert(0, self._running)
+        return jobs
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self._public(job) for job in self._all_jobs()]
+
+    def is_pending_sha256(self, file_sha256: str) -> bool:
+        """Check whether a queued or running job has the given content hash"""
+        with self._lock:
+            return any(
+                job["status"] in ("queued", "running")
+                and job["file_sha256"] == file_sha256
+                for job in self._all_jobs()
+            )
+
+    def _prune(self):
+        finished = [
+            name for name, job in self._jobs.items()
+            if job["status"] in ("done", "failed")
+        ]
+        for name in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[name]
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+
+            with self._lock:
+                job["status"] = "running"
+                self._running = job
+            try:
+                result = job["func"](*job["args"], **job["options"])
+                with self._lock:
+                    job["status"] = "done"
+                    job["result"] = result
+            except Exception as e:
+                logger.error(f"Error indexing {job['filename']}: {e}")
+                with self._lock:
+                    job["status"] = "failed"
+                    job["error"] = str(e)
+            finally:
+                with self._lock:
+                    job["finished_at"] = datetime.utcnow().isoformat()
+                    self._running = None
+                self._queue.task_done()
+
+
+ingestion_worker = IngestionWorker()
@@ -0,0 +1,290 @@
+"""
+In-process vector index mirroring the live Qdrant collection
+
+For a corpus of a few thousand chunks a brute-force dot product over a
+float32 matrix answers in well under a millisecond, without a network round
+trip. The mirror is stored under LOCAL_INDEX_PATH:
+
+    vectors.f32   - row-major float32 matrix of unit vectors (memory-mapped)
+    payloads.json - point ids and payloads (page_content + metadata)
+    meta.json     - source collection, point count, dimensions, sync time
+
+It is filled from Qdrant with ``sync`` (or ``build`` for tests) and its
+source collection and point count are checked at most every
+LOCAL_INDEX_CHECK_SECONDS; ingestion, deletes, rebuilds and rollbacks call
+``invalidate`` so the next search re-syncs. Checks and re-syncs run in a
+background thread (one at a time) while searches keep using the current
+matrix; only a process without any mirror syncs before its first search.
+When the mirror files exist, searching needs no Qdrant connection at all.
+
+``invalidate`` only reaches the current process. Writes from other processes
+(the bulk indexing CLI, other server workers) are picked up by the periodic
+check, i.e. within LOCAL_INDEX_CHECK_SECONDS; a change that keeps the point
+count the same (a re-index with as many chunks) is only seen after a
+rebuild, rollback or an ``invalidate`` in this process.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.docs_process.collection_schema import SCROLL_PAGE_SIZE
+from app.docs_process.search_filters import payload_matches
+from app.utils.config import COLLECTION_NAME, LOCAL_INDEX_PATH, LOCAL_INDEX_CHECK_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class LocalVectorIndex:
+    """Memory-mapped float32 matrix plus payloads, searched with NumPy"""
+
+    def __init__(
+        self,
+        path: str = LOCAL_INDEX_PATH,
+        alias: str = COLLECTION_NAME,
+        check_seconds: float = LOCAL_INDEX_CHECK_SECONDS,
+    ):
+        self.path = path
+        self.alias = alias
+        self.check_seconds = check_seconds
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._payloads_path = os.path.join(path, "payloads.json")
+        self._meta_path = os.path.join(path, "meta.json")
+
+        self._lock = threading.Lock()
+        # Held while the mirror is checked or re-synced from Qdrant
+        self._sync_lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: List[Any] = []
+        self._payloads: List[Dict[str, Any]] = []
+        self.meta: Dict[str, Any] = {}
+        self._checked_at = 0.0
+        self._stale = False
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def invalidate(self):
+        """Re-sync the mirror from Qdrant before the next search"""
+        self._stale = True
+
+    def load(self) -> bool:
+        """Load the mirror from disk; False when there is none"""
+        if not os.path.exists(self._meta_path):
+            return False
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(self._payloads_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        count, dim = meta["count"], meta["dim"]
+        matrix = (
+            np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(count, dim))
+            if count
+            else np.zeros((0, dim), dtype=np.float32)
+        )
+        with self._lock:
+            self.meta = meta
+            self._ids = data["ids"]
+            self._payloads = data["payloads"]
+            self._matrix = matrix
+        return True
+
+    def build(
+        self,
+        ids: Sequence[Any],
+        vectors,
+        payloads: Sequence[Dict[str, Any]],
+        collection_name: Optional[str] = None,
+    ):
+        """Write a new mirror from ids, vectors and payloads, then load it"""
+        matrix = (
+            normalize(np.asarray(vectors, dtype=np.float32))
+            if len(ids)
+            else np.zeros((0, 0), dtype=np.float32)
+        )
+        meta = {
+            "collection": collection_name,
+            "count": len(ids),
+            "dim": int(matrix.shape[1]) if len(ids) else 0,
+            "synced_at": datetime.now().isoformat(),
+        }
+
+        # Write next to the live files and swap them in, meta last
+        os.makedirs(self.path, exist_ok=True)
+        for target, write in (
+            (self._vectors_path, lambda f: f.write(matrix.tobytes())),
+            (self._payloads_path, lambda f: f.write(
+                json.dumps({"ids": list(ids), "payloads": list(payloads)}, ensure_ascii=False).encode("utf-8")
+            )),
+            (self._meta_path, lambda f: f.write(json.dumps(meta).encode("utf-8"))),
+        ):
+            tmp_path = f"{target}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, target)
+
+        self.load()
+        self._checked_at = time.monotonic()
+        self._stale = False
+
+    def sync(self, client) -> int:
+        """Copy every point of the collection behind the alias; returns the point count"""
+        from app.docs_process.collection_versions import resolve_collection
+
+        collection_name = resolve_collection(client, self.alias)
+        if collection_name is None:
+            raise ValueError(f"Collection {self.alias} does not exist")
+
+        ids, vectors, payloads = [], [], []
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name=collection_name,
+                limit=SCROLL_PAGE_SIZE,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            for point in points:
+                vector = point.vector.get("", None) if isinstance(point.vector, dict) else point.vector
+                ids.append(point.id)
+                vectors.append(vector)
+                payloads.append(point.payload or {})
+            if offset is None:
+                break
+
+        self.build(ids, vectors, payloads, collection_name)
+        logger.info(f"Synced local vector index from {collection_name}: {len(ids)} points")
+        return len(ids)
+
+    def is_current(self, client) -> bool:
+        """True when the mirror matches the collection behind the alias"""
+        from app.docs_process.collection_versions import resolve_collection
+
+        collection_name = resolve_collection(client, self.alias)
+        if collection_name is None or collection_name != self.meta.get("collection"):
+            return False
+        points = client.count(collection_name=collection_name, exact=True).count
+        return points == self.meta.get("count")
+
+    def ensure_current(self, client=None):
+        """Load the mirror and re-sync it if Qdrant changed since the last check.
+
+        The check and re-sync run in a background thread while searches keep
+        using the current mirror. Only when there is no mirror yet does the
+        caller wait for the first sync. Without a reachable Qdrant the
+        mirror on disk is used as is.
+        """
+        if self._matrix is None:
+            self.load()
+        if client is None:
+            return
+
+        if self._matrix is None:
+            # Nothing to serve yet: one thread syncs, the others wait for it
+            with self._sync_lock:
+                if self._matrix is None:
+                    self._checked_at = time.monotonic()
+                    self._stale = False
+                    self._refresh(client, force=True)
+            return
+
+        due = self._stale or time.monotonic() - self._checked_at >= self.check_seconds
+        if not due or not self._sync_lock.acquire(blocking=False):
+            return
+        self._checked_at = time.monotonic()
+        stale, self._stale = self._stale, False
+        threading.Thread(
+            target=self._refresh_in_background,
+            args=(client, stale),
+            name="local-index-sync",
+            daemon=True,
+        ).start()
+
+    def _refresh_in_background(self, client, force: bool):
+        try:
+            self._refresh(client, force)
+        finally:
+            self._sync_lock.release()
+
+    def _refresh(self, client, force: bool):
+        try:
+            if force or not self.is_current(client):
+                self.sync(client)
+        except Exception as e:
+            if self._matrix is None:
+                raise
+            logger.warning(f"Local vector index not refreshed, using mirror from {self.meta.get('synced_at')}: {e}")
+
+    def search(
+        self, query_vector: Sequence[float], k: int = 5, points_filter=None
+    ) -> List[Tuple[Any, float, Dict[str, Any]]]:
+        """Exact cosine search, optionally over the points matching a payload filter;
+        returns (id, score, payload) best first"""
+        with self._lock:
+            matrix, ids, payloads = self._matrix, self._ids, self._payloads
+        if matrix is None or not len(ids):
+            return []
+
+        rows = np.arange(len(ids))
+        if points_filter is not None:
+            rows = np.array(
+                [i for i, payload in enumerate(payloads) if payload_matches(payload, points_filter)],
+                dtype=np.int64,
+            )
+            if not len(rows):
+                return []
+
+        query = normalize(np.asarray(query_vector, dtype=np.float32))
+        scores = matrix[rows] @ query if points_filter is not None else matrix @ query
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[rows[i]], float(scores[i]), payloads[rows[i]]) for i in top]
+
+
+class LocalVectorStore:
+    """The part of the QdrantVectorStore interface that ``retrieve()`` uses"""
+
+    def __init__(self, embedding, index: "LocalVectorIndex" = None, client=None):
+        self.embedding = embedding
+        self.index = index if index is not None else local_index
+        self.client = client
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter=None, search_params=None, **kwargs
+    ) -> List[Tuple[Document, float]]:
+        # search_params (HNSW ef, quantization rescoring) do not apply to exact search
+        self.index.ensure_current(self.client)
+        vector = self.embedding.embed_query(query)
+        return [
+            (
+                Document(
+                    page_content=payload.get("page_content", ""),
+                    metadata={**(payload.get("metadata") or {}), "_id": point_id},
+                ),
+                score,
+            )
+            for point_id, score, payload in self.index.search(vector, k, filter)
+        ]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+
+# Shared mirror of the live collection
+local_index = LocalVectorIndex()
@@ -0,0 +1,96 @@
+"""
+PDF profiling before conversion
+
+Detects which pages carry an extractable text layer so born-digital pages can
+be converted without OCR and table-structure models.
+"""
+import logging
+from typing import Any, Dict, List, Tuple
+
+from app.utils.config import CONVERTER_MIN_RUN_PAGES, TEXT_LAYER_MIN_CHARS
+
+logger = logging.getLogger(__name__)
+
+# Pipeline names used by the converter
+PIPELINE_TEXT = "text"  # text layer present: no OCR, no table-structure model
+PIPELINE_FULL = "full"  # scanned page: full Docling pipeline
+
+
+def profile_pdf(file_path: str, min_chars: int = TEXT_LAYER_MIN_CHARS) -> List[Dict[str, Any]]:
+    """Return per-page text layer information (page numbers start at 1)"""
+    # pypdfium2 ships with Docling
+    import pypdfium2 as pdfium
+
+    pages = []
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        for index in range(len(pdf)):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            try:
+                chars = len(textpage.get_text_range().strip())
+            finally:
+                textpage.close()
+                page.close()
+            pages.append(
+                {
+                    "page_no": index + 1,
+                    "chars": chars,
+                    "pipeline": PIPELINE_TEXT if chars >= min_chars else PIPELINE_FULL,
+                }
+            )
+    finally:
+        pdf.close()
+    return pages
+
+
+def count_pages(file_path: str) -> int:
+    """Return the number of pages without converting the document"""
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def _group_runs(pages: List[Tuple[int, str]]) -> List[Tuple[str, int, int]]:
+    runs: List[Tuple[str, int, int]] = []
+    for page_no, pipeline in pages:
+        if runs and runs[-1][0] == pipeline and runs[-1][2] == page_no - 1:
+            runs[-1] = (pipeline, runs[-1][1], page_no)
+        else:
+            runs.append((pipeline, page_no, page_no))
+    return runs
+
+
+def plan_conversion(
+    profile: List[Dict[str, Any]], min_run: int = CONVERTER_MIN_RUN_PAGES
+) -> List[Tuple[str, int, int]]:
+    """Group consecutive pages with the same pipeline into (pipeline, start, end) runs.
+
+    Every run is a separate Docling call that parses the file again, so text
+    runs shorter than ``min_run`` pages next to scanned pages are converted
+    with the full pipeline (which handles text pages too) instead of
+    alternating between pipelines.
+    """
+    runs = _group_runs([(page["page_no"], page["pipeline"]) for page in profile])
+    if len(runs) <= 1:
+        return runs
+
+    pages = []
+    for pipeline, start, end in runs:
+        if pipeline == PIPELINE_TEXT and end - start + 1 < min_run:
+            pipeline = PIPELINE_FULL
+        pages.extend((page_no, pipeline) for page_no in range(start, end + 1))
+    return _group_runs(pages)
+
+
+def split_runs(runs: List[Tuple[str, int, int]], window: int) -> List[Tuple[str, int, int]]:
+    """Split page runs into windows of at most ``window`` pages"""
+    windows: List[Tuple[str, int, int]] = []
+    for pipeline, start, end in runs:
+        for window_start in range(start, end + 1, window):
+            windows.append((pipeline, window_start, min(window_start + window - 1, end)))
+    return windows
@@ -0,0 +1,170 @@
+"""
+Vector store consistency check and orphan cleanup
+
+Streams the live collection with payload-only scrolls (no vectors) and
+compares it with the PDFs on disk and the document registry:
+
+- points without a filename (old indexing runs) and points whose files are
+  all gone from disk are orphans
+- points repeating the same file, page and text as an earlier point are
+  duplicates
+- shared (deduplicated) points that still list deleted files as sources are
+  reported and, when applying, detached from those files
+- registry entries without a file or without points, and point counts that
+  differ from the registry, are reported; a file has points when any point
+  lists it as its filename or as one of its sources, while the registry
+  count is compared with the points stored for the file (its primary
+  filename), which is what indexing records
+
+Nothing is changed unless ``apply`` is set; deletes are sent in batches of
+point ids.
+"""
+import os
+import hashlib
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Set
+
+from qdrant_client.models import PointIdsList
+
+from app.docs_process import registry
+from app.docs_process.collection_schema import iter_points
+from app.docs_process.collection_versions import get_client, resolve_collection
+from app.docs_process.dedup import release_file
+from app.docs_process.index_status import index_status
+from app.docs_process.local_index import local_index
+from app.utils.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+DELETE_BATCH_SIZE = 256
+SAMPLE_SIZE = 20
+
+
+def list_pdf_files(pdf_dir: str) -> Set[str]:
+    if not os.path.isdir(pdf_dir):
+        return set()
+    with os.scandir(pdf_dir) as entries:
+        return {entry.name for entry in entries if entry.name.lower().endswith(".pdf") and entry.is_file()}
+
+
+def delete_points(client, collection_name: str, ids: List[Any], batch_size: int = DELETE_BATCH_SIZE) -> int:
+    for i in range(0, len(ids), batch_size):
+        client.delete(
+            collection_name=collection_name,
+            points_selector=PointIdsList(points=ids[i : i + batch_size]),
+            wait=True,
+        )
+    return len(ids)
+
+
+def reconcile(pdf_dir: str, apply: bool = False, client=None) -> Dict[str, Any]:
+    """Check the collection against disk and registry; with ``apply`` remove what is stale"""
+    client = client or get_client()
+    collection_name = resolve_collection(client)
+    if collection_name is None:
+        raise ValueError("The vector collection does not exist")
+
+    files = list_pdf_files(pdf_dir)
+    db = SessionLocal()
+    try:
+        entries = registry.get_entries_by_filename(db)
+
+        missing_filename: List[Any] = []
+        missing_file: List[Any] = []
+        missing_by_file: Counter = Counter()
+        duplicates: List[Any] = []
+        stale_sources: Counter = Counter()
+        points_by_file: Counter = Counter()
+        primary_by_file: Counter = Counter()
+        seen: Set[bytes] = set()
+        scanned = 0
+
+        for point in iter_points(
+            client, collection_name, with_payload=["metadata", "page_content"]
+        ):
+            scanned += 1
+            payload = point.payload or {}
+            metadata = payload.get("metadata") or {}
+            filename = metadata.get("filename")
+            source_files = {s.get("filename") for s in metadata.get("sources", [])} - {None}
+            point_files = source_files | ({filename} if filename else set())
+
+            if not point_files:
+                missing_filename.append(point.id)
+                continue
+            if not point_files & files:
+                missing_file.append(point.id)
+                missing_by_file.update(point_files)
+                continue
+
+            key = hashlib.blake2b(
+                f"{filename}\x00{metadata.get('page')}\x00{payload.get('page_content', '')}".encode("utf-8"),
+                digest_size=16,
+            ).digest()
+            if key in seen:
+                duplicates.append(point.id)
+                continue
+            seen.add(key)
+
+            points_by_file.update(point_files)
+            primary_by_file[filename] += 1
+            stale_sources.update(source_files - files)
+
+        registry_missing_file = sorted(set(entries) - files)
+        report = {
+            "collection": collection_name,
+            "points_scanned": scanned,
+            "files_on_disk": len(files),
+            "orphaned": {
+                "missing_filename": len(missing_filename),
+                "missing_file": len(missing_file),
+                "by_file": dict(missing_by_file.most_common()),
+                "sample_ids": [str(i) for i in (missing_filename + missing_file)[:SAMPLE_SIZE]],
+            },
+            "duplicates": {
+                "count": len(duplicates),
+                "sample_ids": [str(i) for i in duplicates[:SAMPLE_SIZE]],
+            },
+            "stale_sources": dict(stale_sources.most_common()),
+            "registry": {
+                "missing_file": registry_missing_file,
+                "without_points": sorted(
+                    name for name in set(entries) & files if not points_by_file[name]
+                ),
+                "count_mismatch": [
+                    {"filename": name, "registry": entry.chunk_count, "points": primary_by_file[name]}
+                    for name, entry in sorted(entries.items())
+                    if name in files and primary_by_file[name] and entry.chunk_count != primary_by_file[name]
+                ],
+            },
+            "unregistered_files": sorted(
+                name for name in points_by_file if name in files and name not in entries
+            ),
+            "applied": apply,
+        }
+
+        if apply:
+            to_delete = missing_filename + missing_file + duplicates
+            report["deleted_points"] = delete_points(client, collection_name, to_delete)
+            report["released_points"] = sum(
+                release_file(client, collection_name, name)["updated"] for name in stale_sources
+            )
+            report["removed_registry_entries"] = sum(
+                1 for name in registry_missing_file if registry.remove_entry(db, name)
+            )
+            index_status.invalidate()
+            local_index.invalidate()
+            logger.info(
+                f"Reconciled {collection_name}: deleted {report['deleted_points']} points, "
+                f"released {report['released_points']} shared points, removed "
+                f"{report['removed_registry_entries']} registry entries"
+            )
+        else:
+            logger.info(
+                f"Checked {collection_name}: {len(missing_filename) + len(missing_file)} orphaned "
+                f"and {len(duplicates)} duplicate points of {scanned}"
+            )
+        return report
+    finally:
+        db.close()
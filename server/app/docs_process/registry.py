@@ -0,0 +1,115 @@
+"""
+Document registry helpers
+
+Keeps track of which PDF bytes were indexed with which chunker and
+embedding settings, so unchanged files are never re-embedded.
+"""
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.database.models import DocumentRegistry
+
+logger = logging.getLogger(__name__)
+
+# Read files in 1 MB blocks when hashing
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def compute_file_sha256(file_path: str) -> str:
+    """Compute the SHA-256 hex digest of a file without loading it into memory"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_chunker_config(
+    chunk_size: int, chunk_overlap: int, splitter: str = "markdown"
+) -> Dict[str, Any]:
+    """Describe the chunker settings in a form that can be compared later"""
+    return {
+        "splitter": splitter,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+    }
+
+
+def get_entry(db: Session, filename: str) -> Optional[DocumentRegistry]:
+    """Get the registry entry for a file"""
+    return (
+        db.query(DocumentRegistry)
+        .filter(DocumentRegistry.filename == filename)
+        .first()
+    )
+
+
+def get_entry_by_sha256(db: Session, file_sha256: str) -> Optional[DocumentRegistry]:
+    """Find an indexed file with the same content hash"""
+    return (
+        db.query(DocumentRegistry)
+        .filter(DocumentRegistry.file_sha256 == file_sha256)
+        .first()
+    )
+
+
+def get_entries_by_filename(db: Session) -> Dict[str, DocumentRegistry]:
+    """Get all registry entries keyed by filename (single query)"""
+    return {entry.filename: entry for entry in db.query(DocumentRegistry).all()}
+
+
+def is_up_to_date(
+    entry: Optional[DocumentRegistry],
+    file_sha256: str,
+    chunker_config: Dict[str, Any],
+    embedding_model: str,
+) -> bool:
+    """Check whether a registry entry matches the file hash and indexing settings"""
+    if entry is None:
+        return False
+    return (
+        entry.file_sha256 == file_sha256
+        and entry.chunker_config == chunker_config
+        and entry.embedding_model == embedding_model
+    )
+
+
+def record_indexed(
+    db: Session,
+    filename: str,
+    file_sha256: str,
+    chunker_config: Dict[str, Any],
+    embedding_model: str,
+    chunk_count: int,
+    indexed_at: Optional[datetime] = None,
+) -> DocumentRegistry:
+    """Create or update the registry entry after a file was indexed"""
+    entry = get_entry(db, filename)
+    if entry is None:
+        entry = DocumentRegistry(filename=filename)
+        db.add(entry)
+
+    entry.file_sha256 = file_sha256
+    entry.chunker_config = chunker_config
+    entry.embedding_model = embedding_model
+    entry.chunk_count = chunk_count
+    # Local time, like the ``indexed_at`` of the vector payloads
+    entry.indexed_at = indexed_at or datetime.now()
+
+    db.commit()
+    db.refresh(entry)
+    return entry
+
+
+def remove_entry(db: Session, filename: str) -> bool:
+    """Remove the registry entry for a file"""
+    entry = get_entry(db, filename)
+    if entry:
+        db.delete(entry)
+        db.commit()
+        return True
+    return False
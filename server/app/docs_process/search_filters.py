@@ -0,0 +1,206 @@
+"""
+Payload filters for scoped retrieval
+
+Builds Qdrant filters on filename, section, document category and indexing
+date, so a question about a known manual or topic searches only its chunks
+(filtered HNSW search over the payload indexes in collection_schema).
+
+Categories are assigned at ingestion from keywords in the filename. With
+SEARCH_FILTER_INFERENCE the same keyword table guesses a category from the
+question; ``retrieve()`` falls back to an unfiltered search when the
+filtered one finds nothing.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from qdrant_client.models import (
+    DatetimeRange,
+    FieldCondition,
+    Filter,
+    IsEmptyCondition,
+    MatchAny,
+    MatchText,
+    MatchValue,
+    PayloadField,
+)
+
+from app.docs_process.collection_schema import file_filter, iter_points
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATEGORY = "general"
+
+# Category -> Thai keywords found in filenames and questions
+CATEGORY_KEYWORDS: Dict[str, List[str]] = {
+    "travel": ["เดินทาง", "ไปราชการ", "เบี้ยเลี้ยง", "ค่าที่พัก", "ค่าพาหนะ"],
+    "training": ["ฝึกอบรม", "อบรม", "สัมมนา", "ประชุม", "จัดงาน"],
+    "procurement": ["จัดซื้อ", "จัดจ้าง", "พัสดุ", "ครุภัณฑ์"],
+    "compensation": ["ค่าตอบแทน", "เงินเดือน", "ค่าจ้าง", "ค่าล่วงเวลา", "สวัสดิการ"],
+    "utilities": ["สาธารณูปโภค", "ค่าไฟฟ้า", "ค่าน้ำประปา", "ค่าโทรศัพท์", "ไปรษณีย์"],
+    "advance": ["ยืมเงิน", "เงินยืม", "ลูกหนี้"],
+    "tax": ["ภาษี", "หัก ณ ที่จ่าย"],
+}
+
+
+def match_categories(text: str) -> List[str]:
+    """Categories whose keywords appear in the text"""
+    text = text or ""
+    return [
+        category
+        for category, keywords in CATEGORY_KEYWORDS.items()
+        if any(keyword in text for keyword in keywords)
+    ]
+
+
+def categorize_filename(filename: str) -> str:
+    """Document category stored in chunk metadata at ingestion"""
+    categories = match_categories(filename)
+    return categories[0] if categories else DEFAULT_CATEGORY
+
+
+def infer_filters(question: str) -> Dict[str, Any]:
+    """Guess filter arguments from a question; empty when it is not clearly one topic"""
+    categories = match_categories(question)
+    if len(categories) == 1:
+        return {"category": categories[0]}
+    return {}
+
+
+def _as_list(value: Union[str, Sequence[str], None]) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [v for v in value if v]
+
+
+def build_filter(
+    filename: Union[str, Sequence[str], None] = None,
+    section: Optional[str] = None,
+    category: Union[str, Sequence[str], None] = None,
+    date_from: Optional[Union[str, datetime]] = None,
+    date_to: Optional[Union[str, datetime]] = None,
+) -> Optional[Filter]:
+    """Qdrant filter on the ``metadata`` payload fields, or None when nothing is set"""
+    must: List[Any] = []
+
+    filenames = _as_list(filename)
+    if filenames:
+        match = MatchValue(value=filenames[0]) if len(filenames) == 1 else MatchAny(any=filenames)
+        # Deduplicated points also belong to the files in their sources
+        must.append(
+            Filter(
+                should=[
+                    FieldCondition(key="metadata.filename", match=match),
+                    FieldCondition(key="metadata.sources[].filename", match=match),
+                ]
+            )
+        )
+
+    if section:
+        must.append(FieldCondition(key="metadata.section", match=MatchText(text=section)))
+
+    categories = _as_list(category)
+    if categories:
+        match = MatchValue(value=categories[0]) if len(categories) == 1 else MatchAny(any=categories)
+        must.append(FieldCondition(key="metadata.category", match=match))
+
+    if date_from or date_to:
+        must.append(
+            FieldCondition(
+                key="metadata.indexed_at",
+                range=DatetimeRange(gte=date_from or None, lte=date_to or None),
+            )
+        )
+
+    return Filter(must=must) if must else None
+
+
+def _values(payload: Any, key: str) -> List[Any]:
+    """Values at a dotted payload path; ``name[]`` steps into lists"""
+    values = [payload]
+    for part in key.split("."):
+        is_list = part.endswith("[]")
+        name = part[:-2] if is_list else part
+        next_values = []
+        for value in values:
+            item = value.get(name) if isinstance(value, dict) else None
+            if item is None:
+                continue
+            if is_list or isinstance(item, list):
+                next_values.extend(item if isinstance(item, list) else [item])
+            else:
+                next_values.append(item)
+        values = next_values
+    return values
+
+
+def _to_datetime(value: Any) -> Optional[datetime]:
+    """Naive datetime for comparisons (indexed_at is stored as local time)"""
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    return value.replace(tzinfo=None)
+
+
+def _condition_matches(payload: Dict[str, Any], condition: Any) -> bool:
+    if isinstance(condition, Filter):
+        return payload_matches(payload, condition)
+
+    values = _values(payload, condition.key)
+    match = condition.match
+    if isinstance(match, MatchValue):
+        return match.value in values
+    if isinstance(match, MatchAny):
+        return any(value in match.any for value in values)
+    if isinstance(match, MatchText):
+        return any(match.text in str(value) for value in values)
+    if isinstance(condition.range, DatetimeRange):
+        low, high = _to_datetime(condition.range.gte), _to_datetime(condition.range.lte)
+        for value in values:
+            moment = _to_datetime(value)
+            if moment is None:
+                continue
+            if (low is None or moment >= low) and (high is None or moment <= high):
+                return True
+        return False
+    raise ValueError(f"Unsupported filter condition on {condition.key}")
+
+
+def payload_matches(payload: Dict[str, Any], points_filter: Optional[Filter]) -> bool:
+    """Evaluate a filter built by ``build_filter`` against a payload (local index)"""
+    if points_filter is None:
+        return True
+    if points_filter.must and not all(_condition_matches(payload, c) for c in points_filter.must):
+        return False
+    if points_filter.should and not any(_condition_matches(payload, c) for c in points_filter.should):
+        return False
+    if points_filter.must_not and any(_condition_matches(payload, c) for c in points_filter.must_not):
+        return False
+    return True
+
+
+def backfill_categories(client, collection_name: str) -> int:
+    """Set ``metadata.category`` on points indexed before categories existed"""
+    missing = Filter(must=[IsEmptyCondition(is_empty=PayloadField(key="metadata.category"))])
+    filenames = {
+        ((point.payload or {}).get("metadata") or {}).get("filename")
+        for point in iter_points(client, collection_name, missing, with_payload=["metadata.filename"])
+    } - {None}
+
+    for filename in filenames:
+        client.set_payload(
+            collection_name=collection_name,
+            payload={"category": categorize_filename(filename)},
+            points=Filter(must=[*file_filter(filename).must, *missing.must]),
+            key="metadata",
+            wait=True,
+        )
+    if filenames:
+        logger.info(f"Added document categories to points of {len(filenames)} files")
+    return len(filenames)
@@ -0,0 +1,109 @@
+"""
+Streaming PDF uploads
+
+Uploads are streamed to a temporary file in the target directory chunk by
+chunk, hashed on the way and then moved into place atomically. File writes run
+in the threadpool so large uploads never block the event loop.
+
+Starlette spools a multipart body to its own temp file before the endpoint
+runs, so the size check in ``stream_to_temp`` cannot stop a huge request on
+its own: ``request_too_large`` (used by a middleware in ``main``) rejects
+requests by their Content-Length first. Chunked requests without a
+Content-Length are only limited by the reverse proxy (client_max_body_size).
+"""
+import os
+import hashlib
+import logging
+import tempfile
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Read uploads in 1 MB chunks
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Allowance for multipart boundaries and headers on top of the file size
+MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+
+
+def request_too_large(content_length: Optional[str], max_bytes: int) -> bool:
+    """Check a request's Content-Length header against the upload limit"""
+    try:
+        return int(content_length) > max_bytes + MULTIPART_OVERHEAD_BYTES
+    except (TypeError, ValueError):
+        return False
+
+
+def find_duplicate(file_sha256: str) -> Optional[str]:
+    """Name of an indexed or queued file with the same content, if any"""
+    from app.docs_process import registry
+    from app.docs_process.ingestion_worker import ingestion_worker
+    from app.utils.database import SessionLocal
+
+    if ingestion_worker.is_pending_sha256(file_sha256):
+        return "a file being indexed"
+    db = SessionLocal()
+    try:
+        entry = registry.get_entry_by_sha256(db, file_sha256)
+        return entry.filename if entry else None
+    finally:
+        db.close()
+
+
+async def stream_to_temp(upload: UploadFile, dest_dir: str, max_bytes: int) -> Dict[str, Any]:
+    """Stream an upload to a temp file in ``dest_dir``.
+
+    Returns ``tmp_path``, ``sha256`` and ``size_bytes``. Raises 413 when the
+    upload exceeds ``max_bytes`` (see the module docstring for the request
+    size limit).
+    """
+    digest = hashlib.sha256()
+    size = 0
+
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, prefix=".upload-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large. Maximum size is {max_bytes // (1024 * 1024)} MB.",
+                    )
+                digest.update(chunk)
+                await run_in_threadpool(f.write, chunk)
+            await run_in_threadpool(os.fsync, f.fileno())
+    except BaseException:
+        discard_upload(tmp_path)
+        raise
+
+    return {"tmp_path": tmp_path, "sha256": digest.hexdigest(), "size_bytes": size}
+
+
+def publish_upload(tmp_path: str, file_path: str):
+    """Atomically move the temp file into place without overwriting.
+
+    Raises 400 when ``file_path`` already exists.
+    """
+    try:
+        # link() fails if the target exists, unlike rename()
+        os.link(tmp_path, file_path)
+    except FileExistsError:
+        raise HTTPException(status_code=400, detail="File with this name already exists.")
+    finally:
+        discard_upload(tmp_path)
+    logger.info(f"Saved upload {os.path.basename(file_path)}")
+
+
+def discard_upload(tmp_path: str):
+    """Remove a temp upload file if it is still there"""
+    try:
+        os.unlink(tmp_path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,245 @@
+"""
+Vector store backup and restore
+
+Exports every point of the live collection to one zip archive so the index
+can be restored after losing Qdrant without re-running Docling or the
+embedding API:
+
+    manifest.json  - source collection, vector size, distance, point count,
+                     embedding model
+    vectors.npy    - float32 matrix, row i belongs to point i
+    points.jsonl   - one {"id", "payload"} line per point (deflate-compressed)
+    registry.json  - document registry entries, so restored files are not
+                     re-indexed
+
+Restore loads the archive into a new collection version with parallel batched
+upserts, checks the point count and then switches the alias, the same way a
+rebuild does. It runs as an ingestion worker task so it never races an
+indexing job or a rebuild for the alias.
+"""
+import io
+import json
+import logging
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+from qdrant_client.models import Distance, PointStruct
+
+from app.docs_process import registry
+from app.docs_process.collection_schema import SCROLL_PAGE_SIZE, UPSERT_BATCH_SIZE
+from app.docs_process.collection_versions import (
+    create_version,
+    garbage_collect,
+    get_client,
+    resolve_collection,
+    switch_alias,
+)
+from app.docs_process.embeddings import get_embedding_dimensions, get_embedding_signature
+from app.docs_process.index_status import index_status
+from app.docs_process.local_index import local_index
+from app.utils.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_VERSION = 1
+RESTORE_WORKERS = 4
+# Every collection version is created with this distance (see create_version)
+COLLECTION_DISTANCE = Distance.COSINE
+
+
+def export_collection(backup_dir: str = "backups", client=None) -> Dict[str, Any]:
+    """Write all points (ids, payloads, vectors) of the live collection to a zip archive"""
+    client = client or get_client()
+    collection_name = resolve_collection(client)
+    if collection_name is None:
+        raise ValueError("The vector collection does not exist")
+
+    ids: List[Any] = []
+    vectors: List[List[float]] = []
+    lines: List[str] = []
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=SCROLL_PAGE_SIZE,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        for point in points:
+            vector = point.vector.get("", None) if isinstance(point.vector, dict) else point.vector
+            ids.append(point.id)
+            vectors.append(vector)
+            lines.append(json.dumps({"id": point.id, "payload": point.payload}, ensure_ascii=False))
+        if offset is None:
+            break
+
+    params = client.get_collection(collection_name).config.params.vectors
+    if isinstance(params, dict):
+        params = params.get("") or next(iter(params.values()))
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(ids), params.size)
+
+    db = SessionLocal()
+    try:
+        entries = [
+            {
+                "filename": entry.filename,
+                "file_sha256": entry.file_sha256,
+                "chunker_config": entry.chunker_config,
+                "embedding_model": entry.embedding_model,
+                "chunk_count": entry.chunk_count,
+                "indexed_at": entry.indexed_at.isoformat() if entry.indexed_at else None,
+            }
+            for entry in registry.get_entries_by_filename(db).values()
+        ]
+    finally:
+        db.close()
+
+    manifest = {
+        "version": ARCHIVE_VERSION,
+        "collection": collection_name,
+        "created_at": datetime.utcnow().isoformat(),
+        "point_count": len(ids),
+        "vector_size": params.size,
+        "distance": str(params.distance.value if hasattr(params.distance, "value") else params.distance),
+        "embedding_model": get_embedding_signature(),
+    }
+
+    backup_path = Path(backup_dir)
+    backup_path.mkdir(parents=True, exist_ok=True)
+    archive_path = backup_path / f"vectors_backup_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.zip"
+    buffer = io.BytesIO()
+    np.save(buffer, matrix)
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+        # Float vectors barely compress, so they are stored as is
+        archive.writestr("vectors.npy", buffer.getvalue(), compress_type=zipfile.ZIP_STORED)
+        archive.writestr("points.jsonl", "\n".join(lines), compress_type=zipfile.ZIP_DEFLATED)
+        archive.writestr("registry.json", json.dumps(entries, ensure_ascii=False), compress_type=zipfile.ZIP_DEFLATED)
+
+    logger.info(f"Exported {len(ids)} points from {collection_name} to {archive_path}")
+    return {
+        "filename": archive_path.name,
+        "point_count": len(ids),
+        "file_size": archive_path.stat().st_size,
+    }
+
+
+def read_manifest(archive_path: str) -> Dict[str, Any]:
+    """Manifest of an archive, without loading the vectors"""
+    with zipfile.ZipFile(archive_path) as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+    if manifest.get("version") != ARCHIVE_VERSION:
+        raise ValueError(f"Unsupported vector backup version {manifest.get('version')}")
+    return manifest
+
+
+def check_manifest(manifest: Dict[str, Any]):
+    """Raise ValueError unless the archive's vectors fit this server's query embeddings"""
+    expected = get_embedding_dimensions()
+    if manifest["embedding_model"] != get_embedding_signature() or (
+        expected and expected != manifest["vector_size"]
+    ):
+        raise ValueError(
+            f"Backup holds {manifest['vector_size']}-dimension vectors from "
+            f"{manifest['embedding_model']} but the server embeds queries with "
+            f"{get_embedding_signature()}"
+        )
+    if manifest["distance"] != COLLECTION_DISTANCE.value:
+        raise ValueError(
+            f"Backup was taken from a {manifest['distance']} collection, restored "
+            f"collections use {COLLECTION_DISTANCE.value}"
+        )
+
+
+def read_archive(archive_path: str):
+    """Manifest, vector matrix, points and registry entries of an archive"""
+    manifest = read_manifest(archive_path)
+    with zipfile.ZipFile(archive_path) as archive:
+        matrix = np.load(io.BytesIO(archive.read("vectors.npy")))
+        points = [json.loads(line) for line in archive.read("points.jsonl").decode("utf-8").splitlines() if line]
+        entries = json.loads(archive.read("registry.json")) if "registry.json" in archive.namelist() else []
+
+    if len(points) != manifest["point_count"] or matrix.shape[0] != len(points):
+        raise ValueError(
+            f"Archive is incomplete: {len(points)} points and {matrix.shape[0]} vectors, "
+            f"manifest says {manifest['point_count']}"
+        )
+    return manifest, matrix, points, entries
+
+
+def import_collection(
+    archive_path: str,
+    client=None,
+    workers: int = RESTORE_WORKERS,
+    batch_size: int = UPSERT_BATCH_SIZE,
+    restore_registry: bool = True,
+) -> Dict[str, Any]:
+    """Restore an archive into a new collection version and switch the alias to it.
+
+    Run it on the ingestion worker (``submit_task``), like a rebuild.
+    """
+    client = client or get_client()
+    manifest, matrix, points, entries = read_archive(archive_path)
+
+    # Restored vectors must live in the same space as the query embeddings
+    check_manifest(manifest)
+
+    target = create_version(client, manifest["vector_size"])
+
+    def upsert(start: int):
+        client.upsert(
+            collection_name=target,
+            points=[
+                PointStruct(id=point["id"], vector=matrix[i].tolist(), payload=point["payload"])
+                for i, point in enumerate(points[start : start + batch_size], start)
+            ],
+            wait=True,
+        )
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            list(executor.map(upsert, range(0, len(points), batch_size)))
+
+        count = client.count(collection_name=target, exact=True).count
+        if count != len(points):
+            raise ValueError(f"{target} has {count} points after restore, expected {len(points)}")
+    except Exception:
+        client.delete_collection(target)
+        raise
+
+    previous = switch_alias(client, target)
+
+    restored_entries = 0
+    if restore_registry and entries:
+        db = SessionLocal()
+        try:
+            for entry in entries:
+                registry.record_indexed(
+                    db,
+                    filename=entry["filename"],
+                    file_sha256=entry["file_sha256"],
+                    chunker_config=entry["chunker_config"],
+                    embedding_model=entry["embedding_model"],
+                    chunk_count=entry["chunk_count"],
+                    indexed_at=datetime.fromisoformat(entry["indexed_at"]) if entry["indexed_at"] else None,
+                )
+                restored_entries += 1
+        finally:
+            db.close()
+
+    index_status.invalidate()
+    local_index.invalidate()
+    deleted = garbage_collect(client)
+    logger.info(f"Restored {len(points)} points from {archive_path} into {target}")
+    return {
+        "collection": target,
+        "previous_collection": previous,
+        "point_count": len(points),
+        "registry_entries": restored_entries,
+        "deleted_versions": deleted,
+    }
@@ -1,9 +1,10 @@
 import bcrypt
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import models
-from app.utils.database import get_db
+from app.utils.database import get_async_db
 from . import utils
 
 
@@ -11,7 +12,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login")
 
 
 async def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)
 ):
     credentials_exception = HTTPException(
         status_code=401,
@@ -27,10 +28,8 @@ async def get_current_user(
             raise credentials_exception
 
         # Check if token is blacklisted
-        blacklisted = (
-            db.query(models.TokenBlacklist)
-            .filter(models.TokenBlacklist.token_jti == jti)
-            .first()
+        blacklisted = await db.scalar(
+            select(models.TokenBlacklist.id).filter(models.TokenBlacklist.token_jti == jti)
         )
         if blacklisted:
             raise credentials_exception
@@ -38,7 +37,7 @@ async def get_current_user(
     except Exception:
         raise credentials_exception
 
-    user = db.query(models.User).filter(models.User.username == username).first()
+    user = await db.scalar(select(models.User).filter(models.User.username == username))
     if user is None:
         raise credentials_exception
     return user
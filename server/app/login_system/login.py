@@ -1,35 +1,36 @@
 from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
+from starlette.concurrency import run_in_threadpool
 
 from app.database import models
 from app.login_system import schemas, utils, auth
-from app.login_system.database import get_db
-from app.utils.database import engine
+from app.utils.database import get_async_db
 import jwt
 from datetime import datetime
 
 
-def register(user: schemas.UserCreate, db: Session) -> models.User:
+async def register(user: schemas.UserCreate, db: AsyncSession) -> models.User:
     """
     Register a new user in the database.
     """
     # Check if a user with the given email already exists
-    db_user_by_email = (
-        db.query(models.User).filter(models.User.email == user.email).first()
+    db_user_by_email = await db.scalar(
+        select(models.User.id).filter(models.User.email == user.email)
     )
     if db_user_by_email:
         raise HTTPException(status_code=400, detail="อีเมลนี้มีผู้ใช้งานแล้ว")
 
     # Check if a user with the given username already exists
-    db_user_by_username = (
-        db.query(models.User).filter(models.User.username == user.username).first()
+    db_user_by_username = await db.scalar(
+        select(models.User.id).filter(models.User.username == user.username)
     )
     if db_user_by_username:
         raise HTTPException(status_code=400, detail="ชื่อผู้ใช้นี้มีผู้ใช้งานแล้ว")
 
-    # Hash the user's password for security
-    hashed_password = utils.hash_password(user.password)
+    # Hash the user's password for security (bcrypt is slow, keep it off the event loop)
+    hashed_password = await run_in_threadpool(utils.hash_password, user.password)
 
     # Create a new user instance
     db_user = models.User(
@@ -41,18 +42,20 @@ def register(user: schemas.UserCreate, db: Session) -> models.User:
 
     # Add the new user to the session and commit to the database
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
 
     # Return the newly created user
     return db_user
 
 
 async def login(
-    form: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+    form: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)
 ) -> dict:
-    user = db.query(models.User).filter(models.User.username == form.username).first()
-    if not user or not utils.verify_password(form.password, str(user.hashed_password)):
+    user = await db.scalar(select(models.User).filter(models.User.username == form.username))
+    if not user or not await run_in_threadpool(
+        utils.verify_password, form.password, str(user.hashed_password)
+    ):
         raise HTTPException(status_code=401, detail="Wrong credentials")
     data = {"sub": user.username, "role": user.role, "email": user.email}
     access_token = utils.create_access_token(data)
@@ -65,7 +68,7 @@ async def login(
 
 
 async def logout(
-    token: str = Depends(auth.oauth2_scheme), db: Session = Depends(get_db)
+    token: str = Depends(auth.oauth2_scheme), db: AsyncSession = Depends(get_async_db)
 ):
     try:
         # Decode token to get JWT ID and expiration
@@ -84,7 +87,7 @@ async def logout(
                 user_id=payload.get("sub"),  # Using username as user identifier
             )
             db.add(blacklisted_token)
-            db.commit()
+            await db.commit()
 
         return {"message": "Logged out successfully"}
     except Exception as e:
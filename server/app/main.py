@@ -1,4 +1,6 @@
-from fastapi import FastAPI
+import hmac
+import json
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from slowapi import Limiter
@@ -47,7 +49,15 @@ async def rate_limit_handler(request, exc):
 
 # Middleware for CORS
 import os
-from app.utils.config import DEBUG
+from app.utils.config import (
+    DEBUG,
+    VECTOR_BACKEND,
+    ALLOW_SETTINGS_OVERRIDE,
+    SETTINGS_OVERRIDE_SECRET,
+    MAX_UPLOAD_MB,
+)
+from app.docs_process.uploads import request_too_large
+from app.utils.runtime_settings import build_settings, override_settings
 
 # Configure CORS based on environment
 if DEBUG:
@@ -75,6 +85,48 @@ app.add_middleware(
     allow_headers=["Authorization", "Content-Type"],  # Specify headers instead of "*"
 )
 
+
+# Reject oversized uploads before Starlette spools the body to disk
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    if request_too_large(request.headers.get("content-length"), MAX_UPLOAD_MB * 1024 * 1024):
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"File too large. Maximum size is {MAX_UPLOAD_MB} MB."},
+        )
+    return await call_next(request)
+
+
+# Per-request runtime settings overrides for benchmarking, e.g.
+# X-Runtime-Settings: {"retrieval": {"top_k": 5}}
+# together with X-Settings-Override-Secret: <SETTINGS_OVERRIDE_SECRET>
+if ALLOW_SETTINGS_OVERRIDE and not SETTINGS_OVERRIDE_SECRET:
+    logging.warning("ALLOW_SETTINGS_OVERRIDE is ignored because SETTINGS_OVERRIDE_SECRET is not set")
+
+if ALLOW_SETTINGS_OVERRIDE and SETTINGS_OVERRIDE_SECRET:
+
+    @app.middleware("http")
+    async def runtime_settings_override(request: Request, call_next):
+        header = request.headers.get("X-Runtime-Settings")
+        if not header:
+            return await call_next(request)
+        secret = request.headers.get("X-Settings-Override-Secret", "")
+        if not hmac.compare_digest(secret.encode("utf-8"), SETTINGS_OVERRIDE_SECRET.encode("utf-8")):
+            return JSONResponse(
+                status_code=403,
+                content={"detail": "X-Runtime-Settings requires a valid X-Settings-Override-Secret"},
+            )
+        try:
+            settings = build_settings(json.loads(header))
+        except ValueError as e:
+            # json and pydantic validation errors are both ValueErrors
+            return JSONResponse(
+                status_code=400,
+                content={"detail": f"Invalid X-Runtime-Settings header: {e}"},
+            )
+        with override_settings(settings):
+            return await call_next(request)
+
 # Root endpoint
 app.get("/")(lambda: {"message": "LannaFinChat API is running..."})
 
@@ -102,3 +154,48 @@ async def startup_event():
     from app.utils.timezone import now, format_datetime
 
     logging.info(f"LannaFinChat API started at {format_datetime(now())}")
+
+    # Replay chat turns left in the outbox spool by a previous run
+    from app.chat.outbox import chat_outbox
+
+    chat_outbox.start()
+
+    # Make sure the vector collection has the payload indexes admin operations
+    # rely on and matches the configured embedding dimensions; with the local
+    # backend, load (or sync) the in-process mirror before the first query
+    try:
+        from app.docs_process.collection_schema import ensure_payload_indexes
+        from app.docs_process.collection_versions import get_client, resolve_collection
+        from app.docs_process.embeddings import check_collection_dimensions
+        from app.docs_process.search_filters import backfill_categories
+
+        client = get_client()
+        collection_name = resolve_collection(client)
+        if collection_name:
+            ensure_payload_indexes(client, collection_name)
+            backfill_categories(client, collection_name)
+            check_collection_dimensions(client, collection_name)
+            if VECTOR_BACKEND == "local":
+                from app.docs_process.local_index import local_index
+
+                local_index.ensure_current(client)
+    except ValueError as e:
+        logging.error(str(e))
+    except Exception as e:
+        logging.warning(f"Could not check Qdrant payload indexes: {e}")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush the chat outbox, stop the ingestion and Docling workers, close shared clients and pools"""
+    from app.chat.outbox import chat_outbox
+    from app.docs_process.converter_pool import converter_pool
+    from app.docs_process.ingestion_worker import ingestion_worker
+    from app.utils.clients import close_clients
+    from app.utils.database import async_engine
+
+    chat_outbox.stop()
+    ingestion_worker.stop()
+    converter_pool.shutdown()
+    await close_clients()
+    await async_engine.dispose()
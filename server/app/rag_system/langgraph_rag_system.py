@@ -1,6 +1,7 @@
 import os
 import logging
-from typing import Any, List
+from functools import lru_cache
+from typing import Any, List, Optional
 from dotenv import load_dotenv
 from langchain.chat_models import init_chat_model
 from langchain_core.messages import SystemMessage, HumanMessage
@@ -8,45 +9,107 @@ from langchain_core.tools import tool
 from langgraph.graph import MessagesState, StateGraph, END
 from langgraph.prebuilt import ToolNode, tools_condition
 from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
-from langchain_openai import OpenAIEmbeddings
 
 # Load environment
-from app.utils.config import OPENAI_API_KEY, COLLECTION_NAME, QDRANT_URL, EMBEDDINGS_MODEL, OPENAI_MODEL
-
-# Initialize the embeddings
-embeddings = OpenAIEmbeddings(
-    model=EMBEDDINGS_MODEL,
+from app.docs_process.collection_profiles import build_search_params
+from app.docs_process.embeddings import get_embeddings
+from app.docs_process.local_index import LocalVectorStore
+from app.docs_process.search_filters import build_filter, infer_filters
+from app.utils.clients import get_qdrant_client
+from app.utils.runtime_settings import get_runtime_settings
+from app.utils.config import (
+    OPENAI_API_KEY,
+    COLLECTION_NAME,
+    VECTOR_BACKEND,
+    SEARCH_FILTER_INFERENCE,
 )
 
-# Setup Qdrant client and vector store
-qdrant_client = QdrantClient(url=QDRANT_URL)
-qdrant_store = QdrantVectorStore(
-    client=qdrant_client,
-    collection_name=COLLECTION_NAME,
-    embedding=embeddings,
-)
+# Initialize the embeddings (same model and dimensions as ingestion)
+embeddings = get_embeddings(cached=False)
+
+# Setup Qdrant client and the vector store: Qdrant, or the in-process mirror
+qdrant_client = get_qdrant_client()
+if VECTOR_BACKEND == "local":
+    vector_store = LocalVectorStore(embedding=embeddings, client=qdrant_client)
+else:
+    vector_store = QdrantVectorStore(
+        client=qdrant_client,
+        collection_name=COLLECTION_NAME,
+        embedding=embeddings,
+    )
+
+# HNSW ef / quantization rescoring of the active collection profile
+search_params = build_search_params()
+
 
-# Initialize LLM
-llm = init_chat_model(OPENAI_MODEL, model_provider="openai")
+@lru_cache(maxsize=8)
+def _chat_model(model: str, temperature: Optional[float]):
+    kwargs = {} if temperature is None else {"temperature": temperature}
+    return init_chat_model(model, model_provider="openai", **kwargs)
+
+
+def get_llm():
+    """Chat model of the current runtime settings (one instance per model/temperature)"""
+    generation = get_runtime_settings().generation
+    return _chat_model(generation.model, generation.temperature)
+
+
+def format_other_sources(doc) -> str:
+    """List the other files/pages a deduplicated chunk also appears in"""
+    others = [
+        f"{s.get('filename')} (Page: {s.get('page') or 'N/A'})"
+        for s in doc.metadata.get('sources', [])
+        if s.get('filename') != doc.metadata.get('filename') or s.get('page') != doc.metadata.get('page')
+    ]
+    return f"\nAlso in: {', '.join(others)}" if others else ""
+
+
+def search_documents(search_queries: List[str], search_filter=None, k: int = 5) -> List[Any]:
+    all_docs = []
+    for search_query in search_queries:
+        if search_query.strip():  # ตรวจสอบว่าไม่ใช่สตริงว่าง
+            docs = vector_store.similarity_search_with_score(
+                search_query, k=k, filter=search_filter, search_params=search_params
+            )
+            all_docs.extend(docs)
+    return all_docs
 
 
 @tool(response_format="content_and_artifact")
-def retrieve(query: str):
-    """Retrieve information related to a query from Thai documents."""
+def retrieve(
+    query: str,
+    filename: Optional[str] = None,
+    section: Optional[str] = None,
+    category: Optional[str] = None,
+):
+    """Retrieve information related to a query from Thai documents.
+
+    Optionally limit the search to one PDF (filename), a section heading, or a
+    document category: travel, training, procurement, compensation,
+    utilities, advance, tax or general.
+    """
     try:
+        settings = get_runtime_settings().retrieval
+        
         # เพิ่มการค้นหาที่หลากหลายสำหรับภาษาไทย
-        search_queries = [
-            query,  # คำค้นเดิม
-            query.replace(" ", ""),  # ลบช่องว่าง
-            query.replace("การ", "").replace("ค่า", "").replace("ใน", ""),  # ลบคำฟังก์ชัน
-        ]
-        
-        all_docs = []
-        for search_query in search_queries:
-            if search_query.strip():  # ตรวจสอบว่าไม่ใช่สตริงว่าง
-                docs = qdrant_store.similarity_search_with_score(search_query, k=5)
-                all_docs.extend(docs)
+        search_queries = [query]  # คำค้นเดิม
+        if settings.query_variants:
+            search_queries += [
+                query.replace(" ", ""),  # ลบช่องว่าง
+                query.replace("การ", "").replace("ค่า", "").replace("ใน", ""),  # ลบคำฟังก์ชัน
+            ]
+        
+        # จำกัดขอบเขตการค้นหาด้วย payload filter (ระบุมา หรืออนุมานจากคำถาม)
+        filters = {"filename": filename, "section": section, "category": category}
+        if not any(filters.values()) and SEARCH_FILTER_INFERENCE:
+            filters = infer_filters(query)
+        search_filter = build_filter(**filters)
+        
+        all_docs = search_documents(search_queries, search_filter, settings.k_per_query)
+        if search_filter is not None and not all_docs:
+            # ไม่พบในขอบเขตที่กำหนด ค้นหาทั้งหมดแทน
+            logging.info(f"No results within {filters}, searching all documents")
+            all_docs = search_documents(search_queries, k=settings.k_per_query)
         
         # ลบเอกสารที่ซ้ำกันและเพิ่มข้อมูลความเชื่อมั่น
         seen_content = set()
@@ -58,14 +121,14 @@ def retrieve(query: str):
                 doc.metadata['confidence_score'] = float(score)
                 unique_docs.append((doc, score))
         
-        # เรียงลำดับตามความเกี่ยวข้อง (ใช้เฉพาะ 10 อันดับแรก)
-        unique_docs = sorted(unique_docs, key=lambda x: x[1], reverse=True)[:10]
+        # เรียงลำดับตามความเกี่ยวข้อง (ใช้เฉพาะ top_k อันดับแรก)
+        unique_docs = sorted(unique_docs, key=lambda x: x[1], reverse=True)[:settings.top_k]
         
         # แยก docs และ scores
         docs_only = [doc for doc, score in unique_docs]
         
         serialized = "\n\n".join(
-            f"Source: {doc.metadata.get('filename', 'Unknown')} (Page: {doc.metadata.get('page', 'N/A')}, Confidence: {doc.metadata.get('confidence_score', 0):.2f})\nContent: {doc.page_content}" 
+            f"Source: {doc.metadata.get('filename', 'Unknown')} (Page: {doc.metadata.get('page', 'N/A')}, Section: {doc.metadata.get('section') or 'N/A'}, Confidence: {doc.metadata.get('confidence_score', 0):.2f}){format_other_sources(doc)}\nContent: {doc.page_content}" 
             for doc in docs_only
         )
         
@@ -78,7 +141,7 @@ def retrieve(query: str):
 
 
 def query_or_respond(state: MessagesState):
-    llm_with_tools = llm.bind_tools([retrieve])
+    llm_with_tools = get_llm().bind_tools([retrieve])
     response = llm_with_tools.invoke(state["messages"])
     return {"messages": [response]}
 
@@ -121,7 +184,7 @@ def generate(state: MessagesState):
     ]
     
     prompt = [SystemMessage(system_message_content)] + conversation_messages
-    response = llm.invoke(prompt)
+    response = get_llm().invoke(prompt)
     return {"messages": [response]}
 
 
@@ -175,6 +238,8 @@ def chatbot(user_message: str) -> dict[str, Any]:
                         source_documents.append({
                             'filename': doc.metadata.get('filename', 'Unknown'),
                             'page': doc.metadata.get('page', None),
+                            'section': doc.metadata.get('section', None),
+                            'sources': doc.metadata.get('sources', []),
                             'confidence_score': doc.metadata.get('confidence_score', 0.0),
                             'content_preview': doc.page_content[:200] + '...' if len(doc.page_content) > 200 else doc.page_content,
                             'full_content': doc.page_content
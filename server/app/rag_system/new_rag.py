@@ -1,13 +1,8 @@
-import openai
-from qdrant_client import QdrantClient
+from app.utils.clients import get_openai_client, get_qdrant_client
 
-from app.utils.config import OPENAI_API_KEY, QDRANT_VECTERDB_HOST
-
-# Setup OpenAI client
-llm = openai.OpenAI(api_key=OPENAI_API_KEY)
-
-# Setup Qdrant client
-qdrant = QdrantClient(host="localhost", port=6333)
+# Shared OpenAI and Qdrant clients (QDRANT_VECTERDB_HOST)
+llm = get_openai_client()
+qdrant = get_qdrant_client()
 
 
 def embed(texts):
@@ -1,11 +1,11 @@
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app.login_system import auth
-from app.login_system.login import register, get_db, login, logout, refresh
+from app.login_system.login import register, get_async_db, login, logout, refresh
 from app.login_system.schemas import UserCreate
 
 
@@ -24,41 +24,44 @@ async def read_root():
 
 
 @router.post("/register")
-def register_user(
+async def register_user(
     user: UserCreate,  # User data from request body
-    db: Session = Depends(get_db),  # Database session
+    db: AsyncSession = Depends(get_async_db),  # Database session
 ) -> dict:
     """
     Endpoint to register a new user.
     Returns a success message upon creating the user.
     """
-    return register(user, db)
+    return await register(user, db)
 
 
 @router.post("/login")
-def login_user(
+async def login_user(
     form_data: OAuth2PasswordRequestForm = Depends(),  # Form data of username and password
-    db: Session = Depends(get_db),  # Database session
+    db: AsyncSession = Depends(get_async_db),  # Database session
 ) -> dict:
     """
     Endpoint to login to the system.
     Returns a JSON object with access and refresh tokens.
     """
-    return login(form_data, db)
+    return await login(form_data, db)
 
 
 @router.post("/logout")
-def logout_user(token: str = Depends(auth.oauth2_scheme)):
+async def logout_user(
+    token: str = Depends(auth.oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+):
     """
     Endpoint to logout from the system.
     Revokes the given access token and returns a success message.
     """
     # Revoke the access token
-    return logout(token)
+    return await logout(token, db)
 
 
 @router.post("/refresh")
-def refresh_token(refresh_token: str):
+async def refresh_token(refresh_token: str):
     """
     Endpoint to refresh the access token using a refresh token.
 
@@ -69,4 +72,4 @@ def refresh_token(refresh_token: str):
         dict: A JSON object containing the new access token.
     """
     # Call the refresh function to obtain a new access token
-    return refresh(refresh_token)
+    return await refresh(refresh_token)
@@ -1,12 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
+from pathlib import Path
+import zipfile
 from typing import List, Dict, Any
 
 from app.database import models
 from app.utils.database import get_db
 from app.login_system import crud, schemas
 from app.login_system.auth import is_admin
+from app.utils.clients import client_metrics
+from app.chat.outbox import chat_outbox
+from app.utils.runtime_settings import runtime_settings
+from app.docs_process import vector_backup
+from app.docs_process.ingestion_worker import ingestion_worker
+
+# Same directory as the system backups, whose manifests reference these archives
+BACKUP_DIR = "backups"
 
 router = APIRouter(
     prefix="/admin",
@@ -285,6 +295,38 @@ def get_user_statistics(db: Session = Depends(get_db)):
         )
 
 
+@router.get("/statistics/clients/", response_model=Dict[str, Any])
+def get_client_statistics():
+    """
+    Shared Qdrant/OpenAI clients and their connection pools
+    """
+    return client_metrics()
+
+
+@router.get("/statistics/chat-outbox/", response_model=Dict[str, Any])
+def get_chat_outbox_statistics():
+    """
+    Chat turns waiting to be written, written, retried and given up on
+    """
+    return chat_outbox.metrics()
+
+
+@router.get("/statistics/chat-outbox/failed/", response_model=List[Dict[str, Any]])
+def get_failed_chat_turns(limit: int = 100):
+    """
+    Chat turns the outbox could not write, with the last error
+    """
+    return chat_outbox.failed_records(limit)
+
+
+@router.post("/statistics/chat-outbox/failed/replay/", response_model=Dict[str, Any])
+def replay_failed_chat_turns():
+    """
+    Queue the failed chat turns again, e.g. after the cause was fixed
+    """
+    return {"requeued": chat_outbox.replay_failed()}
+
+
 @router.get("/statistics/conversations/", response_model=Dict[str, Any])
 def get_conversation_statistics(db: Session = Depends(get_db)):
     """
@@ -379,3 +421,93 @@ def get_conversation_statistics(db: Session = Depends(get_db)):
             status_code=500,
             detail=f"Error retrieving conversation statistics: {str(e)}",
         )
+
+
+@router.get("/settings/runtime", response_model=Dict[str, Any])
+def get_runtime_settings():
+    """
+    Current retrieval, generation and chunking parameters
+    """
+    return {
+        "version": runtime_settings.version,
+        "settings": runtime_settings.get().model_dump(),
+    }
+
+
+@router.put("/settings/runtime", response_model=Dict[str, Any])
+def update_runtime_settings(
+    settings: Dict[str, Any],
+    comment: str = "",
+    current_user: models.User = Depends(is_admin),
+):
+    """
+    Apply a partial update, e.g. {"retrieval": {"top_k": 8}}, as a new version;
+    the next request uses it without a restart
+    """
+    try:
+        return runtime_settings.update(settings, current_user.email, comment)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+
+@router.get("/settings/runtime/versions", response_model=Dict[str, Any])
+def list_runtime_settings_versions():
+    """
+    Saved versions, newest first
+    """
+    return {"current": runtime_settings.version, "versions": runtime_settings.versions()}
+
+
+@router.post("/settings/runtime/rollback/{version}", response_model=Dict[str, Any])
+def rollback_runtime_settings(
+    version: int, current_user: models.User = Depends(is_admin)
+):
+    """
+    Save an earlier version again as the newest one
+    """
+    try:
+        return runtime_settings.rollback(version, current_user.email)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+@router.get("/vectors/backups", response_model=List[Dict[str, Any]])
+def list_vector_backups():
+    """
+    Vector store archives in the backup directory, newest first
+    """
+    backup_dir = Path(BACKUP_DIR)
+    if not backup_dir.is_dir():
+        return []
+    archives = sorted(backup_dir.glob("vectors_backup_*.zip"), reverse=True)
+    return [{"filename": path.name, "file_size": path.stat().st_size} for path in archives]
+
+
+@router.post("/vectors/backup", response_model=Dict[str, Any])
+def backup_vectors():
+    """
+    Export every point of the live collection to a new archive
+    """
+    try:
+        return vector_backup.export_collection(BACKUP_DIR)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@router.post("/vectors/restore/{filename}", response_model=Dict[str, Any])
+def restore_vectors(filename: str):
+    """
+    Load an archive into a new collection version and switch the alias to it.
+
+    The restore runs on the ingestion worker; progress is in /api/pdfs/jobs/.
+    """
+    archive_path = Path(BACKUP_DIR) / filename
+    if Path(filename).name != filename or not archive_path.is_file():
+        raise HTTPException(status_code=404, detail="Vector backup archive not found")
+    try:
+        vector_backup.check_manifest(vector_backup.read_manifest(str(archive_path)))
+    except (ValueError, KeyError, zipfile.BadZipFile) as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    return ingestion_worker.submit_task(
+        "restore", vector_backup.import_collection, archive_path=str(archive_path)
+    )
@@ -502,6 +502,7 @@ async def migrate_existing_conversations(
                     
                     # Create admin conversation record
                     admin_conv = AdminConversation(
+                        conversation_id=str(conv.id),
                         user_id=conv.user_id,
                         username=username,
                         question=user_message.content,
@@ -541,6 +542,7 @@ async def migrate_existing_conversations(
                     
                     # Create admin conversation record
                     admin_conv = AdminConversation(
+                        conversation_id=conv.id,
                         username=f"guest_{conv.machine_id[:8]}",
                         question=user_message.content,
                         bot_response=bot_message.content,
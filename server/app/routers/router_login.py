@@ -2,12 +2,12 @@ import os
 import logging
 from pydantic import BaseModel
 from fastapi import APIRouter, Depends, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from app.login_system import auth
-from app.login_system.login import register, get_db, login, logout, refresh
+from app.login_system.login import register, get_async_db, login, logout, refresh
 from app.login_system.schemas import UserCreate
 
 
@@ -31,29 +31,32 @@ async def read_root():
 
 @router.post("/register", tags=["Authentication"])
 @limiter.limit("5/minute")
-def register_user(request: Request, user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(request: Request, user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Endpoint to register a new user."""
-    return register(user, db)
+    return await register(user, db)
 
 
 @router.post("/login", tags=["Authentication"])
 @limiter.limit("10/minute")
-def login_user(
+async def login_user(
     request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> dict:
     """Endpoint to login to the system."""
-    return login(form_data, db)
+    return await login(form_data, db)
 
 
 @router.post("/logout", tags=["Authentication"])
-def logout_user(token: str = Depends(auth.oauth2_scheme)):
+async def logout_user(
+    token: str = Depends(auth.oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+):
     """Endpoint to logout from the system."""
-    return logout(token)
+    return await logout(token, db)
 
 
 @router.post("/refresh", tags=["Authentication"])
-def refresh_token(refresh_token: str):
+async def refresh_token(refresh_token: str):
     """Endpoint to refresh the access token using a refresh token."""
-    return refresh(refresh_token)
+    return await refresh(refresh_token)
@@ -1,17 +1,25 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 import os
-import shutil
 import logging
-from typing import List, Dict, Any
-from datetime import datetime
+from typing import List, Dict, Any, Optional
+from sqlalchemy.orm import Session
 
 # Import our PDF processing and RAG modules
-from app.docs_process.process_pdf import process_pdf
+from app.docs_process import registry
+from app.docs_process.ingestion import needs_indexing
+from app.docs_process import collection_versions
+from app.docs_process.dedup import remove_file
+from app.docs_process.index_status import index_status
+from app.docs_process.local_index import local_index
+from app.docs_process.reconcile import reconcile
+from app.docs_process.ingestion_worker import ingestion_worker
+from app.docs_process.uploads import stream_to_temp, publish_upload, discard_upload, find_duplicate
 from app.login_system.auth import is_admin
-from app.utils.config import QDRANT_VECTERDB_HOST, COLLECTION_NAME
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Filter, FieldCondition, MatchValue
+from app.utils.database import get_db
+from app.utils.clients import get_qdrant_client
+from app.utils.config import COLLECTION_NAME, MAX_UPLOAD_MB
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -22,107 +30,27 @@ os.makedirs(PDF_STORAGE_PATH, exist_ok=True)
 
 router = APIRouter(prefix="/api/pdfs", tags=["PDF Management"])
 
-# Initialize Qdrant client
-qdrant_client = QdrantClient(url=QDRANT_VECTERDB_HOST)
+# Shared Qdrant client
+qdrant_client = get_qdrant_client()
 
 
-def get_pdf_info(filename: str) -> Dict[str, Any]:
-    """Get information about a PDF file including indexing status"""
-    file_path = os.path.join(PDF_STORAGE_PATH, filename)
-    
-    if not os.path.exists(file_path):
-        return None
-    
-    # Get file stats
-    stat = os.stat(file_path)
-    
-    # Check if file is indexed in Qdrant
-    is_indexed = check_if_indexed(filename)
-    
-    return {
-        "filename": filename,
-        "size_bytes": stat.st_size,
-        "size_mb": round(stat.st_size / (1024 * 1024), 2),
-        "created_at": datetime.fromtimestamp(stat.st_ctime).isoformat(),
-        "modified_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-        "is_indexed": is_indexed,
-        "indexed_at": get_indexed_timestamp(filename) if is_indexed else None
-    }
-
-
-def check_if_indexed(filename: str) -> bool:
-    """Check if a PDF file is indexed in Qdrant"""
-    try:
-        # Search for documents with this filename in metadata
-        results = qdrant_client.scroll(
-            collection_name=COLLECTION_NAME,
-            scroll_filter=Filter(
-                must=[
-                    FieldCondition(
-                        key="metadata.filename",
-                        match=MatchValue(value=filename)
-                    )
-                ]
-            ),
-            limit=1
-        )
-        return len(results[0]) > 0
-    except Exception as e:
-        logger.error(f"Error checking indexing status for {filename}: {e}")
-        return False
-
-
-def get_indexed_timestamp(filename: str) -> str:
-    """Get the timestamp when the file was indexed"""
-    try:
-        results = qdrant_client.scroll(
-            collection_name=COLLECTION_NAME,
-            scroll_filter=Filter(
-                must=[
-                    FieldCondition(
-                        key="metadata.filename",
-                        match=MatchValue(value=filename)
-                    )
-                ]
-            ),
-            limit=1,
-            with_payload=True
-        )
-        if results[0]:
-            payload = results[0][0].payload
-            return payload.get("indexed_at", "Unknown")
-    except Exception as e:
-        logger.error(f"Error getting indexed timestamp for {filename}: {e}")
-    return "Unknown"
+def get_live_collection() -> str:
+    """Collection behind the COLLECTION_NAME alias"""
+    return collection_versions.resolve_collection(qdrant_client) or COLLECTION_NAME
 
 
 def delete_from_qdrant(filename: str) -> bool:
     """Delete all vectors associated with a PDF file from Qdrant"""
     try:
-        # Find all points with this filename
-        results = qdrant_client.scroll(
-            collection_name=COLLECTION_NAME,
-            scroll_filter=Filter(
-                must=[
-                    FieldCondition(
-                        key="metadata.filename",
-                        match=MatchValue(value=filename)
-                    )
-                ]
-            ),
-            limit=10000,  # Large limit to get all points
-            with_payload=False
-        )
+        collection_name = get_live_collection()
         
-        if results[0]:
-            point_ids = [point.id for point in results[0]]
-            qdrant_client.delete(
-                collection_name=COLLECTION_NAME,
-                points_selector=point_ids
-            )
-            logger.info(f"Deleted {len(point_ids)} vectors for {filename}")
-            return True
-        return True  # No vectors to delete
+        # Shared (deduplicated) points are handed to the other files, the rest
+        # is deleted server-side with a filter (no ID round trip)
+        removed = remove_file(qdrant_client, collection_name, filename)
+        if removed["updated"]:
+            logger.info(f"Kept {removed['updated']} shared vectors used by other files")
+        logger.info(f"Deleted {removed['deleted']} vectors for {filename}")
+        return True
     except Exception as e:
         logger.error(f"Error deleting vectors for {filename}: {e}")
         return False
@@ -132,18 +60,8 @@ def delete_from_qdrant(filename: str) -> bool:
 async def list_pdfs(current_user: dict = Depends(is_admin)):
     """List all PDF files with detailed information including indexing status."""
     try:
-        pdf_files = [f for f in os.listdir(PDF_STORAGE_PATH) if f.endswith('.pdf')]
-        pdf_info = []
-        
-        for filename in pdf_files:
-            info = get_pdf_info(filename)
-            if info:
-                pdf_info.append(info)
-        
-        # Sort by modification date (newest first)
-        pdf_info.sort(key=lambda x: x['modified_at'], reverse=True)
-        
-        return pdf_info
+        # Cached listing with registry status (newest first)
+        return await run_in_threadpool(index_status.list_files, PDF_STORAGE_PATH)
     except Exception as e:
         logger.error(f"Error listing PDFs: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -152,33 +70,58 @@ async def list_pdfs(current_user: dict = Depends(is_admin)):
 @router.post("/upload/")
 async def upload_pdf(
     file: UploadFile = File(...), 
-    background_tasks: BackgroundTasks = BackgroundTasks(),
+    index: bool = False,
     current_user: dict = Depends(is_admin)
 ):
-    """Upload a new PDF file and optionally index it."""
+    """Upload a new PDF file and optionally index it.
+
+    The upload is streamed to disk with a size limit, hashed on the way and
+    rejected when a file with the same content is already indexed.
+    """
     if file.content_type != 'application/pdf':
         raise HTTPException(status_code=400, detail="Invalid file type. Only PDFs are allowed.")
     
-    file_path = os.path.join(PDF_STORAGE_PATH, file.filename)
+    filename = os.path.basename(file.filename)
+    file_path = os.path.join(PDF_STORAGE_PATH, filename)
     
     if os.path.exists(file_path):
         raise HTTPException(status_code=400, detail="File with this name already exists.")
 
     try:
-        # Save the file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Stream the file to a temp file (hashing as we go)
+        upload = await stream_to_temp(file, PDF_STORAGE_PATH, MAX_UPLOAD_MB * 1024 * 1024)
         
-        logger.info(f"Successfully uploaded {file.filename}")
+        # Reject duplicates by content hash (registry and pending jobs)
+        duplicate = await run_in_threadpool(find_duplicate, upload["sha256"])
+        if duplicate:
+            discard_upload(upload["tmp_path"])
+            raise HTTPException(
+                status_code=409,
+                detail=f"Duplicate file: same content as {duplicate}."
+            )
         
-        return JSONResponse(
-            status_code=201, 
-            content={
-                "message": f"Successfully uploaded {file.filename}",
-                "filename": file.filename,
-                "next_step": "Use /api/pdfs/index/{filename} to index the file for RAG"
-            }
-        )
+        # Move into place atomically
+        await run_in_threadpool(publish_upload, upload["tmp_path"], file_path)
+        
+        logger.info(f"Successfully uploaded {filename}")
+        
+        content = {
+            "message": f"Successfully uploaded {filename}",
+            "filename": filename,
+            "size_bytes": upload["size_bytes"],
+            "file_sha256": upload["sha256"],
+            "next_step": "Use /api/pdfs/index/{filename} to index the file for RAG"
+        }
+        if index:
+            job = ingestion_worker.submit(
+                file_path, filename, file_sha256=upload["sha256"], source="pdf_upload"
+            )
+            content["status"] = job["status"]
+            content["next_step"] = "Indexing queued, check /api/pdfs/jobs/ for progress"
+        
+        return JSONResponse(status_code=201, content=content)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading file {file.filename}: {e}")
         raise HTTPException(status_code=500, detail=f"Could not save file: {e}")
@@ -187,7 +130,6 @@ async def upload_pdf(
 @router.post("/index/{filename}")
 async def index_pdf(
     filename: str, 
-    background_tasks: BackgroundTasks = BackgroundTasks(),
     current_user: dict = Depends(is_admin)
 ):
     """Index a PDF file for RAG (Retrieval Augmented Generation)."""
@@ -200,8 +142,8 @@ async def index_pdf(
         raise HTTPException(status_code=400, detail="File is not a PDF.")
     
     try:
-        # Check if already indexed
-        if check_if_indexed(filename):
+        # Check the registry for an up-to-date entry (same bytes and settings)
+        if not await run_in_threadpool(needs_indexing, file_path, filename):
             return JSONResponse(
                 content={
                     "message": f"File {filename} is already indexed",
@@ -210,8 +152,8 @@ async def index_pdf(
                 }
             )
         
-        # Process the PDF in background
-        background_tasks.add_task(process_pdf_with_metadata, file_path, filename)
+        # The worker replaces the old vectors once the new ones are stored
+        ingestion_worker.submit(file_path, filename, source="pdf_upload")
         
         return JSONResponse(
             content={
@@ -225,56 +167,33 @@ async def index_pdf(
         raise HTTPException(status_code=500, detail=f"Could not start indexing: {e}")
 
 
-def process_pdf_with_metadata(file_path: str, filename: str):
-    """Process PDF with metadata including filename and timestamp."""
+@router.get("/index-status/")
+async def get_index_status(current_user: dict = Depends(is_admin)):
+    """Per-file chunk counts and indexed_at computed from Qdrant in one pass, next to the registry."""
     try:
-        logger.info(f"Starting indexing process for {filename}")
-        
-        # Import here to avoid circular imports
-        from docling.document_converter import DocumentConverter
-        from langchain.text_splitter import MarkdownTextSplitter
-        from langchain_qdrant import QdrantVectorStore
-        from langchain_openai import OpenAIEmbeddings
-        from app.utils.config import EMBEDDINGS_MODEL, QDRANT_VECTERDB_HOST, COLLECTION_NAME
-        
-        # Initialize embeddings
-        embeddings = OpenAIEmbeddings(model=EMBEDDINGS_MODEL)
-        
-        # Convert PDF to markdown
-        converter = DocumentConverter()
-        result = converter.convert(file_path)
-        markdown_text = result.document.export_to_markdown()
-        logger.info(f"Converted {filename} to markdown")
-        
-        # Split the text into chunks
-        text_splitter = MarkdownTextSplitter(chunk_size=300, chunk_overlap=30)
-        chunks = text_splitter.create_documents([markdown_text])
-        
-        # Add metadata to each chunk
-        indexed_at = datetime.now().isoformat()
-        for chunk in chunks:
-            chunk.metadata.update({
-                "filename": filename,
-                "indexed_at": indexed_at,
-                "source": "pdf_upload"
-            })
-        
-        # Store in Qdrant
-        qdrant = QdrantVectorStore.from_documents(
-            chunks,
-            embeddings,
-            url=QDRANT_VECTERDB_HOST,
-            collection_name=COLLECTION_NAME,
-        )
-        
-        logger.info(f"Successfully indexed {filename} with {len(chunks)} chunks")
-        
+        scan = await run_in_threadpool(index_status.scan_collection)
+        status = await run_in_threadpool(index_status.get_status)
     except Exception as e:
-        logger.error(f"Error processing PDF {filename}: {e}")
+        logger.error(f"Error scanning index status: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {
+        filename: {
+            "registry": status.get(filename),
+            "qdrant": scan.get(filename)
+        }
+        for filename in sorted(set(status) | set(scan))
+    }
+
+
+@router.get("/jobs/")
+async def list_index_jobs(current_user: dict = Depends(is_admin)):
+    """List queued, running and recently finished indexing jobs."""
+    return ingestion_worker.list_jobs()
 
 
 @router.delete("/{filename}")
-async def delete_pdf(filename: str, current_user: dict = Depends(is_admin)):
+async def delete_pdf(filename: str, db: Session = Depends(get_db), current_user: dict = Depends(is_admin)):
     """Delete a PDF file and remove it from Qdrant vector database."""
     file_path = os.path.join(PDF_STORAGE_PATH, filename)
     
@@ -285,8 +204,11 @@ async def delete_pdf(filename: str, current_user: dict = Depends(is_admin)):
         # Delete from Qdrant first
         qdrant_deleted = delete_from_qdrant(filename)
         
-        # Delete the file
+        # Delete the file and its registry entry
         os.remove(file_path)
+        registry.remove_entry(db, filename)
+        index_status.invalidate()
+        local_index.invalidate()
         
         message = f"Successfully deleted {filename}"
         if qdrant_deleted:
@@ -307,28 +229,37 @@ async def delete_pdf(filename: str, current_user: dict = Depends(is_admin)):
 @router.post("/reindex/{filename}")
 async def reindex_pdf(
     filename: str, 
-    background_tasks: BackgroundTasks = BackgroundTasks(),
+    force: bool = False,
     current_user: dict = Depends(is_admin)
 ):
-    """Re-index a PDF file (delete old vectors and create new ones)."""
+    """Re-index a PDF file (create new vectors, then drop the old ones).
+
+    Files whose bytes and indexing settings match the registry are left
+    untouched unless ``force`` is set.
+    """
     file_path = os.path.join(PDF_STORAGE_PATH, filename)
     
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found.")
     
     try:
-        # Delete existing vectors first
-        qdrant_deleted = delete_from_qdrant(filename)
+        if not force and not await run_in_threadpool(needs_indexing, file_path, filename):
+            return JSONResponse(
+                content={
+                    "message": f"File {filename} has not changed since it was indexed",
+                    "filename": filename,
+                    "status": "up_to_date"
+                }
+            )
         
-        # Process the PDF in background
-        background_tasks.add_task(process_pdf_with_metadata, file_path, filename)
+        # The old vectors keep answering until the worker has stored the new ones
+        ingestion_worker.submit(file_path, filename, source="pdf_upload", force=True)
         
         return JSONResponse(
             content={
-                "message": f"Started re-indexing {filename}. Old vectors deleted, creating new ones.",
+                "message": f"Started re-indexing {filename}. Old vectors are replaced when the new ones are ready.",
                 "filename": filename,
-                "status": "reindexing_started",
-                "old_vectors_deleted": qdrant_deleted
+                "status": "reindexing_started"
             }
         )
     except Exception as e:
@@ -336,26 +267,111 @@ async def reindex_pdf(
         raise HTTPException(status_code=500, detail=f"Could not start re-indexing: {e}")
 
 
+@router.post("/rebuild/")
+async def rebuild_index(
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+    current_user: dict = Depends(is_admin)
+):
+    """Re-index all PDFs into a new collection version and switch the alias when it is ready.
+
+    The current collection keeps serving queries during the rebuild. Chunk
+    size and overlap default to the runtime ingestion settings.
+    """
+    job = ingestion_worker.submit_task(
+        "rebuild",
+        collection_versions.rebuild_collection,
+        pdf_dir=PDF_STORAGE_PATH,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+    )
+    return JSONResponse(
+        content={
+            "message": "Started full re-index into a new collection version",
+            "status": job["status"],
+            "next_step": "Check /api/pdfs/jobs/ for progress"
+        }
+    )
+
+
+@router.post("/reconcile/")
+async def reconcile_collection(apply: bool = False, current_user: dict = Depends(is_admin)):
+    """Find orphaned and duplicate vectors; with ``apply`` remove them in the background.
+
+    Without ``apply`` the report is returned directly and nothing is changed.
+    """
+    if not apply:
+        try:
+            return await run_in_threadpool(reconcile, PDF_STORAGE_PATH)
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except Exception as e:
+            logger.error(f"Error checking the vector collection: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    # Runs on the ingestion worker so it never races an indexing job
+    job = ingestion_worker.submit_task(
+        "reconcile", reconcile, pdf_dir=PDF_STORAGE_PATH, apply=True
+    )
+    return JSONResponse(
+        content={
+            "message": "Started removing orphaned and duplicate vectors",
+            "status": job["status"],
+            "next_step": "Check /api/pdfs/jobs/ for the report"
+        }
+    )
+
+
+@router.get("/collections/")
+async def list_collection_versions(current_user: dict = Depends(is_admin)):
+    """Show which collection version the alias points to and the versions kept for rollback."""
+    try:
+        return {
+            "alias": COLLECTION_NAME,
+            "active": collection_versions.get_alias_target(qdrant_client),
+            "versions": collection_versions.list_versions(qdrant_client)
+        }
+    except Exception as e:
+        logger.error(f"Error listing collection versions: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/collections/rollback")
+async def rollback_collection(current_user: dict = Depends(is_admin)):
+    """Point the alias back at the previous collection version."""
+    try:
+        target = collection_versions.rollback(qdrant_client)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    local_index.invalidate()
+    return {"message": f"Rolled back to {target}", "active": target}
+
+
+@router.post("/collections/gc")
+async def garbage_collect_collections(keep: Optional[int] = None, current_user: dict = Depends(is_admin)):
+    """Delete old collection versions beyond the rollback window."""
+    if keep is None:
+        deleted = collection_versions.garbage_collect(qdrant_client)
+    else:
+        deleted = collection_versions.garbage_collect(qdrant_client, keep=max(keep, 0))
+    return {"deleted": deleted}
+
+
 @router.get("/stats/")
 async def get_pdf_stats(current_user: dict = Depends(is_admin)):
     """Get statistics about PDF files and indexing status."""
     try:
-        pdf_files = [f for f in os.listdir(PDF_STORAGE_PATH) if f.endswith('.pdf')]
+        pdf_info = await run_in_threadpool(index_status.list_files, PDF_STORAGE_PATH)
         
-        total_files = len(pdf_files)
-        indexed_files = 0
-        total_size_bytes = 0
-        
-        for filename in pdf_files:
-            info = get_pdf_info(filename)
-            if info:
-                total_size_bytes += info['size_bytes']
-                if info['is_indexed']:
-                    indexed_files += 1
+        total_files = len(pdf_info)
+        indexed_files = sum(1 for info in pdf_info if info['is_indexed'])
+        total_size_bytes = sum(info['size_bytes'] for info in pdf_info)
         
         # Get Qdrant collection info
         try:
-            collection_info = qdrant_client.get_collection(COLLECTION_NAME)
+            collection_info = await run_in_threadpool(
+                qdrant_client.get_collection, get_live_collection()
+            )
             total_vectors = collection_info.points_count
         except Exception:
             total_vectors = 0
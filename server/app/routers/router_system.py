@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.responses import JSONResponse, FileResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 from typing import List, Optional, Dict, Any
@@ -14,6 +15,8 @@ from pathlib import Path
 from ..database.database import get_db, engine
 from ..database.models import User, Conversation, Message, Document, Feedback, MachineData
 from ..login_system.auth import get_current_user
+from ..docs_process import vector_backup
+from ..docs_process.ingestion_worker import ingestion_worker
 from ..utils.logger import get_logger
 
 router = APIRouter(prefix="/system", tags=["System Management"])
@@ -369,7 +372,8 @@ async def backup_system_data(
             "messages": [],
             "documents": [],
             "feedback": [],
-            "machines": []
+            "machines": [],
+            "vector_backup": None
         }
         
         if backup_type in ["full", "users"]:
@@ -444,6 +448,11 @@ async def backup_system_data(
                     "updated_at": machine.updated_at.isoformat()
                 })
         
+        if backup_type in ["full", "vectors"]:
+            # Points, payloads and vectors go to a separate archive next to the JSON
+            vectors = await run_in_threadpool(vector_backup.export_collection, str(backup_dir))
+            backup_data["vector_backup"] = vectors["filename"]
+        
         # บันทึกไฟล์ backup
         with open(backup_path, 'w', encoding='utf-8') as f:
             json.dump(backup_data, f, ensure_ascii=False, indent=2)
@@ -456,7 +465,8 @@ async def backup_system_data(
                 "message": "System backup created successfully",
                 "filename": backup_filename,
                 "backup_type": backup_type,
-                "file_size": backup_path.stat().st_size
+                "file_size": backup_path.stat().st_size,
+                "vector_backup": backup_data["vector_backup"]
             }
         )
         
@@ -560,6 +570,27 @@ async def restore_system_data(
         
         db.commit()
         
+        # กู้คืน vector store จาก archive ที่สร้างพร้อม backup นี้
+        vectors_restored = None
+        if restore_type in ["full", "vectors"] and backup_data.get("vector_backup"):
+            archive_path = Path("backups") / backup_data["vector_backup"]
+            if not archive_path.exists():
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Vector backup archive not found"
+                )
+            manifest = await run_in_threadpool(vector_backup.read_manifest, str(archive_path))
+            try:
+                vector_backup.check_manifest(manifest)
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e)
+                )
+            # สลับ alias บน ingestion worker เหมือนการ rebuild (ดูความคืบหน้าที่ /api/pdfs/jobs/)
+            vectors_restored = ingestion_worker.submit_task(
+                "restore", vector_backup.import_collection, archive_path=str(archive_path)
+            )
+        
         logger.info(f"System data restored: {backup_file} by {current_user.get('email')}, restored: {restored_count}")
         
         return JSONResponse(
@@ -568,10 +599,13 @@ async def restore_system_data(
                 "message": "System data restored successfully",
                 "backup_file": backup_file,
                 "restore_type": restore_type,
-                "restored_count": restored_count
+                "restored_count": restored_count,
+                "vectors": vectors_restored
             }
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error restoring system data: {str(e)}")
         raise HTTPException(
@@ -1,11 +1,9 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, status
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-import json
 import asyncio
-import qdrant_client
 from qdrant_client.models import (
     Distance, VectorParams, CreateCollection, 
     PointStruct, Filter, FieldCondition, MatchValue
@@ -15,29 +13,36 @@ from app.utils.database import get_db
 from app.database.models import Document, DocumentChunk
 from app.login_system.auth import get_current_user
 from app.utils.logger import get_logger
-from app.config.settings import get_settings
+from app.docs_process.collection_profiles import build_search_params, create_collection
+from app.docs_process.collection_schema import upsert_points
+from app.docs_process.embedding_service import get_embedding_service
+from app.docs_process.embeddings import get_embedding_dimensions
+from app.docs_process.search_filters import build_filter, infer_filters
+from app.docs_process.vector_codec import encode_vector
+from app.utils import clients
+from app.utils.config import COLLECTION_PROFILE
 
 router = APIRouter(prefix="/vector", tags=["Vector Database Management"])
 logger = get_logger(__name__)
 
-# สร้าง Qdrant client
+# Qdrant client ที่ใช้ร่วมกันทั้งระบบ (connection pool)
 def get_qdrant_client():
-    settings = get_settings()
-    return qdrant_client.QdrantClient(
-        host=settings.qdrant_host,
-        port=settings.qdrant_port
-    )
+    return clients.get_qdrant_client()
 
 @router.post("/collections/create")
 async def create_vector_collection(
     collection_name: str,
-    vector_size: int = 1536,  # OpenAI embedding size
+    vector_size: Optional[int] = None,  # default: configured embedding size
     distance: str = "cosine",
+    profile: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
     สร้าง collection ในฐานข้อมูลเวกเตอร์ (UC33)
+
+    ``profile`` selects HNSW, quantization and on-disk settings
+    (default: COLLECTION_PROFILE).
     """
     try:
         # ตรวจสอบสิทธิ์ admin
@@ -71,19 +76,18 @@ async def create_vector_collection(
             distance_metric = Distance.COSINE
         
         # สร้าง collection
-        client.create_collection(
-            collection_name=collection_name,
-            vectors_config=VectorParams(
-                size=vector_size,
-                distance=distance_metric
-            )
-        )
+        vector_size = vector_size or get_embedding_dimensions() or 1536
+        try:
+            create_collection(client, collection_name, vector_size, profile, distance_metric)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         
         # บันทึกข้อมูล collection ในฐานข้อมูล
         collection_info = {
             "name": collection_name,
             "vector_size": vector_size,
             "distance_metric": distance,
+            "profile": profile or COLLECTION_PROFILE,
             "created_at": datetime.utcnow().isoformat(),
             "created_by": current_user.get("email")
         }
@@ -98,6 +102,8 @@ async def create_vector_collection(
             }
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating vector collection: {str(e)}")
         raise HTTPException(
@@ -244,52 +250,37 @@ async def update_embeddings(
         else:
             documents = db.query(Document).all()
         
-        updated_count = 0
+        # ดึง chunks ของเอกสารทั้งหมดในครั้งเดียว
+        filenames = {document.id: document.filename for document in documents}
+        chunks = db.query(DocumentChunk).filter(
+            DocumentChunk.document_id.in_(list(filenames))
+        ).all() if filenames else []
+        
+        # สร้าง embeddings แบบ batch (token-aware, พร้อม retry)
+        embeddings = await get_embedding_service().embed([chunk.content for chunk in chunks])
+        
+        points = [
+            PointStruct(
+                id=chunk.id,
+                vector=embedding,
+                payload={
+                    "document_id": chunk.document_id,
+                    "chunk_id": chunk.id,
+                    "content": chunk.content,
+                    "filename": filenames[chunk.document_id],
+                    "created_at": chunk.created_at.isoformat()
+                }
+            )
+            for chunk, embedding in zip(chunks, embeddings)
+        ]
         
-        for document in documents:
-            # ดึง chunks ของเอกสาร
-            chunks = db.query(DocumentChunk).filter(
-                DocumentChunk.document_id == document.id
-            ).all()
-            
-            for chunk in chunks:
-                # สร้าง embedding ใหม่ (ต้องใช้ OpenAI API หรือ embedding service)
-                # ตัวอย่างการสร้าง embedding (ต้องปรับตามระบบจริง)
-                embedding = await generate_embedding(chunk.content)
-                
-                # อัปเดตใน Qdrant
-                point = PointStruct(
-                    id=chunk.id,
-                    vector=embedding,
-                    payload={
-                        "document_id": document.id,
-                        "chunk_id": chunk.id,
-                        "content": chunk.content,
-                        "filename": document.filename,
-                        "created_at": chunk.created_at.isoformat()
-                    }
-                )
-                
-                # ลบ point เก่า (ถ้ามี)
-                try:
-                    client.delete(
-                        collection_name=collection_name,
-                        points_selector=[chunk.id]
-                    )
-                except:
-                    pass
-                
-                # เพิ่ม point ใหม่
-                client.upsert(
-                    collection_name=collection_name,
-                    points=[point]
-                )
-                
-                # อัปเดต collection_name ใน chunk
-                chunk.collection_name = collection_name
-                chunk.updated_at = datetime.utcnow()
-                
-                updated_count += 1
+        # upsert แทนที่ point เดิมที่มี id เดียวกัน (ไม่ต้องลบก่อน)
+        updated_count = upsert_points(client, collection_name, points)
+        
+        now = datetime.utcnow()
+        for chunk in chunks:
+            chunk.collection_name = collection_name
+            chunk.updated_at = now
         
         db.commit()
         
@@ -317,13 +308,37 @@ async def search_similar_documents(
     collection_name: str = "default",
     limit: int = 10,
     threshold: float = 0.7,
+    filename: Optional[List[str]] = Query(None),
+    section: Optional[str] = None,
+    category: Optional[List[str]] = Query(None),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    infer_filter: bool = False,
     db: Session = Depends(get_db),
     current_user: Optional[dict] = Depends(get_current_user)
 ):
     """
     ค้นหาเอกสารที่คล้ายกัน (UC35)
+    
+    จำกัดขอบเขตด้วย filename, section, category และช่วงวันที่ index (ISO 8601)
+    หรือใช้ infer_filter เพื่ออนุมาน category จากคำค้น
     """
     try:
+        filters = {
+            "filename": filename,
+            "section": section,
+            "category": category,
+            "date_from": date_from,
+            "date_to": date_to,
+        }
+        if infer_filter and not any(filters.values()):
+            filters = infer_filters(query)
+        # Same payload layout and filter as retrieve()
+        try:
+            query_filter = build_filter(**filters)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        
         # สร้าง Qdrant client
         client = get_qdrant_client()
         
@@ -344,20 +359,26 @@ async def search_similar_documents(
         search_results = client.search(
             collection_name=collection_name,
             query_vector=query_embedding,
+            query_filter=query_filter,
             limit=limit,
-            score_threshold=threshold
+            score_threshold=threshold,
+            search_params=build_search_params()
         )
         
         # รวบรวมผลการค้นหา
         results = []
         for result in search_results:
+            payload = result.payload or {}
+            metadata = payload.get("metadata") or {}
             results.append({
                 "score": result.score,
-                "document_id": result.payload.get("document_id"),
-                "chunk_id": result.payload.get("chunk_id"),
-                "content": result.payload.get("content"),
-                "filename": result.payload.get("filename"),
-                "created_at": result.payload.get("created_at")
+                "point_id": str(result.id),
+                "content": payload.get("page_content"),
+                "filename": metadata.get("filename"),
+                "page": metadata.get("page"),
+                "section": metadata.get("section"),
+                "category": metadata.get("category"),
+                "indexed_at": metadata.get("indexed_at")
             })
         
         logger.info(f"Vector search performed: query='{query}', results={len(results)}")
@@ -367,11 +388,14 @@ async def search_similar_documents(
             content={
                 "query": query,
                 "collection_name": collection_name,
+                "filters": {key: value for key, value in filters.items() if value},
                 "results": results,
                 "total_results": len(results)
             }
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error searching similar documents: {str(e)}")
         raise HTTPException(
@@ -521,42 +545,41 @@ async def batch_process_embeddings(
             DocumentChunk.embedding.is_(None)
         ).limit(batch_size).all()
         
-        processed_count = 0
-        
-        for chunk in chunks:
-            try:
-                # สร้าง embedding
-                embedding = await generate_embedding(chunk.content)
-                
-                # สร้าง point
-                point = PointStruct(
-                    id=chunk.id,
-                    vector=embedding,
-                    payload={
-                        "document_id": chunk.document_id,
-                        "chunk_id": chunk.id,
-                        "content": chunk.content,
-                        "filename": chunk.document.filename if chunk.document else "Unknown",
-                        "created_at": chunk.created_at.isoformat()
-                    }
-                )
-                
-                # เพิ่มใน Qdrant
-                client.upsert(
-                    collection_name=collection_name,
-                    points=[point]
-                )
-                
-                # อัปเดต chunk
-                chunk.embedding = json.dumps(embedding)
-                chunk.collection_name = collection_name
-                chunk.updated_at = datetime.utcnow()
-                
-                processed_count += 1
-                
-            except Exception as e:
-                logger.error(f"Error processing chunk {chunk.id}: {str(e)}")
+        # สร้าง embeddings แบบ batch (token-aware, พร้อม retry)
+        # chunk ที่ embed ไม่ได้จะถูกข้ามไป ไม่ทำให้ทั้ง batch ล้มเหลว
+        embeddings = await get_embedding_service().embed(
+            [chunk.content for chunk in chunks], skip_failures=True
+        )
+        embedded = []
+        for chunk, embedding in zip(chunks, embeddings):
+            if embedding is None:
+                logger.error(f"Error processing chunk {chunk.id}: embedding failed")
                 continue
+            embedded.append((chunk, embedding))
+        
+        points = [
+            PointStruct(
+                id=chunk.id,
+                vector=embedding,
+                payload={
+                    "document_id": chunk.document_id,
+                    "chunk_id": chunk.id,
+                    "content": chunk.content,
+                    "filename": chunk.document.filename if chunk.document else "Unknown",
+                    "created_at": chunk.created_at.isoformat()
+                }
+            )
+            for chunk, embedding in embedded
+        ]
+        
+        # เพิ่มใน Qdrant เป็น batch
+        processed_count = upsert_points(client, collection_name, points)
+        
+        now = datetime.utcnow()
+        for chunk, embedding in embedded:
+            chunk.embedding = encode_vector(embedding)
+            chunk.collection_name = collection_name
+            chunk.updated_at = now
         
         db.commit()
         
@@ -578,26 +601,9 @@ async def batch_process_embeddings(
             detail="เกิดข้อผิดพลาดในการประมวลผล embeddings แบบ batch"
         )
 
-# Helper function สำหรับสร้าง embedding (ต้องปรับตามระบบจริง)
+# Helper function สำหรับสร้าง embedding
 async def generate_embedding(text: str) -> List[float]:
     """
-    สร้าง embedding สำหรับข้อความ (ต้องปรับตามระบบจริง)
+    สร้าง embedding สำหรับข้อความด้วย embedding service (EMBEDDING_PROVIDER)
     """
-    # ตัวอย่างการสร้าง embedding แบบ dummy
-    # ในระบบจริงต้องใช้ OpenAI API หรือ embedding service อื่นๆ
-    
-    import hashlib
-    import random
-    
-    # สร้าง hash จากข้อความ
-    text_hash = hashlib.md5(text.encode()).hexdigest()
-    
-    # สร้าง embedding แบบ deterministic จาก hash
-    random.seed(int(text_hash[:8], 16))
-    embedding = [random.uniform(-1, 1) for _ in range(1536)]
-    
-    # Normalize vector
-    magnitude = sum(x**2 for x in embedding) ** 0.5
-    embedding = [x / magnitude for x in embedding]
-    
-    return embedding
+    return await get_embedding_service().embed_query(text)
@@ -0,0 +1,263 @@
+"""
+Shared API clients
+
+One Qdrant client, one OpenAI client and one LangChain embeddings object per
+process, all on keep-alive connection pools, instead of a new client (and new
+TCP/TLS handshakes) per request or per file. Qdrant can use gRPC with
+QDRANT_PREFER_GRPC.
+
+Async OpenAI clients are kept per event loop, because an httpx async pool
+cannot be shared between loops. Blocking callers (scripts, worker threads)
+use ``run_sync()``, which runs coroutines on one long-lived background loop
+instead of a new loop (and a new pool) per call. Clients of loops that have
+been closed are dropped; their connections went away with the loop.
+
+Call ``close_clients()`` on shutdown; ``client_metrics()`` reports what is
+open and how many requests went through each pool.
+"""
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.utils.config import (
+    OPENAI_API_KEY,
+    QDRANT_URL,
+    QDRANT_PREFER_GRPC,
+    QDRANT_GRPC_PORT,
+    QDRANT_TIMEOUT,
+    EMBEDDINGS_MODEL,
+    EMBEDDINGS_DIMENSIONS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
+    HTTP_KEEPALIVE_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+    )
+
+
+def pool_state(http_client) -> Dict[str, Any]:
+    """Open/idle connection counts of an httpx client's pool (best effort)"""
+    pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []) or [])
+    return {
+        "connections": len(connections),
+        "idle": sum(1 for c in connections if getattr(c, "is_idle", lambda: False)()),
+    }
+
+
+class ClientRegistry:
+    """Lazily created, process-wide clients"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._qdrant = None
+        self._http: Optional[httpx.Client] = None
+        self._openai = None
+        self._async_openai: Dict[asyncio.AbstractEventLoop, Any] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._embeddings = None
+        self._requests: Dict[str, int] = {"openai": 0, "openai_async": 0}
+        self._created: Dict[str, float] = {}
+
+    def _count(self, name: str):
+        self._requests[name] += 1
+
+    def qdrant(self):
+        with self._lock:
+            if self._qdrant is None:
+                from qdrant_client import QdrantClient
+
+                self._qdrant = QdrantClient(
+                    url=QDRANT_URL,
+                    prefer_grpc=QDRANT_PREFER_GRPC,
+                    grpc_port=QDRANT_GRPC_PORT,
+                    timeout=QDRANT_TIMEOUT,
+                    limits=pool_limits(),
+                )
+                self._created["qdrant"] = time.time()
+                logger.info(
+                    f"Qdrant client for {QDRANT_URL} ({'gRPC' if QDRANT_PREFER_GRPC else 'REST'})"
+                )
+            return self._qdrant
+
+    def http(self) -> httpx.Client:
+        """Keep-alive pool used by the sync OpenAI and embeddings clients"""
+        with self._lock:
+            if self._http is None:
+                import openai
+
+                self._http = openai.DefaultHttpxClient(
+                    limits=pool_limits(),
+                    event_hooks={"request": [lambda request: self._count("openai")]},
+                )
+                self._created["http"] = time.time()
+            return self._http
+
+    def openai(self):
+        http_client = self.http()
+        with self._lock:
+            if self._openai is None:
+                import openai
+
+                self._openai = openai.OpenAI(api_key=OPENAI_API_KEY, http_client=http_client)
+                self._created["openai"] = time.time()
+            return self._openai
+
+    def async_openai(self):
+        """AsyncOpenAI bound to the running event loop"""
+        import openai
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            for closed in [l for l in self._async_openai if l.is_closed()]:
+                del self._async_openai[closed]
+                logger.warning("Dropped the async OpenAI client of a closed event loop")
+            client = self._async_openai.get(loop)
+            if client is None:
+
+                async def count(request):
+                    self._count("openai_async")
+
+                client = openai.AsyncOpenAI(
+                    api_key=OPENAI_API_KEY,
+                    http_client=openai.DefaultAsyncHttpxClient(
+                        limits=pool_limits(), event_hooks={"request": [count]}
+                    ),
+                )
+                self._async_openai[loop] = client
+            return client
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Long-lived event loop in a daemon thread, for blocking callers"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+
+                def run():
+                    loop.run_forever()
+                    loop.close()
+
+                threading.Thread(target=run, name="clients-loop", daemon=True).start()
+                self._loop = loop
+                self._created["loop"] = time.time()
+            return self._loop
+
+    def run_sync(self, coro):
+        """Run a coroutine on the background loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop()).result()
+
+    def embeddings(self):
+        """Shared OpenAIEmbeddings for the configured model and dimensions"""
+        http_client = self.http()
+        with self._lock:
+            if self._embeddings is None:
+                from langchain_openai import OpenAIEmbeddings
+
+                self._embeddings = OpenAIEmbeddings(
+                    model=EMBEDDINGS_MODEL,
+                    dimensions=EMBEDDINGS_DIMENSIONS,
+                    http_client=http_client,
+                )
+                self._created["embeddings"] = time.time()
+            return self._embeddings
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "qdrant": {
+                    "open": self._qdrant is not None,
+                    "url": QDRANT_URL,
+                    "transport": "grpc" if QDRANT_PREFER_GRPC else "rest",
+                },
+                "openai": {
+                    "open": self._http is not None,
+                    "requests": self._requests["openai"],
+                    **(pool_state(self._http) if self._http is not None else {}),
+                },
+                "openai_async": {
+                    "event_loops": len(self._async_openai),
+                    "background_loop": self._loop is not None and self._loop.is_running(),
+                    "requests": self._requests["openai_async"],
+                },
+                "limits": {
+                    "max_connections": HTTP_MAX_CONNECTIONS,
+                    "max_keepalive": HTTP_MAX_KEEPALIVE,
+                    "keepalive_seconds": HTTP_KEEPALIVE_SECONDS,
+                },
+                "created_at": dict(self._created),
+            }
+
+    async def aclose(self):
+        """Close every client and its connection pool"""
+        with self._lock:
+            qdrant, http, sync_openai = self._qdrant, self._http, self._openai
+            async_clients = list(self._async_openai.items())
+            background_loop = self._loop
+            self._qdrant = self._http = self._openai = self._embeddings = None
+            self._async_openai = {}
+            self._loop = None
+            self._created.clear()
+
+        current_loop = asyncio.get_running_loop()
+        for loop, client in async_clients:
+            try:
+                if loop is current_loop:
+                    await client.close()
+                elif loop.is_running():
+                    # Pools belong to their loop, so close them there
+                    await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.close(), loop))
+            except Exception as e:
+                logger.warning(f"Could not close async OpenAI client: {e}")
+        if background_loop is not None and background_loop.is_running():
+            background_loop.call_soon_threadsafe(background_loop.stop)
+        for name, client in (("openai", sync_openai), ("http", http), ("qdrant", qdrant)):
+            if client is None:
+                continue
+            try:
+                client.close()
+            except Exception as e:
+                logger.warning(f"Could not close {name} client: {e}")
+        logger.info("Closed shared API clients")
+
+
+clients = ClientRegistry()
+
+
+def get_qdrant_client():
+    return clients.qdrant()
+
+
+def get_openai_client():
+    return clients.openai()
+
+
+def get_async_openai_client():
+    return clients.async_openai()
+
+
+def get_embeddings_client():
+    return clients.embeddings()
+
+
+def run_sync(coro):
+    return clients.run_sync(coro)
+
+
+def client_metrics() -> Dict[str, Any]:
+    return clients.metrics()
+
+
+async def close_clients():
+    await clients.aclose()
@@ -44,12 +44,95 @@ except ValueError as e:
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL")
 EMBEDDINGS_MODEL = os.getenv("EMBEDDINGS_MODEL")
+# Shortened vectors for text-embedding-3 models (empty = native model size)
+EMBEDDINGS_DIMENSIONS = int(os.getenv("EMBEDDINGS_DIMENSIONS") or 0) or None
 
 
 # Qdrant Configuration
 QDRANT_VECTERDB_HOST = os.getenv("QDRANT_VECTERDB_HOST")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME")
 QDRANT_URL = os.getenv("QDRANT_VECTERDB_HOST")
+# Shared client pools: Qdrant over gRPC (port 6334) instead of REST, keep-alive HTTP
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "30"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "30"))
+
+# Embedding service used by vector maintenance jobs: openai or local (offline/tests)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+EMBED_MAX_BATCH_TOKENS = int(os.getenv("EMBED_MAX_BATCH_TOKENS", "100000"))
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "512"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+# Binary format of vectors kept in database rows: float32 or float16
+VECTOR_STORAGE_DTYPE = os.getenv("VECTOR_STORAGE_DTYPE", "float32")
+
+# Collection profile (HNSW, quantization, on-disk vectors): default, high_recall,
+# balanced or memory_saver
+COLLECTION_PROFILE = os.getenv("COLLECTION_PROFILE", "default")
+
+# Retrieval backend: qdrant, or local (in-process NumPy mirror of the collection)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant")
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", "cache/local_index")
+LOCAL_INDEX_CHECK_SECONDS = int(os.getenv("LOCAL_INDEX_CHECK_SECONDS", "60"))
+
+# Guess a document-category filter from the question when retrieve() gets none
+SEARCH_FILTER_INFERENCE = os.getenv("SEARCH_FILTER_INFERENCE", "false").lower() == "true"
+
+# Runtime settings (k, top_k, model, chunk sizes): versioned file read on every
+# request; per-request overrides via the X-Runtime-Settings header
+RUNTIME_SETTINGS_PATH = os.getenv("RUNTIME_SETTINGS_PATH", "config/runtime_settings.json")
+RUNTIME_SETTINGS_HISTORY = int(os.getenv("RUNTIME_SETTINGS_HISTORY", "20"))
+ALLOW_SETTINGS_OVERRIDE = os.getenv("ALLOW_SETTINGS_OVERRIDE", "false").lower() == "true"
+# Overrides are only accepted with a matching X-Settings-Override-Secret header
+SETTINGS_OVERRIDE_SECRET = os.getenv("SETTINGS_OVERRIDE_SECRET", "")
+# Chat models runtime settings may select (OPENAI_MODEL is always allowed)
+ALLOWED_CHAT_MODELS = [
+    m.strip() for m in os.getenv("ALLOWED_CHAT_MODELS", "gpt-4o-mini,gpt-4o").split(",") if m.strip()
+]
+
+# Ingestion caches
+EMBEDDING_STORE_PATH = os.getenv("EMBEDDING_STORE_PATH", "cache/embeddings")
+CONVERSION_CACHE_PATH = os.getenv("CONVERSION_CACHE_PATH", "cache/conversions")
+CONVERSION_CACHE_MAX_MB = int(os.getenv("CONVERSION_CACHE_MAX_MB", "1024"))
+
+# Docling converter worker pool (0 = convert inside the calling process)
+CONVERTER_POOL_SIZE = int(os.getenv("CONVERTER_POOL_SIZE", "1"))
+CONVERTER_MAX_TASKS_PER_WORKER = int(os.getenv("CONVERTER_MAX_TASKS_PER_WORKER", "50"))
+
+# Skip OCR and table-structure models for pages that have a text layer
+CONVERTER_FAST_PATH = os.getenv("CONVERTER_FAST_PATH", "true").lower() == "true"
+TEXT_LAYER_MIN_CHARS = int(os.getenv("TEXT_LAYER_MIN_CHARS", "32"))
+# Shorter text-layer runs are converted with the full pipeline of their neighbours
+CONVERTER_MIN_RUN_PAGES = int(os.getenv("CONVERTER_MIN_RUN_PAGES", "5"))
+
+# Page-streaming ingestion: convert, chunk and embed a window of pages at a time
+INGEST_PAGE_STREAMING = os.getenv("INGEST_PAGE_STREAMING", "true").lower() == "true"
+PAGE_STREAM_WINDOW = int(os.getenv("PAGE_STREAM_WINDOW", "10"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+# Collapse near-duplicate chunks (SimHash, max Hamming distance in bits); chunks
+# with different numbers are never collapsed
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "false").lower() == "true"
+DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "3"))
+
+# Blue/green re-index: previous collection versions kept for rollback
+REINDEX_KEEP_COLLECTIONS = int(os.getenv("REINDEX_KEEP_COLLECTIONS", "2"))
+REINDEX_PROBE_COUNT = int(os.getenv("REINDEX_PROBE_COUNT", "5"))
+
+# PDF admin listing cache (seconds), also invalidated on index and delete
+INDEX_STATUS_TTL_SECONDS = int(os.getenv("INDEX_STATUS_TTL_SECONDS", "30"))
+
+# Chat turn outbox: bot messages and analytics rows are spooled here and
+# written after the response, retried with backoff up to this many attempts
+CHAT_OUTBOX_PATH = os.getenv("CHAT_OUTBOX_PATH", "cache/chat_outbox")
+CHAT_OUTBOX_MAX_ATTEMPTS = int(os.getenv("CHAT_OUTBOX_MAX_ATTEMPTS", "10"))
+CHAT_OUTBOX_RETRY_SECONDS = float(os.getenv("CHAT_OUTBOX_RETRY_SECONDS", "1"))
+
+# PDF uploads
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "50"))
 
 # Database
 DB_USER = os.getenv("DB_USER")
@@ -57,6 +140,13 @@ DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_HOST = os.getenv("DB_HOST")
 DB_NAME = os.getenv("DB_NAME")
 
+# Connection pools (per engine and worker process)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
 # JWT Configuration
 ACCESS_SECRET = os.getenv("SECRET_KEY")
 REFRESH_SECRET = os.getenv("REFRESH_SECRET")
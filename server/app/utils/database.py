@@ -1,20 +1,56 @@
 # Database
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 # Load environment
-from app.utils.config import DB_USER, DB_PASSWORD, DB_HOST, DB_NAME
+from app.utils.config import (
+    DB_USER,
+    DB_PASSWORD,
+    DB_HOST,
+    DB_NAME,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_STATEMENT_CACHE_SIZE,
+)
 
 # Database config postgres
 SQLALCHEMY_DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+ASYNC_SQLALCHEMY_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
 
-# Create engine for database connection
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Pool settings shared by both engines; pre-ping drops connections the
+# server closed while idle instead of failing the next request
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": True,
+}
+
+# Create engine for database connection (ingestion, admin and scripts)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **POOL_OPTIONS)
 
 # Create session class for database connection
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the request hot paths (chat, guest chat, auth). Statements
+# are prepared once per connection and reused (set the cache size to 0 behind
+# PgBouncer in transaction mode).
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    connect_args={"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE},
+    **POOL_OPTIONS,
+)
+
+# Objects stay readable after commit, lazy loads are not possible in async code
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 # Create base class for database models
 Base = declarative_base()
 
@@ -25,3 +61,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,196 @@
+"""
+Runtime settings store
+
+Retrieval, generation and ingestion parameters that can be tuned while the
+server runs. Settings are typed and validated (pydantic), every change is
+saved as a new version in RUNTIME_SETTINGS_PATH (older versions are kept for
+rollback) and readers pick up a change on their next call, also in other
+processes, because the file's mtime is checked on every read.
+
+A request can run with overrides on top of the current version (for
+benchmarks), see ``override_settings``; they apply only to the current
+context. The chat model must be one of ALLOWED_CHAT_MODELS (or OPENAI_MODEL).
+"""
+import os
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from app.utils.config import (
+    OPENAI_MODEL,
+    ALLOWED_CHAT_MODELS,
+    RUNTIME_SETTINGS_PATH,
+    RUNTIME_SETTINGS_HISTORY,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalSettings(BaseModel):
+    k_per_query: int = Field(5, ge=1, le=50)  # results per query variant
+    top_k: int = Field(10, ge=1, le=100)  # chunks passed to the LLM
+    query_variants: bool = True  # also search without spaces / function words
+
+
+class GenerationSettings(BaseModel):
+    model: str = OPENAI_MODEL or "gpt-4o-mini"
+    temperature: Optional[float] = Field(None, ge=0, le=2)
+
+    @field_validator("model")
+    @classmethod
+    def check_model(cls, model: str):
+        allowed = set(ALLOWED_CHAT_MODELS) | ({OPENAI_MODEL} if OPENAI_MODEL else set())
+        if model not in allowed:
+            raise ValueError(f"model must be one of {sorted(allowed)}")
+        return model
+
+
+class IngestionSettings(BaseModel):
+    chunk_size: int = Field(300, ge=50, le=8000)
+    chunk_overlap: int = Field(30, ge=0)
+
+    @model_validator(mode="after")
+    def check_overlap(self):
+        if self.chunk_overlap >= self.chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        return self
+
+
+class RuntimeSettings(BaseModel):
+    model_config = {"extra": "forbid"}
+
+    retrieval: RetrievalSettings = RetrievalSettings()
+    generation: GenerationSettings = GenerationSettings()
+    ingestion: IngestionSettings = IngestionSettings()
+
+
+def merge(base: Dict[str, Any], patch: Dict[str, Any]) -> Dict[str, Any]:
+    """Recursively apply a partial settings dict"""
+    merged = dict(base)
+    for key, value in patch.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class RuntimeSettingsStore:
+    """Versioned settings in one JSON file, reloaded when the file changes"""
+
+    def __init__(self, path: str = RUNTIME_SETTINGS_PATH, history: int = RUNTIME_SETTINGS_HISTORY):
+        self.path = path
+        self.history = history
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._data: Dict[str, Any] = {"current": 0, "versions": []}
+        self._settings = RuntimeSettings()
+
+    def _reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                current = next(v for v in data["versions"] if v["version"] == data["current"])
+                self._settings = RuntimeSettings.model_validate(current["settings"])
+                self._data = data
+            except Exception as e:
+                # Keep serving the last good version
+                logger.error(f"Invalid runtime settings file {self.path}: {e}")
+            self._mtime = mtime
+
+    def get(self) -> RuntimeSettings:
+        self._reload()
+        return self._settings
+
+    @property
+    def version(self) -> int:
+        self._reload()
+        return self._data["current"]
+
+    def versions(self) -> List[Dict[str, Any]]:
+        self._reload()
+        return list(reversed(self._data["versions"]))
+
+    def update(self, patch: Dict[str, Any], updated_by: Optional[str] = None, comment: str = "") -> Dict[str, Any]:
+        """Validate a partial update and save it as a new version (ValueError if invalid)"""
+        if not isinstance(patch, dict):
+            raise ValueError("settings must be a JSON object")
+        self._reload()
+        with self._lock:
+            settings = RuntimeSettings.model_validate(merge(self._settings.model_dump(), patch))
+            data = {
+                "current": self._data["current"] + 1,
+                "versions": list(self._data["versions"]),
+            }
+            entry = {
+                "version": data["current"],
+                "settings": settings.model_dump(),
+                "updated_by": updated_by,
+                "updated_at": datetime.utcnow().isoformat(),
+                "comment": comment,
+            }
+            data["versions"] = (data["versions"] + [entry])[-self.history:]
+
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+            self._data = data
+            self._settings = settings
+            self._mtime = os.stat(self.path).st_mtime
+
+        logger.info(f"Runtime settings version {entry['version']} saved by {updated_by}")
+        return entry
+
+    def rollback(self, version: int, updated_by: Optional[str] = None) -> Dict[str, Any]:
+        """Save an older version again as the newest one"""
+        self._reload()
+        old = next((v for v in self._data["versions"] if v["version"] == version), None)
+        if old is None:
+            raise ValueError(f"Runtime settings version {version} not found")
+        return self.update(old["settings"], updated_by, comment=f"rollback to version {version}")
+
+
+runtime_settings = RuntimeSettingsStore()
+
+_overrides: ContextVar[Optional[RuntimeSettings]] = ContextVar("runtime_settings_overrides", default=None)
+
+
+def get_runtime_settings() -> RuntimeSettings:
+    """Current settings, with the overrides of the running request applied"""
+    return _overrides.get() or runtime_settings.get()
+
+
+def build_settings(patch: Dict[str, Any]) -> RuntimeSettings:
+    """Current settings with a partial override applied (ValueError if invalid)"""
+    if not isinstance(patch, dict):
+        raise ValueError("settings must be a JSON object")
+    return RuntimeSettings.model_validate(merge(runtime_settings.get().model_dump(), patch))
+
+
+@contextmanager
+def override_settings(overrides: Union[Dict[str, Any], RuntimeSettings]):
+    """Use overridden settings in the current context only"""
+    settings = overrides if isinstance(overrides, RuntimeSettings) else build_settings(overrides)
+    token = _overrides.set(settings)
+    try:
+        yield settings
+    finally:
+        _overrides.reset(token)
@@ -0,0 +1,225 @@
+"""
+Benchmark Qdrant collection profiles
+
+Copies a sample of vectors from the live collection into one temporary
+collection per profile, then reports recall@k against exact search, search
+latency and the estimated vector memory for each profile.
+
+Queries are held out of the indexed sample: either real questions from
+``--queries-file`` (embedded with the configured model) or sampled points that
+are then left out of the benchmark collections, so no query can find itself.
+
+Examples:
+    python scripts/benchmark_profiles.py
+    python scripts/benchmark_profiles.py --points 20000 --queries 200 -k 10
+    python scripts/benchmark_profiles.py --queries-file questions.txt
+    python scripts/benchmark_profiles.py --profiles default balanced
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import logging as logger
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Make the `app` package importable when run as `python scripts/benchmark_profiles.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qdrant_client.models import OptimizersConfigDiff, PointStruct, SearchParams
+
+from app.docs_process.collection_profiles import (
+    PROFILES,
+    build_search_params,
+    create_collection,
+    estimate_memory_bytes,
+)
+from app.docs_process.collection_versions import get_client, resolve_collection
+from app.utils.config import COLLECTION_NAME
+
+# Setup logger
+logger.basicConfig(level=logger.INFO)
+
+UPSERT_BATCH_SIZE = 256
+# Build HNSW for every segment, however small (0 would disable indexing)
+BENCH_INDEXING_THRESHOLD_KB = 1
+
+
+def load_sample(client, collection_name: str, points: int) -> List[Any]:
+    """Read up to ``points`` vectors from the source collection"""
+    sample = []
+    offset = None
+    while len(sample) < points:
+        batch, offset = client.scroll(
+            collection_name=collection_name,
+            limit=min(UPSERT_BATCH_SIZE, points - len(sample)),
+            offset=offset,
+            with_payload=False,
+            with_vectors=True,
+        )
+        sample.extend(batch)
+        if offset is None:
+            break
+    return sample
+
+
+def load_queries(path: str) -> List[List[float]]:
+    """Embed one query per line (uncached, like real questions)"""
+    from app.docs_process.embeddings import get_embeddings
+
+    with open(path, encoding="utf-8") as f:
+        texts = [line.strip() for line in f if line.strip()]
+    if not texts:
+        return []
+    return get_embeddings(cached=False).embed_documents(texts)
+
+
+def wait_until_indexed(client, collection_name: str, points: int, timeout: float = 600):
+    """Wait until every point is in the HNSW index, not only until status is green"""
+    started = time.time()
+    while time.time() - started < timeout:
+        info = client.get_collection(collection_name)
+        if info.status == "green" and (info.indexed_vectors_count or 0) >= points:
+            return
+        time.sleep(1)
+    logger.warning(
+        f"{collection_name} has {info.indexed_vectors_count or 0}/{points} vectors indexed "
+        f"after {timeout:.0f}s, results include brute-force segments"
+    )
+
+
+def search_ids(client, collection_name: str, vector, k: int, params) -> List[Any]:
+    result = client.query_points(
+        collection_name=collection_name,
+        query=vector,
+        limit=k,
+        search_params=params,
+        with_payload=False,
+    )
+    return [point.id for point in result.points]
+
+
+def benchmark_profile(
+    client, profile: str, sample: List[Any], queries: List[List[float]], truth: List[set], k: int
+) -> Dict[str, Any]:
+    """Build a temporary collection for the profile and measure recall and latency"""
+    vector_size = len(sample[0].vector)
+    name = f"{COLLECTION_NAME}__bench_{profile}"
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    create_collection(client, name, vector_size, profile)
+
+    try:
+        client.update_collection(
+            collection_name=name,
+            optimizers_config=OptimizersConfigDiff(indexing_threshold=BENCH_INDEXING_THRESHOLD_KB),
+        )
+        for i in range(0, len(sample), UPSERT_BATCH_SIZE):
+            client.upsert(
+                collection_name=name,
+                points=[
+                    PointStruct(id=p.id, vector=p.vector)
+                    for p in sample[i : i + UPSERT_BATCH_SIZE]
+                ],
+            )
+        wait_until_indexed(client, name, len(sample))
+
+        params = build_search_params(profile)
+        latencies = []
+        recalls = []
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            ids = search_ids(client, name, query, k, params)
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalls.append(len(expected & set(ids)) / k)
+
+        memory = estimate_memory_bytes(len(sample), vector_size, profile)
+        return {
+            "profile": profile,
+            "recall": float(np.mean(recalls)),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "ram_mb": memory["ram_bytes"] / (1024 * 1024),
+            "disk_mb": memory["disk_bytes"] / (1024 * 1024),
+        }
+    finally:
+        client.delete_collection(name)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Qdrant collection profiles")
+    parser.add_argument("--profiles", nargs="*", default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument("--points", type=int, default=10000, help="vectors copied per profile")
+    parser.add_argument("--queries", type=int, default=100, help="query vectors held out of the sample")
+    parser.add_argument("--queries-file", help="file with one query per line (instead of held-out points)")
+    parser.add_argument("-k", type=int, default=10, help="recall@k")
+    args = parser.parse_args(argv)
+
+    client = get_client()
+    source = resolve_collection(client)
+    if source is None:
+        logger.error(f"Collection {COLLECTION_NAME} does not exist")
+        return 1
+
+    if args.queries_file:
+        queries = load_queries(args.queries_file)
+        sample = load_sample(client, source, args.points)
+    else:
+        # Extra points become the queries and are never indexed
+        sample = load_sample(client, source, args.points + args.queries)
+        random.shuffle(sample)
+        held_out = min(args.queries, len(sample) // 10 or 1)
+        queries = [p.vector for p in sample[:held_out]]
+        sample = sample[held_out:]
+    if not queries:
+        logger.error("No queries to benchmark")
+        return 1
+    if len(sample) <= args.k:
+        logger.error(f"Need more than {args.k} points to benchmark, found {len(sample)}")
+        return 1
+    if len(queries[0]) != len(sample[0].vector):
+        logger.error(
+            f"Queries have {len(queries[0])} dimensions, the collection {len(sample[0].vector)}"
+        )
+        return 1
+    logger.info(f"Benchmarking {len(args.profiles)} profiles on {len(sample)} points")
+
+    # Ground truth: exact (brute force) search on the sampled points
+    truth_name = f"{COLLECTION_NAME}__bench_truth"
+    if client.collection_exists(truth_name):
+        client.delete_collection(truth_name)
+    create_collection(client, truth_name, len(sample[0].vector), "default")
+    try:
+        for i in range(0, len(sample), UPSERT_BATCH_SIZE):
+            client.upsert(
+                collection_name=truth_name,
+                points=[
+                    PointStruct(id=p.id, vector=p.vector)
+                    for p in sample[i : i + UPSERT_BATCH_SIZE]
+                ],
+            )
+        exact = SearchParams(exact=True)
+        truth = [set(search_ids(client, truth_name, q, args.k, exact)) for q in queries]
+    finally:
+        client.delete_collection(truth_name)
+
+    results = [
+        benchmark_profile(client, profile, sample, queries, truth, args.k)
+        for profile in args.profiles
+    ]
+
+    print()
+    print(f"{'profile':<14}{'recall@' + str(args.k):>10}{'p50 ms':>10}{'p95 ms':>10}{'RAM MB':>10}{'disk MB':>10}")
+    for r in results:
+        print(
+            f"{r['profile']:<14}{r['recall']:>10.3f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+            f"{r['ram_mb']:>10.1f}{r['disk_mb']:>10.1f}"
+        )
+    print("RAM/disk are estimates for the vectors only (HNSW graph and payloads excluded)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
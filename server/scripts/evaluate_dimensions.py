@@ -0,0 +1,159 @@
+"""
+Offline recall evaluation for reduced embedding dimensions
+
+Embeds a sample of indexed chunks and a set of queries once at the model's
+full size, then shortens the vectors to each candidate size (text-embedding-3
+vectors are trained so a truncated, re-normalized prefix matches what the API
+returns for ``dimensions=``). For every size it reports recall@k against the
+full-size neighbours, brute-force search time per query and vector memory.
+
+Queries come from a text file (one per line) or, by default, from the first
+line of randomly chosen chunks.
+
+Examples:
+    python scripts/evaluate_dimensions.py
+    python scripts/evaluate_dimensions.py --dims 256 512 1024 --queries-file queries.txt
+    python scripts/evaluate_dimensions.py --api   # ask the API for each size instead
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import logging as logger
+from typing import Dict, List
+
+import numpy as np
+
+# Make the `app` package importable when run as `python scripts/evaluate_dimensions.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.docs_process.collection_schema import iter_points
+from app.docs_process.collection_versions import get_client, resolve_collection
+from app.docs_process.embedding_store import with_embedding_store
+from app.docs_process.embeddings import MODEL_DIMENSIONS
+from app.utils.config import EMBEDDINGS_MODEL, EMBEDDINGS_DIMENSIONS
+
+# Setup logger
+logger.basicConfig(level=logger.INFO)
+
+DEFAULT_DIMS = [256, 512, 768, 1024, 1536]
+QUERY_CHARS = 120
+
+
+def load_chunks(limit: int) -> List[str]:
+    """Chunk texts from the live collection"""
+    client = get_client()
+    collection_name = resolve_collection(client)
+    if collection_name is None:
+        raise SystemExit("The vector collection does not exist, index some PDFs first")
+
+    texts = []
+    for point in iter_points(client, collection_name, with_payload=["page_content"]):
+        text = (point.payload or {}).get("page_content")
+        if text:
+            texts.append(text)
+        if len(texts) >= limit:
+            break
+    return texts
+
+
+def make_queries(texts: List[str], count: int) -> List[str]:
+    """Use the first line of random chunks (Thai has few spaces, so cut by length)"""
+    return [
+        text.strip().split("\n")[0][:QUERY_CHARS]
+        for text in random.sample(texts, min(count, len(texts)))
+    ]
+
+
+def embed(texts: List[str], dimensions: int = None, cached: bool = True) -> np.ndarray:
+    """Embed texts; chunk texts go through the embedding store, queries must not"""
+    from langchain_openai import OpenAIEmbeddings
+
+    embeddings = OpenAIEmbeddings(model=EMBEDDINGS_MODEL, dimensions=dimensions)
+    if cached:
+        embeddings = with_embedding_store(embeddings)
+    return normalize(np.asarray(embeddings.embed_documents(texts), dtype=np.float32))
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def top_k(queries: np.ndarray, docs: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ docs.T
+    return np.argpartition(-scores, k, axis=1)[:, :k]
+
+
+def evaluate(
+    full_docs: np.ndarray, full_queries: np.ndarray, docs: np.ndarray, queries: np.ndarray, k: int
+) -> Dict[str, float]:
+    truth = top_k(full_queries, full_docs, k)
+
+    started = time.perf_counter()
+    found = top_k(queries, docs, k)
+    elapsed = time.perf_counter() - started
+
+    recall = np.mean([len(set(t) & set(f)) / k for t, f in zip(truth, found)])
+    return {
+        "recall": float(recall),
+        "ms_per_query": elapsed * 1000 / len(queries),
+        "mb_per_100k": docs.shape[1] * 4 * 100_000 / (1024 * 1024),
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    full_size = MODEL_DIMENSIONS.get(EMBEDDINGS_MODEL)
+    parser = argparse.ArgumentParser(description="Evaluate recall@k for reduced embedding sizes")
+    parser.add_argument("--dims", nargs="*", type=int, default=DEFAULT_DIMS)
+    parser.add_argument("--chunks", type=int, default=5000, help="chunks sampled from Qdrant")
+    parser.add_argument("--queries", type=int, default=200, help="generated queries")
+    parser.add_argument("--queries-file", help="file with one query per line")
+    parser.add_argument("-k", type=int, default=10, help="recall@k")
+    parser.add_argument(
+        "--api", action="store_true", help="request each size from the API instead of truncating"
+    )
+    args = parser.parse_args(argv)
+
+    if not full_size:
+        logger.error(f"Unknown native size for {EMBEDDINGS_MODEL}")
+        return 1
+
+    texts = load_chunks(args.chunks)
+    if len(texts) <= args.k:
+        logger.error(f"Need more than {args.k} chunks, found {len(texts)}")
+        return 1
+    if args.queries_file:
+        with open(args.queries_file, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = make_queries(texts, args.queries)
+    logger.info(f"Evaluating {len(queries)} queries against {len(texts)} chunks")
+
+    full_docs = embed(texts)
+    full_queries = embed(queries, cached=False)
+
+    rows = []
+    for dims in sorted(d for d in set(args.dims) | {full_size} if d <= full_size):
+        if args.api and dims != full_size:
+            docs, query_vectors = embed(texts, dims), embed(queries, dims, cached=False)
+        else:
+            docs = normalize(full_docs[:, :dims])
+            query_vectors = normalize(full_queries[:, :dims])
+        rows.append((dims, evaluate(full_docs, full_queries, docs, query_vectors, args.k)))
+
+    print()
+    print(f"Model: {EMBEDDINGS_MODEL} (configured dimensions: {EMBEDDINGS_DIMENSIONS or full_size})")
+    print(f"{'dims':>6}{'recall@' + str(args.k):>12}{'ms/query':>10}{'MB/100k':>10}")
+    for dims, result in rows:
+        print(
+            f"{dims:>6}{result['recall']:>12.3f}{result['ms_per_query']:>10.3f}"
+            f"{result['mb_per_100k']:>10.1f}"
+        )
+    print("Set EMBEDDINGS_DIMENSIONS and rebuild the index to switch sizes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
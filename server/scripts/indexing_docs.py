@@ -1,68 +1,217 @@
-import os
-import logging as logger
-from dotenv import load_dotenv
+"""
+Bulk PDF indexing CLI
 
-# LangChain
-from langchain_openai import OpenAIEmbeddings
-from langchain.text_splitter import MarkdownTextSplitter
-from langchain_qdrant import QdrantVectorStore
+Index a directory (or glob) of PDFs into Qdrant with N parallel workers.
+Files that the document registry marks as up to date are skipped.
 
-# FastAPI
-from fastapi import HTTPException
+With DEDUP_ENABLED the workers only convert and chunk in parallel; files are
+then stored one at a time, so a chunk shared by two files is stored once.
+The embedding throughput counts only texts sent to the embedding API (not
+embedding store hits or collapsed duplicates).
 
-# Docling
-from docling.document_converter import DocumentConverter
+Examples:
+    python scripts/indexing_docs.py pdfs/
+    python scripts/indexing_docs.py "pdfs/*.pdf" --workers 4
+    python scripts/indexing_docs.py pdfs/ --dry-run
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+import logging as logger
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List
 
-# Load environment variables
-load_dotenv()
-EMBEDDINGS_MODEL = os.getenv("EMBEDDINGS_MODEL", "text-embedding-3-large")
-QDRANT_VECTERDB_HOST = os.getenv("QDRANT_VECTERDB_HOST")
-COLLECTION_NAME = os.getenv("COLLECTION_NAME")
+# Make the `app` package importable when run as `python scripts/indexing_docs.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ingestion pipeline (Docling + LangChain + Qdrant, registry-aware)
+from app.docs_process.converter_pool import converter_pool
+from app.docs_process.ingestion import index_pdf, needs_indexing, plan_pdf
+from app.utils.config import DEDUP_ENABLED, EMBEDDINGS_MODEL
 
 # Setup logger
 logger.basicConfig(level=logger.INFO)
 
-# Initialize embeddings
-try:
-    embeddings = OpenAIEmbeddings(model=EMBEDDINGS_MODEL)
-except Exception as e:
-    logger.error(f"Failed to initialize OpenAI embeddings: {e}")
-    raise
+# USD per 1M input tokens, used for dry-run cost estimates
+EMBEDDING_PRICES = {
+    "text-embedding-3-small": 0.02,
+    "text-embedding-3-large": 0.13,
+    "text-embedding-ada-002": 0.10,
+}
+
 
-def process_pdf(file_path: str):
+def process_pdf(file_path: str, force: bool = False) -> Dict[str, Any]:
     """
     Process a PDF file:
+    - Skip it when the document registry has the same hash and settings
     - Convert to Markdown using Docling
     - Split into chunks with LangChain
     - Store in Qdrant using LangChain Vector Store
     """
     logger.info(f"Processing PDF for embeddings: {file_path}")
     try:
-        # Step 1: Convert PDF to markdown
-        converter = DocumentConverter()
-        result = converter.convert(file_path)
-        markdown_text = result.document.export_to_markdown()
-        logger.info("✅ Converted PDF to markdown")
-
-        # Step 2: Split into chunks
-        text_splitter = MarkdownTextSplitter(chunk_size=500, chunk_overlap=200)
-        chunks = text_splitter.create_documents([markdown_text])
-        logger.info(f"✅ Split into {len(chunks)} chunks")
-
-        # Step 3: Store in Qdrant
-        QdrantVectorStore.from_documents(
-            chunks,
-            embeddings,
-            url=QDRANT_VECTERDB_HOST,
-            collection_name=COLLECTION_NAME,
+        result = index_pdf(
+            file_path,
+            os.path.basename(file_path),
+            source="indexing_script",
+            force=force,
         )
-        logger.info("✅ Embeddings stored in Qdrant successfully")
+        if result["status"] == "skipped":
+            logger.info("⏭️  Unchanged since last indexing, skipped")
+        else:
+            logger.info(f"✅ Stored {result['chunk_count']} chunks in Qdrant")
+        return result
 
     except Exception as e:
-        logger.error(f"❌ Error processing PDF {file_path}: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise RuntimeError(f"Error processing PDF {file_path}: {e}") from e
+
+
+def collect_files(paths: List[str]) -> List[str]:
+    """Expand directories and glob patterns into a sorted list of PDF files"""
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            matches = glob.glob(os.path.join(path, "**", "*.pdf"), recursive=True)
+        else:
+            matches = glob.glob(path, recursive=True)
+        files.update(m for m in matches if os.path.isfile(m) and m.lower().endswith(".pdf"))
+    return sorted(files)
+
+
+def run(files: List[str], workers: int, dry_run: bool, force: bool) -> Dict[str, Any]:
+    """Index (or plan) the files in parallel and collect totals"""
+    totals = {
+        "files": 0,
+        "skipped": 0,
+        "failed": 0,
+        "pages": 0,
+        "chunks": 0,
+        "tokens": 0,
+        "embedded_chunks": 0,
+        "embedded_tokens": 0,
+    }
+
+    if not force:
+        pending = []
+        for file_path in files:
+            if needs_indexing(file_path):
+                pending.append(file_path)
+            else:
+                logger.info(f"⏭️  {os.path.basename(file_path)} is up to date, skipped")
+                totals["skipped"] += 1
+        files = pending
+
+    # Each worker thread needs its own Docling process to convert in parallel
+    if workers > 1:
+        converter_pool.resize(max(converter_pool.size, workers))
+
+    if not dry_run and DEDUP_ENABLED and workers > 1:
+        # Each file's deduplicator only sees chunks already in Qdrant, so two
+        # files stored at once could both store a shared chunk. Convert in
+        # parallel (into the conversion cache), then store one file at a time.
+        logger.info(f"Converting {len(files)} files with {workers} workers before storing them")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(plan_pdf, file_path): file_path for file_path in files}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    # Reported again when the file is indexed below
+                    logger.warning(f"Could not convert {os.path.basename(futures[future])}: {e}")
+        workers = 1
+
+    def work(file_path: str) -> Dict[str, Any]:
+        if dry_run:
+            return plan_pdf(file_path)
+        return process_pdf(file_path, force=force)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(work, file_path): file_path for file_path in files}
+        for future in as_completed(futures):
+            name = os.path.basename(futures[future])
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"❌ {name}: {e}")
+                totals["failed"] += 1
+                continue
+
+            if result.get("status") == "skipped":
+                totals["skipped"] += 1
+                continue
+
+            totals["files"] += 1
+            totals["pages"] += result.get("page_count", 0)
+            totals["chunks"] += result.get("chunk_count", 0)
+            totals["tokens"] += result.get("token_count", 0)
+            totals["embedded_chunks"] += result.get("embedded_count", 0)
+            totals["embedded_tokens"] += result.get("embedded_token_count", 0)
+            logger.info(
+                f"{name}: {result.get('page_count', 0)} pages, "
+                f"{result.get('chunk_count', 0)} chunks, {result.get('token_count', 0)} tokens"
+            )
+
+    converter_pool.shutdown()
+    return totals
+
+
+def print_report(totals: Dict[str, Any], elapsed: float, dry_run: bool, price: float):
+    """Print totals, throughput and (for dry runs) the estimated embedding cost"""
+    elapsed = max(elapsed, 1e-9)
+    print()
+    print("Dry run (nothing embedded)" if dry_run else "Indexing finished")
+    print(
+        f"  files: {totals['files']} processed, {totals['skipped']} skipped, "
+        f"{totals['failed']} failed"
+    )
+    print(f"  pages: {totals['pages']}  chunks: {totals['chunks']}  tokens: {totals['tokens']}")
+    print(f"  elapsed: {elapsed:.1f}s")
+    print(f"  pages/sec: {totals['pages'] / elapsed:.2f}")
+    print(f"  chunks/sec: {totals['chunks'] / elapsed:.2f}")
+    if dry_run:
+        cost = totals["tokens"] / 1_000_000 * price
+        print(f"  estimated embedding cost ({EMBEDDINGS_MODEL}): ${cost:.4f}")
+    else:
+        print(
+            f"  embedded: {totals['embedded_chunks']} chunks, {totals['embedded_tokens']} tokens "
+            f"(the rest were embedding store hits or duplicates)"
+        )
+        print(f"  embedding tokens/sec: {totals['embedded_tokens'] / elapsed:.0f}")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Index PDFs into the vector database")
+    parser.add_argument(
+        "paths", nargs="*", default=["pdfs"], help="PDF files, directories or glob patterns"
+    )
+    parser.add_argument("-w", "--workers", type=int, default=1, help="parallel workers")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="convert and chunk only, report tokens and cost"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="re-index files even when they are up to date"
+    )
+    parser.add_argument(
+        "--price-per-1m",
+        type=float,
+        default=EMBEDDING_PRICES.get(EMBEDDINGS_MODEL, 0.0),
+        help="embedding price in USD per 1M tokens (for the dry-run estimate)",
+    )
+    args = parser.parse_args(argv)
+
+    files = collect_files(args.paths)
+    if not files:
+        logger.warning(f"No PDF files found in {', '.join(args.paths)}")
+        return 1
+    logger.info(f"Found {len(files)} PDF files")
+
+    started = time.perf_counter()
+    totals = run(files, max(args.workers, 1), args.dry_run, args.force)
+    print_report(totals, time.perf_counter() - started, args.dry_run, args.price_per_1m)
+    return 1 if totals["failed"] else 0
 
 
 if __name__ == "__main__":
-    file_path = "pdfs/01_ค่าใช้จ่ายในการเดินทางไปราชการ.pdf"
-    process_pdf(file_path)
+    sys.exit(main())
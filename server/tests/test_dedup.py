@@ -0,0 +1,90 @@
+from langchain_core.documents import Document
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct, VectorParams
+
+from app.docs_process.dedup import ChunkDeduplicator, hamming, release_file, remove_file, simhash
+
+PER_DIEM = (
+    "ข้อ 8 ผู้เดินทางไปราชการมีสิทธิได้รับเบี้ยเลี้ยงเดินทางในลักษณะเหมาจ่าย "
+    "ในอัตราวันละ {allowance} บาท และค่าเช่าที่พักในลักษณะเหมาจ่ายไม่เกินคืนละ "
+    "{lodging} บาท ทั้งนี้ให้เป็นไปตามหลักเกณฑ์ที่กระทรวงการคลังกำหนด"
+)
+
+
+def make_chunk(text, filename, page=1, **metadata):
+    return Document(page_content=text, metadata={"filename": filename, "page": page, **metadata})
+
+
+def make_deduplicator(max_distance=3):
+    return ChunkDeduplicator(
+        client=QdrantClient(location=":memory:"), collection_name="docs", max_distance=max_distance
+    )
+
+
+def test_chunks_differing_only_in_numbers_are_kept():
+    first = PER_DIEM.format(allowance=1500, lodging=240)
+    second = PER_DIEM.format(allowance=2200, lodging=270)
+    # Loose enough that the hashes alone would collapse the two chunks
+    deduplicator = make_deduplicator(max_distance=15)
+    assert hamming(simhash(first), simhash(second)) <= 15
+
+    unique = deduplicator.filter([make_chunk(first, "a.pdf"), make_chunk(second, "b.pdf")])
+
+    assert [chunk.page_content for _, chunk in unique] == [first, second]
+    assert deduplicator.duplicate_count == 0
+
+
+def test_same_text_is_collapsed_into_sources():
+    text = PER_DIEM.format(allowance=1500, lodging=240)
+    deduplicator = make_deduplicator()
+    unique = deduplicator.filter(
+        [make_chunk(text, "a.pdf", section="หมวด 1"), make_chunk("  " + text, "b.pdf", page=3)]
+    )
+
+    assert len(unique) == 1
+    assert deduplicator.duplicate_count == 1
+    sources = unique[0][1].metadata["sources"]
+    assert [(s["filename"], s["page"]) for s in sources] == [("a.pdf", 1), ("b.pdf", 3)]
+
+
+def test_release_file_hands_owner_metadata_to_next_source():
+    client = QdrantClient(location=":memory:")
+    client.create_collection("docs", vectors_config=VectorParams(size=2, distance="Cosine"))
+    metadata = {
+        "filename": "ค่าใช้จ่ายในการฝึกอบรม.pdf",
+        "page": 1,
+        "section": "หมวด 1",
+        "category": "training",
+        "indexed_at": "2026-01-01T00:00:00",
+        "sources": [
+            {"filename": "ค่าใช้จ่ายในการฝึกอบรม.pdf", "page": 1, "section": "หมวด 1", "category": "training"},
+            {"filename": "การเดินทางไปราชการ.pdf", "page": 4, "section": "หมวด 2", "category": "travel"},
+        ],
+    }
+    client.upsert("docs", [PointStruct(id=1, vector=[1.0, 0.0], payload={"metadata": metadata})])
+
+    assert release_file(client, "docs", "ค่าใช้จ่ายในการฝึกอบรม.pdf") == {"updated": 1}
+
+    released = client.retrieve("docs", [1])[0].payload["metadata"]
+    assert released["filename"] == "การเดินทางไปราชการ.pdf"
+    assert released["page"] == 4
+    assert released["section"] == "หมวด 2"
+    assert released["category"] == "travel"
+    # The deleted file's indexing date is not carried over
+    assert "indexed_at" not in released
+
+
+def test_remove_file_keeps_the_new_run():
+    client = QdrantClient(location=":memory:")
+    client.create_collection("docs", vectors_config=VectorParams(size=2, distance="Cosine"))
+    old, new = "2026-01-01T00:00:00", "2026-02-01T00:00:00"
+    client.upsert(
+        "docs",
+        [
+            PointStruct(id=1, vector=[1.0, 0.0], payload={"metadata": {"filename": "a.pdf", "indexed_at": old}}),
+            PointStruct(id=2, vector=[0.0, 1.0], payload={"metadata": {"filename": "a.pdf", "indexed_at": new}}),
+        ],
+    )
+
+    assert remove_file(client, "docs", "a.pdf", keep_indexed_at=new) == {"updated": 0, "deleted": 1}
+    assert [point.id for point in client.scroll("docs")[0]] == [2]
@@ -0,0 +1,75 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.docs_process.embedding_service import EmbeddingService, LocalEmbeddingProvider
+
+
+class FailingProvider(LocalEmbeddingProvider):
+    """Local provider that cannot embed texts containing "bad" """
+
+    def __init__(self):
+        super().__init__(dimensions=16)
+        self.calls = []
+
+    async def embed_batch(self, texts):
+        self.calls.append(list(texts))
+        if any("bad" in text for text in texts):
+            raise ValueError("rejected input")
+        return await super().embed_batch(texts)
+
+
+def test_local_provider_is_deterministic_and_normalized():
+    provider = LocalEmbeddingProvider(dimensions=64)
+    first = np.array(provider.embed_one("เบี้ยเลี้ยงเดินทาง วันละ 240 บาท"))
+    again = np.array(provider.embed_one("เบี้ยเลี้ยงเดินทาง  วันละ 240 บาท"))
+
+    assert first.shape == (64,)
+    assert np.allclose(first, again)
+    assert np.isclose(np.linalg.norm(first), 1.0)
+
+
+def test_local_provider_ranks_similar_text_higher():
+    provider = LocalEmbeddingProvider(dimensions=256)
+    query = np.array(provider.embed_one("ค่าเช่าที่พักเหมาจ่าย"))
+    similar = np.array(provider.embed_one("ค่าเช่าที่พักในลักษณะเหมาจ่าย"))
+    other = np.array(provider.embed_one("การจัดซื้อครุภัณฑ์คอมพิวเตอร์"))
+
+    assert query @ similar > query @ other
+
+
+def test_batches_respect_token_and_size_limits():
+    service = EmbeddingService(LocalEmbeddingProvider(dimensions=8), max_batch_tokens=10, max_batch_size=3)
+    # The local provider counts len(text) // 2 + 1 tokens
+    texts = ["a" * 8, "b" * 8, "c" * 2, "d" * 2, "e" * 2, "f" * 2, "g" * 40]
+
+    batches = service.make_batches(texts)
+
+    assert batches == [[0, 1], [2, 3, 4], [5], [6]]
+    for batch in batches[:-1]:
+        assert sum(service.provider.count_tokens(texts[i]) for i in batch) <= 10
+    # A text over the budget on its own still gets a batch
+    assert batches[-1] == [6]
+
+
+def test_embed_keeps_input_order_across_batches():
+    service = EmbeddingService(LocalEmbeddingProvider(dimensions=8), max_batch_size=2, max_concurrency=3)
+    texts = [f"ข้อ {i}" for i in range(7)]
+
+    vectors = asyncio.run(service.embed(texts))
+
+    assert vectors == [service.provider.embed_one(text) for text in texts]
+
+
+def test_skip_failures_embeds_the_rest_of_a_failed_batch():
+    provider = FailingProvider()
+    service = EmbeddingService(provider, max_batch_size=10, max_retries=0)
+
+    with pytest.raises(ValueError):
+        asyncio.run(service.embed(["good one", "bad one", "good two"]))
+
+    vectors = asyncio.run(service.embed(["good one", "bad one", "good two"], skip_failures=True))
+    assert vectors[1] is None
+    assert vectors[0] == provider.embed_one("good one")
+    assert vectors[2] == provider.embed_one("good two")